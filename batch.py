@@ -0,0 +1,243 @@
+"""
+Batch mode - run many inputs through the same pipeline as the hotkeys (cache,
+model tiers, routing and fallbacks, race mode), without a keyboard listener or
+a desktop clipboard.
+
+Inputs are files (one input each), "-" for all of stdin as one input, or a
+JSONL file with {"id": ..., "text": ..., "backend": ...} per line (backend is
+optional). Results are written as JSONL in the order they finish, one line per
+input with its id, response and request trace:
+
+    python batch.py notes/*.txt --backend gemini -o results.jsonl
+    python batch.py --jsonl queue.jsonl --ollama-workers 2 --gemini-workers 4 -o results.jsonl
+    python batch.py --jsonl queue.jsonl -o results.jsonl --resume   # skip inputs already done
+
+Progress and the app's own messages go to stderr (--quiet drops them); a
+throughput summary is printed there at the end.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import clipboard_ai
+from cancellation import CancelToken
+from clipboard_io import InMemoryClipboard
+from tracing import percentile
+
+BACKENDS = ("ollama", "gemini", "race")
+
+
+class BatchItem:
+    def __init__(self, item_id, text, backend):
+        self.id = item_id
+        self.text = text
+        self.backend = backend
+
+
+def read_items(files, jsonl, default_backend):
+    """Yield BatchItems from the JSONL file first, then the plain files ("-" = stdin)"""
+    if jsonl:
+        f = sys.stdin if jsonl == "-" else open(jsonl, encoding="utf-8")
+        try:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                backend = record.get("backend") or default_backend
+                if backend not in BACKENDS:
+                    raise ValueError(f"{jsonl}:{number}: unknown backend {backend!r}")
+                yield BatchItem(str(record.get("id", number)), record["text"], backend)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+    for path in files:
+        if path == "-":
+            yield BatchItem("-", sys.stdin.read(), default_backend)
+        else:
+            with open(path, encoding="utf-8", errors="replace") as f:
+                yield BatchItem(path, f.read(), default_backend)
+
+
+def completed_ids(path):
+    """Ids that already have a successful result in an earlier output file"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done.add(record.get("id"))
+    return done
+
+
+def trim_partial_line(path, block=64 * 1024):
+    """Cut a last line that a hard kill left without its newline, so appended records
+    start on a line of their own; returns how many bytes were removed"""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        position = end
+        while position > 0:
+            start = max(0, position - block)
+            f.seek(start)
+            newline = f.read(position - start).rfind(b"\n")
+            if newline != -1:
+                keep = start + newline + 1
+                break
+            position = start
+        else:
+            keep = 0
+        if keep < end:
+            f.truncate(keep)
+        return end - keep
+
+
+def process_item(app, item, bypass_cache=False, cancel=None):
+    """Answer one input on the hotkey code path; returns its result record"""
+    response, trace = app.complete(item.text, item.backend, bypass_cache, cancel, trigger="batch")
+    if trace.status == "error" and trace.error:
+        print(f"❌ {item.id}: {trace.error}")
+    return {"id": item.id, "status": trace.status, "response": response, "trace": trace.to_dict()}
+
+
+def run_batch(app, items, workers, output, skip=(), bypass_cache=False, progress=None):
+    """Process items with workers[backend] requests in flight per backend.
+
+    Each result is written to output (a text stream) and flushed as soon as it
+    finishes. Returns the list of result records. Ctrl+C cancels the running
+    requests and leaves the unstarted ones for a --resume.
+    """
+    cancel = CancelToken()
+    pools = {name: ThreadPoolExecutor(max(1, count), thread_name_prefix=f"batch-{name}")
+             for name, count in workers.items()}
+    # Reading ahead is bounded so a huge JSONL queue is never held in memory at once
+    max_pending = 2 * sum(max(1, count) for count in workers.values())
+    pending = set()
+    results = []
+
+    def collect(done):
+        for future in done:
+            record = future.result()
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            results.append(record)
+            if progress:
+                progress(record, len(results))
+
+    try:
+        for item in items:
+            if item.id in skip:
+                continue
+            while len(pending) >= max_pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(done)
+            pending.add(pools[item.backend].submit(process_item, app, item, bypass_cache, cancel))
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            collect(done)
+    except KeyboardInterrupt:
+        print("\n🛑 Interrupted - cancelling running requests (rerun with --resume to continue)",
+              file=sys.stderr)
+        # Drop the queued inputs first, or the workers would pick them up as the running ones abort
+        for pool in pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        cancel.cancel("batch interrupted")
+        # Dropped futures never count as done for wait(), so only the running ones are waited on
+        collect(wait([f for f in pending if not f.cancelled()])[0])
+    finally:
+        for pool in pools.values():
+            pool.shutdown(wait=True)
+    return results
+
+
+def format_summary(results, seconds):
+    """Throughput and per-backend latency of a batch run"""
+    lines = [f"{len(results)} inputs in {seconds:.2f}s ({len(results) / seconds if seconds else 0:.2f}/s)"]
+    by_status = {}
+    for record in results:
+        by_status[record["status"]] = by_status.get(record["status"], 0) + 1
+    lines.append("  " + ", ".join(f"{status} {count}" for status, count in sorted(by_status.items())))
+    backends = {}
+    for record in results:
+        trace = record["trace"]
+        if record["status"] == "ok":
+            backends.setdefault(trace["backend"], []).append(trace)
+    for backend, traces in sorted(backends.items()):
+        totals = [trace["total_ms"] for trace in traces]
+        chars = sum(trace.get("output_chars") or 0 for trace in traces)
+        hits = sum(1 for trace in traces if trace.get("cache") in ("hit", "similar"))
+        lines.append(f"  {backend:<8} n={len(traces):<5} p50 {percentile(totals, 50):8.0f} ms   "
+                     f"p95 {percentile(totals, 95):8.0f} ms   {chars / seconds if seconds else 0:8.0f} chars/s"
+                     f"   cache hits {hits}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Process many inputs through Clipboard AI")
+    parser.add_argument("files", nargs="*", help="input files, one request each (- = stdin)")
+    parser.add_argument("--jsonl", help='JSONL inputs: {"id", "text", "backend"} per line (- = stdin)')
+    parser.add_argument("--backend", choices=BACKENDS, default="ollama", help="backend for inputs that don't name one")
+    parser.add_argument("--ollama-workers", type=int, default=clipboard_ai.OLLAMA_WORKERS)
+    parser.add_argument("--gemini-workers", type=int, default=clipboard_ai.GEMINI_WORKERS)
+    parser.add_argument("--race-workers", type=int, default=1)
+    parser.add_argument("-o", "--output", help="results JSONL (default: stdout)")
+    parser.add_argument("--resume", action="store_true", help="append to --output, skipping inputs already done")
+    parser.add_argument("--no-cache", action="store_true", help="regenerate even when a cached answer exists")
+    parser.add_argument("--quiet", action="store_true", help="only print the final summary")
+    args = parser.parse_args(argv)
+    if not args.files and not args.jsonl:
+        parser.error("give input files, - for stdin, or --jsonl")
+    if [args.jsonl, *args.files].count("-") > 1:
+        parser.error("stdin can only be read once")
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+
+    if args.resume and trim_partial_line(args.output):
+        print(f"✂️  Dropped an unfinished last line from {args.output}", file=sys.stderr)
+    skip = completed_ids(args.output) if args.resume else set()
+    if skip:
+        print(f"↩️  Resuming: {len(skip)} inputs already done in {args.output}", file=sys.stderr)
+    workers = {"ollama": args.ollama_workers, "gemini": args.gemini_workers, "race": args.race_workers}
+
+    chatter = open(os.devnull, "w", encoding="utf-8") if args.quiet else sys.stderr
+    output = open(args.output, "a" if args.resume else "w", encoding="utf-8") if args.output else sys.stdout
+
+    def progress(record, count):
+        if not args.quiet:
+            print(f"[{count}] {record['id']}: {record['status']} ({record['trace']['total_ms']:.0f} ms)",
+                  file=sys.stderr)
+
+    try:
+        # Results own stdout; everything the app prints goes to stderr
+        with contextlib.redirect_stdout(chatter):
+            app = clipboard_ai.ClipboardAI(clipboard=InMemoryClipboard())
+            started = time.perf_counter()
+            try:
+                results = run_batch(app, read_items(args.files, args.jsonl, args.backend), workers,
+                                    output, skip, args.no_cache, progress)
+            finally:
+                app.close()
+        elapsed = time.perf_counter() - started
+    finally:
+        if output is not sys.stdout:
+            output.close()
+        if chatter is not sys.stderr:
+            chatter.close()
+
+    print(format_summary(results, elapsed), file=sys.stderr)
+    return 1 if any(record["status"] in ("error", "cancelled") for record in results) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
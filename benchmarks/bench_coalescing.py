@@ -0,0 +1,77 @@
+"""
+Request coalescing - presses the Ollama hotkey `--presses` times, `--gap` seconds
+apart, after copying a new snippet each time (every `--repeat`-th press copies
+the previous snippet again), against the paced fake server. Reports backend
+calls, calls saved and the time until every press is answered, per
+COALESCE_WINDOW / COALESCE_MERGE setting.
+
+    python benchmarks/bench_coalescing.py [--presses 8] [--gap 0.1] [--repeat 4] [--window 0.5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import clipboard_ai  # noqa: E402
+from bench_end_to_end import configure, make_app  # noqa: E402
+from fakes import FakeOllamaServer, TokenSource  # noqa: E402
+
+
+def run(server, source, args, window, merge):
+    configure(server.url, "ollama", "http")
+    clipboard_ai.COALESCE_WINDOW = window
+    clipboard_ai.COALESCE_MERGE = merge
+    clipboard_ai.COALESCE_MAX_PARTS = args.presses
+    clipboard_ai.JOB_QUEUE_SIZE = args.presses
+    app = make_app(TokenSource())
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.process_clipboard()  # load the model outside the measurement
+        calls_before = source.requests
+        jobs = []
+        started = time.perf_counter()
+        for i in range(args.presses):
+            if not (args.repeat and i and i % args.repeat == 0):
+                app.clipboard.backend.write(f"Snippet {i + 1}: please fix the grammar in this sentence.")
+            jobs.append(app.submit(pressed_at=time.perf_counter()))
+            time.sleep(args.gap)
+        for job in {job for job in jobs if job is not None}:
+            job.done.wait()
+        elapsed = time.perf_counter() - started
+    app.close()
+    stats = app.coalescer.stats()
+    return {"calls": source.requests - calls_before, "saved": stats["saved"], "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--presses", type=int, default=8)
+    parser.add_argument("--gap", type=float, default=0.1, help="seconds between presses")
+    parser.add_argument("--repeat", type=int, default=4, help="every Nth press repeats the previous text (0 = never)")
+    parser.add_argument("--window", type=float, default=0.5, help="COALESCE_WINDOW for the batched runs")
+    parser.add_argument("--latency", type=float, default=0.2, help="fake per-request latency (s)")
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-rate", type=float, default=200.0)
+    args = parser.parse_args()
+
+    source = TokenSource(tokens=args.tokens, token_rate=args.token_rate, latency=args.latency)
+    print(f"{args.presses} presses {args.gap:g}s apart, fake model: {args.latency:g}s latency + "
+          f"{args.tokens} tokens at {args.token_rate:g} tok/s")
+    print(f"  {'setting':<34}{'backend calls':>14}{'saved':>7}{'seconds':>9}")
+    with FakeOllamaServer(source) as server:
+        for label, window, merge in (("window 0 (identical presses only)", 0.0, True),
+                                     (f"window {args.window:g}s, one prompt", args.window, True),
+                                     (f"window {args.window:g}s, sequence", args.window, False)):
+            row = run(server, source, args, window, merge)
+            print(f"  {label:<34}{row['calls']:>14}{row['saved']:>7}{row['seconds']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
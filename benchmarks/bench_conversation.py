@@ -0,0 +1,89 @@
+"""
+Follow-up mode - sends one document and then a chain of short follow-up
+presses within CONVERSATION_WINDOW to the fake backends, and reports per turn
+how much of the prompt had to be evaluated and how long the request took:
+once with the shared prefix reused (Ollama's KV cache, Gemini's implicit
+caching) and once without, as if every follow-up were processed from scratch.
+
+    python benchmarks/bench_conversation.py [--turns 6] [--words 1000] [--prompt-rate 2000]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import clipboard_ai  # noqa: E402
+from bench_end_to_end import configure, make_app  # noqa: E402
+from fakes import FakeOllamaServer, TokenSource  # noqa: E402
+from tracing import read_traces  # noqa: E402
+
+WORDS = ("the report shows revenue growth across regions while costs rose in logistics and "
+         "support so the team proposes a review of vendor contracts next quarter").split()
+FOLLOW_UPS = ("Now make it shorter.", "Turn that into three bullet points.", "Make the tone more formal.",
+              "Translate it to German.", "Add a one-line title.", "Remove the last bullet.")
+
+
+def run(args, prefix_cache):
+    """Per-turn trace dicts for each backend: {"ollama": [...], "gemini": [...]}"""
+    source = TokenSource(tokens=args.response_tokens, prompt_rate=args.prompt_rate, prefix_cache=prefix_cache)
+    gemini = TokenSource(tokens=args.response_tokens, prompt_rate=args.prompt_rate, prefix_cache=prefix_cache)
+    rng = random.Random(7)
+    document = " ".join(rng.choice(WORDS) for _ in range(args.words))
+    with tempfile.TemporaryDirectory() as tmp, FakeOllamaServer(source) as server:
+        configure(server.url, "ollama", "http")
+        clipboard_ai.CONVERSATION_WINDOW = 600
+        clipboard_ai.TRACE_ENABLED = True
+        clipboard_ai.TRACE_PATH = os.path.join(tmp, "traces.jsonl")
+        app = make_app(gemini)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for use_gemini in (False, True):
+                for turn in range(args.turns):
+                    text = document if turn == 0 else FOLLOW_UPS[(turn - 1) % len(FOLLOW_UPS)]
+                    app.clipboard.backend.write(text)
+                    app.process_clipboard(use_gemini=use_gemini)
+            app.close()
+        app.traces.close()
+        traces = list(read_traces(clipboard_ai.TRACE_PATH))
+    return {"ollama": traces[:args.turns], "gemini": traces[args.turns:]}
+
+
+def evaluated(trace):
+    """Prompt tokens the model had to process (Ollama reports only those; Gemini reports the cached share)"""
+    return (trace.get("prompt_tokens") or 0) - (trace.get("cached_tokens") or 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--turns", type=int, default=6, help="presses per backend, the first with the document")
+    parser.add_argument("--words", type=int, default=1000,
+                        help="words in the first clipboard (keep it under LARGE_INPUT_CHARS)")
+    parser.add_argument("--prompt-rate", type=float, default=2000.0, help="fake prompt evaluation, words/s")
+    parser.add_argument("--response-tokens", type=int, default=40)
+    args = parser.parse_args()
+
+    results = {"prefix reused": run(args, True), "from scratch": run(args, False)}
+    print(f"Follow-ups: {args.words}-word document, then {args.turns - 1} short follow-ups "
+          f"(prompt evaluated at {args.prompt_rate:g} words/s)")
+    for backend in ("ollama", "gemini"):
+        print(f"\n{backend:<8}{'turn':>6}" + "".join(f"{label + ' tokens':>22}{'ms':>9}" for label in results))
+        for turn in range(args.turns):
+            row = f"{'':<8}{turn + 1:>6}"
+            for traces in results.values():
+                trace = traces[backend][turn]
+                row += f"{evaluated(trace):>22}{trace['total_ms']:>9.1f}"
+            print(row)
+        totals = {label: sum(t["total_ms"] for t in traces[backend][1:]) for label, traces in results.items()}
+        print(f"{'':<8}follow-ups total: " + ", ".join(f"{label} {ms:.0f} ms" for label, ms in totals.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
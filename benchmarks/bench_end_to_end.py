@@ -0,0 +1,235 @@
+"""
+End-to-end benchmark - drives ClipboardAI.process_clipboard against the local
+stand-ins in benchmarks/fakes.py (fake Ollama server and `ollama` script, fake
+Gemini model, in-memory clipboard). Runs headless with no network.
+
+Measures:
+  overhead   - time per request with an instant model, i.e. what the app itself costs
+  burst      - a burst of hotkey presses through the job queue, per JOB_POLICY
+  memory     - peak Python allocations while processing large clipboards
+
+    python benchmarks/bench_end_to_end.py [--requests 50] [--burst 12] [--large 100000,1000000]
+                                          [--history PATH] [--max-regression 0.2] [--min-delta-ms 0.5]
+
+Results are appended to a history file; exits with status 1 if the request
+overhead got slower than the previous run by more than --max-regression.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_HISTORY = os.path.join(REPO, ".cache", "e2e_history.jsonl")
+
+import clipboard_ai  # noqa: E402
+from clipboard_io import InMemoryClipboard  # noqa: E402
+from fakes import FakeGenerativeModel, FakeOllamaServer, TokenSource, write_fake_ollama_cli  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+SAMPLE = "Rewrite this sentence so it sounds friendlier and a little shorter, please."
+
+
+def configure(ollama_url, ollama_command, backend="http"):
+    """Point the app's settings at the fakes and turn off everything that touches disk"""
+    settings = {
+        "OLLAMA_BACKEND": backend,
+        "OLLAMA_HOST": ollama_url,
+        "OLLAMA_COMMAND": ollama_command,
+        "OLLAMA_CLI_FALLBACK": False,
+        "GEMINI_AVAILABLE": True,
+        "GEMINI_API_KEY": "benchmark-key-not-used",
+        "GEMINI_FALLBACK_MODEL": "",
+        "OLLAMA_FALLBACK_MODEL": "",
+        "OLLAMA_TIERS": [],
+        "GEMINI_TIERS": [],
+        "WARMUP_ON_START": False,
+        "CACHE_ENABLED": False,
+        "TRACE_ENABLED": False,
+        "HISTORY_ENABLED": False,
+        "STREAM_TO_CLIPBOARD": False,
+        "VERBOSE": False,
+    }
+    for name, value in settings.items():
+        setattr(clipboard_ai, name, value)
+
+
+def make_app(gemini_source, text=SAMPLE):
+    with contextlib.redirect_stdout(io.StringIO()):
+        app = clipboard_ai.ClipboardAI(clipboard=InMemoryClipboard(text))
+    for routes in app.router.routes.values():
+        for route in routes:
+            if route.kind == "gemini":
+                route.backend._model = FakeGenerativeModel(gemini_source, route.model)
+    return app
+
+
+def timed_requests(app, count, use_gemini=False):
+    """Seconds per process_clipboard call (console output discarded)"""
+    times = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.process_clipboard(use_gemini=use_gemini)  # first call loads the model
+        for _ in range(count):
+            started = time.perf_counter()
+            app.process_clipboard(use_gemini=use_gemini)
+            times.append(time.perf_counter() - started)
+    return times
+
+
+def bench_overhead(server_url, cli_path, requests):
+    """Per-request cost with an instant model, per backend"""
+    results = {}
+    for label, backend, use_gemini, count in (
+        ("ollama-http", "http", False, requests),
+        ("ollama-cli", "cli", False, max(3, requests // 10)),  # one process per request
+        ("gemini", "http", True, requests),
+    ):
+        configure(server_url, cli_path, backend)
+        app = make_app(TokenSource(tokens=20))
+        times = timed_requests(app, count, use_gemini)
+        app.jobs.shutdown()
+        results[label] = {
+            "n": count,
+            "p50_ms": round(statistics.median(times) * 1000, 3),
+            "p95_ms": round(percentile(times, 95) * 1000, 3),
+        }
+    return results
+
+
+def bench_burst(server_url, cli_path, source, presses):
+    """Submit `presses` hotkey presses at once; time until every job is done"""
+    results = {}
+    generation = source.tokens / source.token_rate + source.latency
+    for policy, workers in (("queue", 1), ("parallel", 4)):
+        configure(server_url, cli_path)
+        clipboard_ai.JOB_POLICY = policy
+        clipboard_ai.JOB_QUEUE_SIZE = presses
+        clipboard_ai.OLLAMA_WORKERS = workers
+        app = make_app(TokenSource())
+        with contextlib.redirect_stdout(io.StringIO()):
+            app.process_clipboard()  # load the model outside the measurement
+            started = time.perf_counter()
+            jobs = []
+            for i in range(presses):
+                # Distinct text per press - identical presses would share one request
+                app.clipboard.backend.write(f"{SAMPLE} ({i + 1})")
+                jobs.append(app.submit(pressed_at=time.perf_counter()))
+            for job in jobs:
+                job.done.wait()
+            elapsed = time.perf_counter() - started
+        app.jobs.shutdown()
+        ideal = generation * presses / workers
+        results[policy] = {
+            "presses": presses,
+            "workers": workers,
+            "seconds": round(elapsed, 3),
+            "per_second": round(presses / elapsed, 2),
+            "efficiency": round(ideal / elapsed, 3),
+        }
+    return results
+
+
+def bench_memory(server_url, cli_path, sizes):
+    """Peak traced allocations while processing clipboards of the given sizes"""
+    results = {}
+    paragraph = "The quick brown fox jumps over the lazy dog. " * 8 + "\n\n"
+    for size in sizes:
+        configure(server_url, cli_path)
+        text = (paragraph * (size // len(paragraph) + 1))[:size]
+        app = make_app(TokenSource(tokens=20), text)
+        with contextlib.redirect_stdout(io.StringIO()):
+            tracemalloc.start()
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            app.process_clipboard()
+            elapsed = time.perf_counter() - started
+            peak = tracemalloc.get_traced_memory()[1] - base
+            tracemalloc.stop()
+        app.jobs.shutdown()
+        results[str(size)] = {
+            "seconds": round(elapsed, 3),
+            "peak_mb": round(peak / 1e6, 2),
+            "peak_per_input_byte": round(peak / size, 2),
+        }
+    return results
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--requests", type=int, default=50, help="requests per backend for the overhead test")
+    parser.add_argument("--burst", type=int, default=12, help="hotkey presses in the burst test")
+    parser.add_argument("--large", default="100000,1000000", help="clipboard sizes (chars) for the memory test")
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    parser.add_argument("--min-delta-ms", type=float, default=0.5,
+                        help="ignore slowdowns smaller than this (sub-millisecond timings are noisy)")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.large.split(",") if size.strip()]
+
+    burst_source = TokenSource(tokens=20, token_rate=400.0)  # ~50 ms per answer
+    with tempfile.TemporaryDirectory() as tmp, FakeOllamaServer(TokenSource(tokens=20)) as fast, \
+            FakeOllamaServer(burst_source) as paced:
+        cli_path = write_fake_ollama_cli(tmp, TokenSource(tokens=20))
+        print("Request overhead (instant model)")
+        overhead = bench_overhead(fast.url, cli_path, args.requests)
+        for label, row in overhead.items():
+            print(f"  {label:<14} p50 {row['p50_ms']:8.2f} ms   p95 {row['p95_ms']:8.2f} ms   (n={row['n']})")
+
+        print(f"\nBurst of {args.burst} presses (~{burst_source.tokens / burst_source.token_rate * 1000:.0f} ms per answer)")
+        burst = bench_burst(paced.url, cli_path, burst_source, args.burst)
+        for policy, row in burst.items():
+            print(f"  {policy:<9} {row['workers']} worker(s): {row['seconds']:.2f}s, "
+                  f"{row['per_second']:.1f} req/s, {row['efficiency']:.0%} of ideal")
+
+        print("\nLarge clipboards")
+        memory = bench_memory(fast.url, cli_path, sizes)
+        for size, row in memory.items():
+            print(f"  {int(size):>10,} chars: {row['seconds']:.2f}s, peak {row['peak_mb']:.1f} MB "
+                  f"({row['peak_per_input_byte']:.1f} bytes per input byte)")
+
+    record = {"ts": round(time.time(), 3), "python": sys.version.split()[0],
+              "overhead": overhead, "burst": burst, "memory": memory}
+    history = load_history(args.history)
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(record) + "\n")
+
+    if not history:
+        print(f"\nFirst run recorded in {args.history}")
+        return 0
+    previous = history[-1].get("overhead", {})
+    regressed = False
+    print("\nVersus previous run")
+    for label, row in overhead.items():
+        before = previous.get(label, {}).get("p50_ms")
+        if not before:
+            continue
+        change = row["p50_ms"] / before - 1
+        flag = ""
+        if change > args.max_regression and row["p50_ms"] - before >= args.min_delta_ms:
+            flag = "  <-- REGRESSION"
+            regressed = True
+        print(f"  {label:<14} {before:8.2f} ms -> {row['p50_ms']:8.2f} ms ({change:+.0%}){flag}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
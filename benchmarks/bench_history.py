@@ -0,0 +1,85 @@
+"""
+Clipboard history at scale - fills a throwaway history database and measures
+what the hotkey path pays to record an exchange, how fast the background
+writer commits, and search/recall latency as the history grows.
+
+    python benchmarks/bench_history.py [--entries 200000] [--queries 200]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history import HistoryStore  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+WORDS = ("error traceback widget invoice summary translate python query meeting budget deploy "
+         "customer refactor timeout cache latency report draft email schedule review").split()
+
+
+def make_text(rng, words=40):
+    # Mostly a small vocabulary, plus rarer tokens like ids and numbers
+    return " ".join(rng.choice(WORDS) if rng.random() < 0.8 else f"id{rng.randrange(100000)}"
+                    for _ in range(words))
+
+
+def timed(fn, args_list):
+    times = []
+    for args in args_list:
+        started = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def report(label, times):
+    print(f"  {label:<28} p50 {statistics.median(times) * 1000:8.3f} ms   p95 {percentile(times, 95) * 1000:8.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=200000)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = HistoryStore(os.path.join(tmp, "history.sqlite3"), max_entries=0)
+        prompts = []
+        started = time.perf_counter()
+        record_seconds = 0.0
+        for i in range(args.entries):
+            prompt, response = make_text(rng), make_text(rng, 80)
+            if i % max(1, args.entries // args.queries) == 0:
+                prompts.append(prompt)
+            began = time.perf_counter()
+            store.record(prompt, response, "ollama", "bench", "hotkey", total_ms=100.0)
+            record_seconds += time.perf_counter() - began
+            if store._queue.qsize() > 5000:
+                store.flush()  # the queue is bounded; let the writer catch up
+        store.flush()
+        elapsed = time.perf_counter() - started
+        size_mb = os.path.getsize(os.path.join(tmp, "history.sqlite3")) / 1e6
+        print(f"{args.entries:,} entries written in {elapsed:.1f}s ({args.entries / elapsed:,.0f}/s), "
+              f"{size_mb:.0f} MB on disk")
+        print(f"  record() on the hotkey path: {record_seconds / args.entries * 1e6:.1f} µs per entry "
+              f"(dropped {store.dropped})")
+
+        print(f"\nLookups over {args.entries:,} entries ({len(prompts)} queries each)")
+        report("recall, same prompt", timed(store.lookup, [(p,) for p in prompts]))
+        report("recall, edited prompt", timed(store.lookup, [(p.rsplit(" ", 3)[0] + " changed",) for p in prompts]))
+        report("search, two words", timed(store.search, [(" ".join(rng.sample(p.split(), 2)),) for p in prompts]))
+        report("search, common word", timed(store.search, [(rng.choice(WORDS),) for _ in prompts]))
+        report("get last", timed(store.get, [("last",) for _ in prompts]))
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""
+Micro-benchmark: cost of the keyboard listener callbacks per key event, before
+(modifier tuple scans, detect_letter's hasattr/vk chain, VERBOSE prints on the
+listener thread) and after (hotkeys.HotkeyDispatcher's precomputed table).
+
+Replays a stream of key events through the callbacks: everyday typing
+(letters, Shift for capitals) and shortcuts (Ctrl+C/V, the Ctrl+Shift
+hotkeys). Key objects are lightweight stand-ins for pynput's, so the numbers
+are the handler's own cost. VERBOSE output goes to a discarded buffer.
+
+    python benchmarks/bench_hotkeys.py [repeats]
+"""
+
+import contextlib
+import enum
+import io
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hotkeys import (  # noqa: E402
+    ALT, CTRL, SHIFT, DEFAULT_HOTKEYS, HotkeyDispatcher, HotkeyWorker, compile_bindings, merge_hotkeys,
+)
+
+TEXT = "The quick brown Fox jumps over the lazy Dog. Meet me at Noon on Friday, OK?"
+
+
+class Key(enum.Enum):
+    ctrl = "ctrl"
+    ctrl_l = "ctrl_l"
+    ctrl_r = "ctrl_r"
+    shift = "shift"
+    shift_l = "shift_l"
+    shift_r = "shift_r"
+    alt = "alt"
+    alt_l = "alt_l"
+    alt_r = "alt_r"
+    alt_gr = "alt_gr"
+    space = "space"
+
+
+class KeyCode:
+    __slots__ = ("char", "vk")
+
+    def __init__(self, char, vk=None):
+        self.char = char
+        self.vk = vk
+
+
+def key_for(ch, ctrl=False):
+    """What the listener reports for ch (Windows-style: Ctrl turns letters into control characters)"""
+    vk = ord(ch.upper()) if ch.isalnum() else None
+    if ctrl and ch.isalpha():
+        return KeyCode(chr(ord(ch.upper()) - 64), vk)
+    return KeyCode(ch, vk)
+
+
+def typing_events():
+    events = []
+    for ch in TEXT:
+        if ch == " ":
+            events += [("press", Key.space), ("release", Key.space)]
+            continue
+        key = key_for(ch)
+        if ch.isupper():
+            events += [("press", Key.shift_l), ("press", key), ("release", key), ("release", Key.shift_l)]
+        else:
+            events += [("press", key), ("release", key)]
+    return events
+
+
+def shortcut_events():
+    events = []
+    for combo in ("c", "v", "a", "z", "c", "v"):
+        key = key_for(combo, ctrl=True)
+        events += [("press", Key.ctrl_l), ("press", key), ("release", key), ("release", Key.ctrl_l)]
+    for letter in ("g", "h", "y"):
+        key = key_for(letter, ctrl=True)
+        events += [("press", Key.ctrl_l), ("press", Key.shift_l), ("press", key), ("release", key),
+                   ("release", Key.shift_l), ("release", Key.ctrl_l)]
+    return events
+
+
+def noop(*args):
+    pass
+
+
+def legacy_callbacks(verbose):
+    """What main() registered before: the same checks, with actions replaced by noop"""
+    ALT_KEYS = (Key.alt, Key.alt_l, Key.alt_r, Key.alt_gr)
+    state = {"ctrl": False, "shift": False, "alt": False, "triggered": False, "last": 0.0}
+
+    def detect_letter(k):
+        try:
+            if hasattr(k, 'char') and k.char:
+                ch = k.char.lower()
+                if ch in ('g', 'h', 'r', 'y', 'q', 'c', 'x'):
+                    return ch.upper()
+            if hasattr(k, 'vk'):
+                for letter, codes in (('G', (71, 0x47)), ('H', (72, 0x48)), ('Q', (81, 0x51)),
+                                      ('C', (67, 0x43)), ('X', (88, 0x58)), ('R', (82, 0x52)),
+                                      ('Y', (89, 0x59))):
+                    if k.vk in codes:
+                        if verbose and letter in 'GHQ':
+                            print(f"🔍 [DEBUG] {letter} key detected via virtual key code!")
+                        return letter
+            if hasattr(k, 'name') and isinstance(k.name, str):
+                nm = k.name.lower()
+                if nm in ('g', 'h', 'r', 'y', 'q', 'c', 'x'):
+                    return nm.upper()
+        except Exception:
+            pass
+        return None
+
+    def on_press(key):
+        if key in (Key.ctrl, Key.ctrl_l, Key.ctrl_r):
+            state["ctrl"] = True
+        if key in (Key.shift, Key.shift_l, Key.shift_r):
+            state["shift"] = True
+        if key in ALT_KEYS:
+            state["alt"] = True
+        if verbose:
+            mods = [name.upper() for name in ("ctrl", "shift", "alt") if state[name]]
+            if mods:
+                print(f"🔍 [DEBUG] Keys currently held: {' + '.join(mods)}")
+        letter = detect_letter(key)
+        if state["triggered"]:
+            return
+        if letter and state["ctrl"] and state["shift"] and letter in "GHRYX":
+            state["triggered"] = True
+            noop()
+
+    def on_release(key):
+        if key in (Key.ctrl, Key.ctrl_l, Key.ctrl_r):
+            state["ctrl"] = False
+            state["triggered"] = False
+        if key in (Key.shift, Key.shift_l, Key.shift_r):
+            state["shift"] = False
+            state["triggered"] = False
+        if key in ALT_KEYS:
+            state["alt"] = False
+        if detect_letter(key) in ('G', 'H', 'R', 'Y', 'Q', 'C', 'X'):
+            state["triggered"] = False
+
+    return on_press, on_release
+
+
+def dispatcher_callbacks(verbose, extra=0):
+    actions = {name: (None, noop) for name in set(DEFAULT_HOTKEYS.values()) | {"noop"}}
+    hotkeys = merge_hotkeys({})
+    masks = (CTRL | ALT, SHIFT | ALT, CTRL | SHIFT | ALT, ALT)
+    chars = "abcdefghijklmnopqrstuvwxyz0123456789"
+    for i in range(extra):
+        mask = masks[i // len(chars) % len(masks)]
+        combo = "+".join(name for bit, name in ((CTRL, "ctrl"), (SHIFT, "shift"), (ALT, "alt")) if mask & bit)
+        hotkeys[f"{combo}+{chars[i % len(chars)]}"] = "noop"
+    modifier_keys = {Key.ctrl: CTRL, Key.ctrl_l: CTRL, Key.ctrl_r: CTRL, Key.shift: SHIFT, Key.shift_l: SHIFT,
+                     Key.shift_r: SHIFT, Key.alt: ALT, Key.alt_l: ALT, Key.alt_r: ALT, Key.alt_gr: ALT}
+    log = HotkeyWorker()
+    dispatcher = HotkeyDispatcher(compile_bindings(hotkeys, actions), modifier_keys, log,
+                                  debounce=0.0, verbose=verbose)
+    return (dispatcher.on_press, dispatcher.on_release), log, len(hotkeys)
+
+
+def per_event(callbacks, events, repeats, log=None):
+    """ns per event; the logger's backlog is drained before the next measurement"""
+    on_press, on_release = callbacks
+    handlers = [(on_press if kind == "press" else on_release, key) for kind, key in events]
+
+    def replay():
+        for handler, key in handlers:
+            handler(key)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        seconds = min(timeit.repeat(replay, number=repeats, repeat=3))
+        if log is not None:
+            log.close(timeout=None)
+    return seconds / (repeats * len(events)) * 1e9
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    streams = {"typing": typing_events(), "shortcuts": shortcut_events()}
+    print(f"Per key event cost ({repeats} replays of each stream; "
+          + ", ".join(f"{name} {len(events)} events" for name, events in streams.items()) + ")")
+    print(f"  {'handler':<42}" + "".join(f"{name + ' ns':>14}" for name in streams))
+    rows = [("before", lambda: (legacy_callbacks(False), None, 0)),
+            ("before, VERBOSE", lambda: (legacy_callbacks(True), None, 0))]
+    for verbose, extra in ((False, 0), (True, 0), (False, 100)):
+        label = "after, {} hotkeys" + (", VERBOSE" if verbose else "")
+        rows.append((label, lambda verbose=verbose, extra=extra: dispatcher_callbacks(verbose, extra)))
+    for label, build in rows:
+        cells = []
+        for events in streams.values():
+            callbacks, log, count = build()
+            cells.append(per_event(callbacks, events, repeats, log))
+        print(f"  {label.format(count):<42}" + "".join(f"{ns:>14.0f}" for ns in cells))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
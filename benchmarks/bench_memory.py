@@ -0,0 +1,144 @@
+"""
+Peak memory per request size - processes one clipboard of each size in a fresh
+interpreter against the fake backends (with the response cache and history
+on, as in a default install) and reports how far the peak resident set size
+grew beyond the clipboard text itself. Linux (VmHWM) and macOS (ru_maxrss) only.
+
+    python benchmarks/bench_memory.py [--sizes 1000000,4000000,16000000] [--backends http,cli]
+                                      [--large-input-chars 0] [--response-tokens 20]
+
+--large-input-chars 0 sends every clipboard as one prompt; the default
+(LARGE_INPUT_CHARS from the app) splits big ones into chunks first.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+from fakes import FakeOllamaServer, TokenSource, write_fake_ollama_cli  # noqa: E402
+
+PARAGRAPH = "The quick brown fox jumps over the lazy dog at 12:00:01 near gate 7. " * 6 + "\n\n"
+
+
+def _proc_status(field):
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(field + ":"):
+                return int(line.split()[1]) / 1e3  # KiB
+    return None
+
+
+def reset_peak_rss():
+    """Start a new peak from the current RSS where the OS allows it (Linux)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    # On Linux ru_maxrss survives exec, so a child would report its parent's peak; VmHWM does not
+    if os.path.exists("/proc/self/status"):
+        return _proc_status("VmHWM")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1e6 if sys.platform == "darwin" else peak / 1e3  # bytes on macOS, KiB elsewhere
+
+
+def make_text(size):
+    # One allocation of `size` characters, so building the input leaves no higher peak behind
+    count, rest = divmod(size, len(PARAGRAPH))
+    return "".join([PARAGRAPH] * count + [PARAGRAPH[:rest]])
+
+
+def child(args):
+    """Measure one request in this (fresh) interpreter; prints a JSON result line"""
+    import clipboard_ai
+    from bench_end_to_end import configure, make_app
+
+    configure(args.url, args.cli, args.backend)
+    tmp = tempfile.mkdtemp()
+    clipboard_ai.CACHE_ENABLED = True
+    clipboard_ai.CACHE_PATH = os.path.join(tmp, "responses.sqlite3")
+    clipboard_ai.HISTORY_ENABLED = True
+    clipboard_ai.HISTORY_PATH = os.path.join(tmp, "history.sqlite3")
+    clipboard_ai.MAX_INPUT_CHARS = 0  # measure the sizes MAX_INPUT_CHARS would refuse too
+    if args.large_input_chars is not None:
+        clipboard_ai.LARGE_INPUT_CHARS = args.large_input_chars
+    app = make_app(TokenSource(tokens=args.response_tokens), "warm up the imports and connections")
+    with contextlib.redirect_stdout(io.StringIO()):
+        app.process_clipboard()
+        app.history.flush()
+        text = make_text(args.size)
+        app.clipboard.backend.write(text)
+        reset_peak_rss()
+        base = peak_rss_mb()
+        started = time.perf_counter()
+        app.process_clipboard()
+        elapsed = time.perf_counter() - started
+        app.history.flush()
+        app.close()
+    peak = peak_rss_mb()
+    print(json.dumps({"base_mb": round(base, 1), "peak_mb": round(peak, 1), "seconds": round(elapsed, 3),
+                      "input_mb": round(len(text.encode("utf-8")) / 1e6, 2)}))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sizes", default="1000000,4000000,16000000", help="clipboard sizes (chars)")
+    parser.add_argument("--backends", default="http,cli")
+    parser.add_argument("--large-input-chars", type=int, default=None)
+    parser.add_argument("--response-tokens", type=int, default=20)
+    parser.add_argument("--child", type=int, dest="size", help=argparse.SUPPRESS)
+    parser.add_argument("--backend", help=argparse.SUPPRESS)
+    parser.add_argument("--url", help=argparse.SUPPRESS)
+    parser.add_argument("--cli", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if resource is None:
+        print("ru_maxrss is not available on this platform")
+        return 2
+    if args.size is not None:
+        return child(args)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    mode = "default LARGE_INPUT_CHARS" if args.large_input_chars is None else f"LARGE_INPUT_CHARS={args.large_input_chars}"
+    print(f"Peak RSS growth per request ({mode}, {args.response_tokens}-token answers)")
+    print(f"  {'backend':<8}{'chars':>12}{'input MB':>10}{'base MB':>10}{'peak MB':>10}{'growth MB':>11}"
+          f"{'x input':>9}{'seconds':>9}")
+    with tempfile.TemporaryDirectory() as tmp, FakeOllamaServer(TokenSource(tokens=args.response_tokens)) as server:
+        cli = write_fake_ollama_cli(tmp, TokenSource(tokens=args.response_tokens))
+        for backend in args.backends.split(","):
+            for size in sizes:
+                command = [sys.executable, os.path.abspath(__file__), "--child", str(size), "--backend", backend,
+                           "--url", server.url, "--cli", cli, "--response-tokens", str(args.response_tokens)]
+                if args.large_input_chars is not None:
+                    command += ["--large-input-chars", str(args.large_input_chars)]
+                result = subprocess.run(command, capture_output=True, text=True)
+                if result.returncode != 0:
+                    print(f"  {backend:<8}{size:>12,}  failed: {result.stderr.strip()[-300:]}")
+                    continue
+                row = json.loads(result.stdout.strip().splitlines()[-1])
+                growth = row["peak_mb"] - row["base_mb"]
+                print(f"  {backend:<8}{size:>12,}{row['input_mb']:>10.1f}{row['base_mb']:>10.1f}{row['peak_mb']:>10.1f}"
+                      f"{growth:>11.1f}{growth / row['input_mb']:>9.1f}{row['seconds']:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,66 @@
+"""
+Micro-benchmark: per-request overhead of preparing a Gemini/Ollama request,
+before (model handle + prompt string rebuilt on every call) and after
+(reused GeminiBackend model, PromptTemplate compiled once).
+
+No network access is needed - GenerativeModel construction is local.
+
+    python benchmarks/bench_prompt_overhead.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gemini_backend import GeminiBackend  # noqa: E402
+from prompts import PromptTemplate  # noqa: E402
+
+SYSTEM_PROMPT = "You are a concise assistant. Answer in plain text."
+GEMINI_SYSTEM_PROMPT = ""
+CONTENT = "SELECT * FROM users WHERE age > 18;\n" * 20
+
+
+def old_prompt():
+    # What send_to_ollama/send_to_gemini did per request
+    system_prompt = GEMINI_SYSTEM_PROMPT if GEMINI_SYSTEM_PROMPT else SYSTEM_PROMPT
+    full_prompt = ""
+    if system_prompt:
+        full_prompt += f"System: {system_prompt}\n\n"
+    full_prompt += f"User: {CONTENT}\n\nAssistant:"
+    return full_prompt
+
+
+def report(label, seconds, iterations):
+    print(f"  {label:<38} {seconds / iterations * 1e6:9.2f} µs/request")
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    template = PromptTemplate(SYSTEM_PROMPT)
+    print(f"Prompt building ({iterations} iterations, {len(CONTENT)} char input)")
+    report("before: rebuild per request", timeit.timeit(old_prompt, number=iterations), iterations)
+    report("after: PromptTemplate.render", timeit.timeit(lambda: template.render(CONTENT), number=iterations),
+           iterations)
+
+    try:
+        import google.generativeai as genai
+    except ImportError:
+        print("\ngoogle-generativeai not installed - skipping model handle benchmark")
+        return
+
+    genai.configure(api_key="benchmark-key-not-used")
+    model_iterations = max(1, iterations // 100)
+    backend = GeminiBackend("benchmark-key-not-used", "gemini-2.5-pro", SYSTEM_PROMPT)
+    print(f"\nGemini model handle ({model_iterations} iterations)")
+    report("before: GenerativeModel() per request",
+           timeit.timeit(lambda: genai.GenerativeModel("gemini-2.5-pro"), number=model_iterations),
+           model_iterations)
+    report("after: reused GeminiBackend.model",
+           timeit.timeit(lambda: backend.model, number=model_iterations), model_iterations)
+
+
+if __name__ == "__main__":
+    main()
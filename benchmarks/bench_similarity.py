@@ -0,0 +1,113 @@
+"""
+Near-duplicate cache - fills a throwaway response cache and similarity index,
+then looks up edited copies of the cached texts. Copies with new timestamps,
+ids or whitespace should hit and a different text should not; in between, the
+rows show how much of an edit SIMILAR_THRESHOLD lets through. Reports hit
+rate, median similarity and lookup latency per kind of edit.
+
+    python benchmarks/bench_similarity.py [--entries 2000] [--queries 200] [--threshold 0.9]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from response_cache import ResponseCache, cache_key  # noqa: E402
+from similarity_cache import SimilarityCache, signature  # noqa: E402
+from tracing import percentile  # noqa: E402
+
+WORDS = ("error traceback widget invoice summary translate python query meeting budget deploy "
+         "customer refactor timeout cache latency report draft email schedule review").split()
+SCOPE = cache_key("ollama", "bench", "", "")
+
+
+def make_text(rng, lines=8):
+    """A log excerpt: timestamps, request ids and a few words per line"""
+    return "\n".join(
+        f"2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d} {rng.randrange(24):02d}:"
+        f"{rng.randrange(60):02d}:{rng.randrange(60):02d} [{uuid.UUID(int=rng.getrandbits(128))}] "
+        + " ".join(rng.choice(WORDS) for _ in range(rng.randrange(6, 14)))
+        for _ in range(lines))
+
+
+def new_volatile(rng, text):
+    """Same text with other timestamps and request ids"""
+    return "\n".join(make_text(rng, 1).split("] ", 1)[0] + "] " + line.split("] ", 1)[1]
+                     for line in text.splitlines())
+
+
+def new_whitespace(rng, text):
+    return "  " + text.replace(" ", "  ").replace("\n", "\n\n") + "\n"
+
+
+def changed_word(rng, text):
+    lines = text.splitlines()
+    i = rng.randrange(len(lines))
+    words = lines[i].split(" ")
+    j = rng.randrange(3, len(words))
+    words[j] = next(w for w in rng.sample(WORDS, 2) if w != words[j])
+    lines[i] = " ".join(words)
+    return "\n".join(lines)
+
+
+def changed_lines(rng, text, count=2):
+    lines = text.splitlines()
+    for i in rng.sample(range(len(lines)), count):
+        lines[i] = make_text(rng, 1)
+    return "\n".join(lines)
+
+
+def other_text(rng, text):
+    return make_text(rng)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--entries", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    args = parser.parse_args()
+    rng = random.Random(42)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(os.path.join(tmp, "responses.sqlite3"), max_entries=args.entries + 1)
+        index = SimilarityCache(cache, threshold=args.threshold, max_entries=args.entries)
+        print(f"Near-duplicate index: {args.entries:,} entries, threshold {args.threshold}, {index.engine}")
+        texts = []
+        started = time.perf_counter()
+        for i in range(args.entries):
+            text = make_text(rng)
+            texts.append(text)
+            key = cache_key("ollama", "bench", "", text)
+            cache.put(key, f"answer {i}")
+            index.add(signature(text), SCOPE, key)
+        print(f"  filled in {time.perf_counter() - started:.1f}s")
+
+        samples = rng.sample(texts, min(args.queries, len(texts)))
+        print(f"\n{'edit':<18}{'hit rate':>10}{'similarity p50':>16}{'lookup p50 ms':>15}{'p95 ms':>9}")
+        for label, edit in (("new timestamps", new_volatile), ("new whitespace", new_whitespace),
+                            ("one word changed", changed_word), ("two lines changed", changed_lines),
+                            ("different text", other_text)):
+            hits, scores, times = 0, [], []
+            for text in samples:
+                began = time.perf_counter()
+                response, similarity, _ = index.lookup(edit(rng, text), [SCOPE])
+                times.append(time.perf_counter() - began)
+                hits += response is not None
+                scores.append(similarity)
+            print(f"{label:<18}{hits / len(samples):>10.0%}{statistics.median(scores):>16.3f}"
+                  f"{statistics.median(times) * 1000:>15.3f}{percentile(times, 95) * 1000:>9.3f}")
+        print(f"\nTotals: {index.describe()}")
+        index.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
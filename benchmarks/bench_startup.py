@@ -0,0 +1,125 @@
+"""
+Startup benchmark - measures how long `import clipboard_ai` (plus the modules
+only needed once the hotkey listener starts) takes in a fresh interpreter,
+and appends the result to a history file so regressions show up over time.
+
+    python benchmarks/bench_startup.py [--runs 10] [--history PATH] [--max-regression 0.2]
+
+Exits with status 1 if the median got slower than the previous recorded run
+by more than --max-regression (a fraction, default 20%).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_HISTORY = os.path.join(REPO, ".cache", "startup_history.jsonl")
+
+# Each target is imported in its own fresh interpreter
+TARGETS = {
+    "clipboard_ai": "import clipboard_ai",
+    "clipboard_ai+pynput": "import clipboard_ai, pynput.keyboard",
+    "google.generativeai": "import google.generativeai",
+}
+
+
+def run_once(code):
+    """Wall time of one interpreter running `code`, plus its -X importtime log"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO, capture_output=True, text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        return None, proc.stderr.strip().splitlines()[-1:] or ["failed"]
+    return elapsed, proc.stderr
+
+
+def slowest_imports(importtime_log, count=8):
+    """Top modules imported directly by the target, by cumulative import time"""
+    rows = []
+    for line in importtime_log.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        try:
+            _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+            rows.append((int(cumulative_us), name))
+        except ValueError:
+            continue
+    # -X importtime indents nested imports by two spaces per level; the target's
+    # direct imports sit at three spaces, which avoids double counting
+    direct = [(us, name.strip()) for us, name in rows if len(name) - len(name.lstrip()) == 3]
+    return sorted(direct, reverse=True)[:count]
+
+
+def baseline(runs):
+    """Bare interpreter startup, subtracted from the other numbers"""
+    times = [run_once("pass")[0] for _ in range(runs)]
+    return statistics.median(times)
+
+
+def last_result(history_path):
+    if not os.path.exists(history_path):
+        return None
+    with open(history_path, encoding="utf-8") as f:
+        lines = [line for line in f if line.strip()]
+    return json.loads(lines[-1]) if lines else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--history", default=DEFAULT_HISTORY)
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    interpreter = baseline(args.runs)
+    print(f"Python interpreter startup: {interpreter * 1000:.1f} ms (subtracted below)\n")
+
+    result = {"timestamp": time.time(), "python": sys.version.split()[0], "targets": {}}
+    for label, code in TARGETS.items():
+        times, log = [], ""
+        for _ in range(args.runs):
+            elapsed, log = run_once(code)
+            if elapsed is None:
+                break
+            times.append(elapsed - interpreter)
+        if not times:
+            print(f"{label:<22} skipped ({log[0]})")
+            continue
+        median = statistics.median(times)
+        result["targets"][label] = {"median_ms": median * 1000, "max_ms": max(times) * 1000}
+        print(f"{label:<22} median {median * 1000:7.1f} ms   max {max(times) * 1000:7.1f} ms")
+        for cumulative_us, name in slowest_imports(log, 5):
+            print(f"    {cumulative_us / 1000:7.1f} ms  {name}")
+
+    previous = last_result(args.history)
+    os.makedirs(os.path.dirname(os.path.abspath(args.history)), exist_ok=True)
+    with open(args.history, "a", encoding="utf-8") as f:
+        f.write(json.dumps(result) + "\n")
+    print(f"\nRecorded in {args.history}")
+
+    regressed = False
+    if previous:
+        print("\nChange since previous run:")
+        for label, now in result["targets"].items():
+            before = previous.get("targets", {}).get(label)
+            if not before or before["median_ms"] <= 0:
+                continue
+            change = (now["median_ms"] - before["median_ms"]) / before["median_ms"]
+            flag = ""
+            if change > args.max_regression:
+                flag = "  <-- regression"
+                regressed = True
+            print(f"  {label:<22} {before['median_ms']:7.1f} -> {now['median_ms']:7.1f} ms ({change:+.0%}){flag}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
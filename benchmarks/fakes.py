@@ -0,0 +1,328 @@
+"""
+Local stand-ins for the model backends, so ClipboardAI can be driven end to end
+without Ollama, a Gemini key, a desktop clipboard or network access.
+
+  FakeOllamaServer      - /api/generate, /api/chat and /api/version on 127.0.0.1,
+                          streaming NDJSON like the real server
+  write_fake_ollama_cli - an `ollama`-compatible script for the `ollama run` path
+  FakeGenerativeModel   - drop-in for google.generativeai.GenerativeModel
+
+Each produces `tokens` tokens at `token_rate` tokens/s (0 = as fast as possible)
+after a one-off `startup_delay` (model load) and a per-request `latency`. Prompt
+words are evaluated at `prompt_rate` words/s, except for the prefix shared with
+the model's previous prompt (`prefix_cache`, like Ollama's KV cache and Gemini's
+implicit caching).
+
+Run a fake server on its own for manual testing:
+
+    python benchmarks/fakes.py serve [--port 11434] [--token-rate 50] [--startup-delay 2] [--prompt-rate 500]
+"""
+
+import argparse
+import json
+import os
+import re
+import socket
+import stat
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class TokenSource:
+    """Timing shared by the fakes: one-off load delay, per-request latency, token pacing"""
+
+    def __init__(self, tokens=40, token_rate=0.0, startup_delay=0.0, latency=0.0, prompt_rate=0.0,
+                 prefix_cache=True):
+        self.tokens = tokens
+        self.token_rate = token_rate
+        self.startup_delay = startup_delay
+        self.latency = latency
+        self.prompt_rate = prompt_rate
+        self.prefix_cache = prefix_cache
+        self.requests = 0
+        self._loaded = set()
+        self._last_prompt = {}
+        self._lock = threading.Lock()
+
+    def load(self, model):
+        """Sleep for the startup delay the first time a model is used; returns seconds slept"""
+        with self._lock:
+            self.requests += 1
+            first = model not in self._loaded
+            self._loaded.add(model)
+        delay = (self.startup_delay if first else 0.0) + self.latency
+        if delay:
+            time.sleep(delay)
+        return self.startup_delay if first else 0.0
+
+    def evaluate(self, model, words):
+        """Sleep for evaluating the prompt words after the prefix shared with the model's
+        previous prompt; returns (words evaluated, seconds)"""
+        with self._lock:
+            previous = self._last_prompt.get(model, ()) if self.prefix_cache else ()
+            self._last_prompt[model] = words
+        shared = 0
+        for old, new in zip(previous, words):
+            if old != new:
+                break
+            shared += 1
+        count = len(words) - shared
+        seconds = count / self.prompt_rate if self.prompt_rate else 0.0
+        if seconds:
+            time.sleep(seconds)
+        return count, seconds
+
+    def pieces(self, prompt):
+        """Yield the answer token by token, paced at token_rate; a multi-part prompt gets one
+        '### Part N' section per part, like a model following its instructions"""
+        interval = 1.0 / self.token_rate if self.token_rate else 0.0
+        words = prompt.split()[:8] or ["ok"]
+        parts = len(re.findall(r"^### Part \d+$", prompt, re.M))
+        per_part = max(1, self.tokens // parts) if parts else 0
+        for i in range(self.tokens):
+            if interval:
+                time.sleep(interval)
+            if per_part and i % per_part == 0 and i // per_part < parts:
+                yield ("" if i == 0 else "\n\n") + f"### Part {i // per_part + 1}\n" + words[i % len(words)]
+            else:
+                yield ("" if i == 0 else " ") + words[i % len(words)]
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real server
+
+    def setup(self):
+        super().setup()
+        # Like the real (Go) server: no Nagle delay between the small NDJSON writes
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, data, status=200):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _chunk(self, data):
+        line = json.dumps(data).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-fake"})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        source = self.server.source
+        if self.path == "/api/generate":
+            prompt = payload.get("prompt") or ""
+            # Rendered with the chat template like a one-message chat, as the real server does
+            messages = [{"role": "system", "content": payload["system"]}] if payload.get("system") else []
+            messages.append({"role": "user", "content": prompt})
+
+            def wrap(text):
+                return {"response": text}
+        elif self.path == "/api/chat":
+            messages = payload.get("messages") or []
+            prompt = messages[-1]["content"] if messages else ""
+
+            def wrap(text):
+                return {"message": {"role": "assistant", "content": text}}
+        else:
+            self._send_json({"error": "not found"}, 404)
+            return
+
+        started = time.perf_counter()
+        load_seconds = source.load(payload.get("model", ""))
+        final = {"done": True, "load_duration": int(load_seconds * 1e9)}
+        if self.path == "/api/generate" and "prompt" not in payload:
+            # An empty request just loads the model
+            self._send_json(dict(final, response=""))
+            return
+        words = " ".join(f"{m['role']}: {m['content']}" for m in messages).split()
+        evaluated, eval_seconds = source.evaluate(payload.get("model", ""), words)
+        final.update(prompt_eval_count=evaluated, prompt_eval_duration=int(eval_seconds * 1e9))
+        if not payload.get("stream", True):
+            text = "".join(source.pieces(prompt))
+            final.update(wrap(text), eval_count=source.tokens,
+                         eval_duration=int((time.perf_counter() - started) * 1e9))
+            self._send_json(final)
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for piece in source.pieces(prompt):
+                self._chunk(dict(wrap(piece), done=False))
+            final.update(wrap(""), eval_count=source.tokens,
+                         eval_duration=int((time.perf_counter() - started) * 1e9))
+            self._chunk(final)
+            self.wfile.write(b"0\r\n\r\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+
+
+class FakeOllamaServer:
+    """A threaded fake Ollama server; use as a context manager or call start()/stop()"""
+
+    def __init__(self, source=None, port=0):
+        self.source = source or TokenSource()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), _Handler)
+        self._server.daemon_threads = True
+        self._server.source = self.source
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+_CLI_SCRIPT = '''#!{python}
+# Fake `ollama` for benchmarks: `run <model> [...]` reads the prompt from stdin and
+# prints {tokens} tokens at {token_rate} tokens/s after a {startup_delay}s start-up delay.
+import sys, time
+if len(sys.argv) > 1 and sys.argv[1] == "--version":
+    print("ollama version is 0.0.0-fake")
+    sys.exit(0)
+words = sys.stdin.read().split()[:8] or ["ok"]
+time.sleep({startup_delay} + {latency})
+interval = 1.0 / {token_rate} if {token_rate} else 0.0
+for i in range({tokens}):
+    if interval:
+        time.sleep(interval)
+    sys.stdout.write(("" if i == 0 else " ") + words[i % len(words)] + ("\\n" if i % 10 == 9 else ""))
+    sys.stdout.flush()
+sys.stdout.write("\\n")
+'''
+
+
+def write_fake_ollama_cli(directory, source=None):
+    """Write an executable fake `ollama` into directory and return its path.
+
+    A new process starts for every request, so the startup delay is paid each time,
+    like `ollama run` reattaching to the server.
+    """
+    source = source or TokenSource()
+    path = os.path.join(directory, "ollama")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(_CLI_SCRIPT.format(python=sys.executable, tokens=source.tokens, token_rate=source.token_rate,
+                                   startup_delay=source.startup_delay, latency=source.latency))
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+    return path
+
+
+class _Usage:
+    def __init__(self, prompt_tokens, output_tokens, cached_tokens=0):
+        self.prompt_token_count = prompt_tokens
+        self.candidates_token_count = output_tokens
+        self.cached_content_token_count = cached_tokens
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Response:
+    """Mimics GenerateContentResponse: .text, iteration when streaming, usage_metadata"""
+
+    def __init__(self, pieces, usage, stream):
+        self._pieces = pieces
+        self._usage = usage
+        self.usage_metadata = None
+        self.text = None if stream else "".join(pieces)
+        if not stream:
+            self.usage_metadata = usage
+
+    def __iter__(self):
+        for piece in self._pieces:
+            yield _Chunk(piece)
+        self.usage_metadata = self._usage
+
+
+class _ChatSession:
+    """Mimics ChatSession.send_message: the history is sent again with every message"""
+
+    def __init__(self, model, history):
+        self.model = model
+        self.history = list(history or ())
+
+    def send_message(self, content, stream=False):
+        words = [word for turn in self.history for part in turn["parts"] for word in part.split()]
+        return self.model._respond(words, content, stream)
+
+
+class FakeGenerativeModel:
+    """Stand-in for google.generativeai.GenerativeModel (generate_content and start_chat)"""
+
+    def __init__(self, source=None, model_name="gemini-fake"):
+        self.source = source or TokenSource()
+        self.model_name = model_name
+
+    def _respond(self, history_words, content, stream):
+        self.source.load(self.model_name)
+        words = history_words + content.split()
+        evaluated, _ = self.source.evaluate(self.model_name, words)
+        pieces = self.source.pieces(content)
+        if not stream:
+            pieces = list(pieces)
+        return _Response(pieces, _Usage(len(words), self.source.tokens, len(words) - evaluated), stream)
+
+    def generate_content(self, content, stream=False):
+        return self._respond([], content, stream)
+
+    def start_chat(self, history=None):
+        return _ChatSession(self, history)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a fake Ollama server")
+    parser.add_argument("command", choices=["serve"])
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens", type=int, default=40)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--startup-delay", type=float, default=0.0)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--prompt-rate", type=float, default=0.0)
+    args = parser.parse_args(argv)
+    source = TokenSource(args.tokens, args.token_rate, args.startup_delay, args.latency, args.prompt_rate)
+    server = FakeOllamaServer(source, port=args.port).start()
+    print(f"Fake Ollama listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
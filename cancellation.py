@@ -0,0 +1,62 @@
+"""
+Cancellation tokens shared by the job queue and the backends.
+
+A token is handed to a request when it starts. Backends register callbacks
+on it that interrupt whatever they are blocked on (close the HTTP socket,
+kill the `ollama run` process), so cancelling takes effect immediately
+instead of at the next token.
+"""
+
+import threading
+
+
+class RequestCancelled(Exception):
+    """The request was cancelled before it finished"""
+
+
+class CancelToken:
+    """Thread-safe cancellation flag with abort callbacks"""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = ""
+
+    def cancel(self, reason="cancelled"):
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        return self._event.wait(timeout)
+
+    def add_callback(self, callback):
+        """Run callback on cancel (immediately if already cancelled)"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback):
+        with self._lock:
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise RequestCancelled(self.reason)
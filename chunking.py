@@ -0,0 +1,188 @@
+"""
+Large-clipboard support - split big inputs into token-sized chunks at natural
+boundaries, run the chunks concurrently (map) and merge the partial answers
+(reduce).
+"""
+
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cancellation import CancelToken
+
+# Rough average for English text and code; only used to size chunks
+CHARS_PER_TOKEN = 4
+
+# A fenced code block, kept whole when it fits in one chunk
+_CODE_FENCE = re.compile(r"```.*?(?:```|\Z)", re.S)
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# Blank lines between paragraphs
+_PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+
+
+def _paragraphs(text, start, end):
+    """Non-blank paragraphs of text[start:end], without copying that span first"""
+    for match in _PARAGRAPH_BREAK.finditer(text, start, end):
+        paragraph = text[start:match.start()]
+        if paragraph and not paragraph.isspace():
+            yield paragraph
+        start = match.end()
+    paragraph = text[start:end]
+    if paragraph and not paragraph.isspace():
+        yield paragraph
+
+
+def _blocks(text):
+    """Yield paragraphs and fenced code blocks (kept as single blocks) in order"""
+    pos = 0
+    for match in _CODE_FENCE.finditer(text):
+        yield from _paragraphs(text, pos, match.start())
+        yield match.group(0)
+        pos = match.end()
+    yield from _paragraphs(text, pos, len(text))
+
+
+def _split_oversized(block, max_chars):
+    """Break a block that is too big on its own: by lines, then hard cuts"""
+    pieces = []
+    current = ""
+    for line in block.splitlines(keepends=True):
+        while len(line) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(line[:max_chars])
+            line = line[max_chars:]
+        if len(current) + len(line) > max_chars and current:
+            pieces.append(current)
+            current = ""
+        current += line
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_into_chunks(text, max_tokens=2000):
+    """Pack paragraphs/code blocks/lines into chunks of at most ~max_tokens"""
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    if len(text) <= max_chars:
+        return [text]
+
+    chunks = []
+    current = []
+    size = 0
+    for block in _blocks(text):
+        pieces = [block] if len(block) <= max_chars else _split_oversized(block, max_chars)
+        for piece in pieces:
+            extra = len(piece) + (2 if current else 0)
+            if current and size + extra > max_chars:
+                chunks.append("\n\n".join(current))
+                current, size = [], 0
+                extra = len(piece)
+            current.append(piece)
+            size += extra
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def map_prompt(chunk, index, total):
+    return (
+        f"The following is part {index} of {total} of a larger input. "
+        f"Handle this part on its own; the parts will be combined afterwards.\n\n{chunk}"
+    )
+
+
+def reduce_prompt(partials):
+    parts = "\n\n".join(f"--- Part {i} ---\n{text}" for i, text in enumerate(partials, 1))
+    return (
+        f"Below are the answers for {len(partials)} consecutive parts of one large input. "
+        f"Merge them into a single coherent answer, removing repetition.\n\n{parts}"
+    )
+
+
+def _reduce_groups(partials, max_chars):
+    """Consecutive runs of partials whose merge prompt stays within max_chars (at least
+    two per run when any two fit, otherwise pairs, so every round shrinks the list)"""
+    groups = []
+    current, size = [], 0
+    for text in partials:
+        extra = len(text) + 20  # the "--- Part N ---" header
+        if current and size + extra > max_chars:
+            groups.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += extra
+    groups.append(current)
+    if len(groups) == len(partials):
+        groups = [partials[i:i + 2] for i in range(0, len(partials), 2)]
+    return groups
+
+
+def reduce_in_rounds(partials, reduce_fn, max_tokens=2000, cancel=None):
+    """Merge the partial answers with reduce_fn(prompt, cancel), a chunk's worth at a time:
+    answers that do not fit in one merge prompt are merged in groups, then the group
+    answers are merged, until one answer is left"""
+    max_chars = max(1, max_tokens * CHARS_PER_TOKEN)
+    while len(partials) > 1:
+        merged = []
+        for group in _reduce_groups(partials, max_chars):
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            merged.append(group[0] if len(group) == 1 else reduce_fn(reduce_prompt(group), cancel))
+        partials = merged
+    return partials[0]
+
+
+def map_reduce(chunks, map_fn, reduce_fn=None, parallelism=2, on_progress=None, cancel=None,
+               max_tokens=2000):
+    """Run map_fn(prompt, cancel) over the chunks with bounded parallelism, then reduce.
+
+    on_progress(index, total, chunk_chars, seconds) is called as each chunk finishes.
+    Returns the reduced answer (or the partial answers joined, without reduce_fn); merge
+    prompts are kept to ~max_tokens, like the chunks.
+    """
+    total = len(chunks)
+    results = [None] * total
+    # Chunks share a token of their own so one failure stops the rest
+    # without marking the caller's request as cancelled
+    chunk_cancel = CancelToken()
+    if cancel is not None:
+        cancel.add_callback(chunk_cancel.cancel)
+
+    def run(index):
+        chunk_cancel.raise_if_cancelled()
+        started = time.perf_counter()
+        results[index] = map_fn(map_prompt(chunks[index], index + 1, total), chunk_cancel)
+        return index, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=max(1, parallelism), thread_name_prefix="chunk") as pool:
+        futures = [pool.submit(run, i) for i in range(total)]
+        try:
+            for future in as_completed(futures):
+                index, seconds = future.result()  # re-raises the first failure
+                if on_progress is not None:
+                    on_progress(index + 1, total, len(chunks[index]), seconds)
+        except BaseException:
+            chunk_cancel.cancel("another chunk failed")
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            if cancel is not None:
+                cancel.remove_callback(chunk_cancel.cancel)
+
+    if cancel is not None:
+        cancel.raise_if_cancelled()
+    if any(not r for r in results):
+        missing = sum(1 for r in results if not r)
+        raise RuntimeError(f"{missing} of {total} chunks returned no answer")
+    if reduce_fn is None or total == 1:
+        return "\n\n".join(results)
+    return reduce_in_rounds(results, reduce_fn, max_tokens, cancel)
+
@@ -3,176 +3,511 @@ Local AI Clipboard - Send clipboard content to Ollama and get AI response back
 Hotkey: Ctrl+Shift+G
 """
 
-import pyperclip
-import subprocess
-import re
-from pynput import keyboard
-from pynput.keyboard import Key
-import sys
 import time
+_STARTUP_T0 = time.perf_counter()
+
+import importlib.util
+import sys
+import threading
+
+from startup_timing import StartupTimer
 
-# Try to load config, fall back to defaults
+# Heavy third-party modules (pyperclip, pynput, google.generativeai) are imported
+# on first use, so e.g. the Gemini SDK costs nothing if only Ollama is used.
+STARTUP = StartupTimer(_STARTUP_T0)
+# Dependencies come before the modules that import them, so each line is that module's own cost
+for _module in ("cancellation", "text_slices", "prompts", "streaming", "ollama_backend", "gemini_backend",
+                "job_queue", "response_cache", "warmup", "chunking", "clipboard_io", "tracing", "racing",
+                "routing", "model_tiers", "history", "conversation", "coalescing", "hotkeys"):
+    STARTUP.import_module(_module)
+
+from cancellation import RequestCancelled
+from chunking import estimate_tokens, map_reduce, split_into_chunks
+from clipboard_io import ClipboardError, ClipboardIO, create_clipboard
+from coalescing import Coalescer
+from conversation import ConversationTracker
+from gemini_backend import GeminiBackend
+from history import HistoryStore
+from hotkeys import ALT, CTRL, SHIFT, HotkeyDispatcher, HotkeyWorker, compile_bindings, merge_hotkeys
+from job_queue import JobEngine
+from model_tiers import load_tiers, select_tier
+from prompts import chat_messages, multi_part_prompt, normalize_system_prompt, split_parts
+from racing import race
+from routing import BackendHealth, Route, Router, is_rate_limited
+from ollama_backend import (
+    OllamaCLIBackend, OllamaError, OllamaTimeout, OllamaUnavailable, create_ollama_backend,
+)
+from response_cache import ResponseCache, cache_key
+from streaming import ClipboardStreamWriter, StreamStats, consume_stream
+from text_slices import is_blank
+from tracing import RequestTrace, TraceWriter
+from warmup import ModelWarmer
+
+# Read each setting on its own, so a config.py written for an older version (without the
+# newer settings) keeps its values and only the missing settings fall back to defaults
+_config_started = time.perf_counter()
 try:
-    from config import MODEL, SYSTEM_PROMPT, TIMEOUT, VERBOSE
-    from config import GEMINI_API_KEY, GEMINI_MODEL, GEMINI_SYSTEM_PROMPT
-    OLLAMA_MODEL = MODEL
+    import config as _config
 except ImportError:
-    OLLAMA_MODEL = "llama3.2"
-    SYSTEM_PROMPT = ""
-    TIMEOUT = 120
-    VERBOSE = True
-    GEMINI_API_KEY = ""
-    GEMINI_MODEL = "gemini-2.0-flash-exp"
-    GEMINI_SYSTEM_PROMPT = ""
+    _config = None
+
+
+def _setting(name, default):
+    return getattr(_config, name, default)
+
+
+OLLAMA_MODEL = _setting("MODEL", "llama3.2")
+SYSTEM_PROMPT = _setting("SYSTEM_PROMPT", "")
+TIMEOUT = _setting("TIMEOUT", 120)
+VERBOSE = _setting("VERBOSE", True)
+HOTKEYS = _setting("HOTKEYS", {})
+OLLAMA_BACKEND = _setting("OLLAMA_BACKEND", "http")
+OLLAMA_HOST = _setting("OLLAMA_HOST", "http://localhost:11434")
+OLLAMA_KEEP_ALIVE = _setting("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_CLI_FALLBACK = _setting("OLLAMA_CLI_FALLBACK", True)
+WARMUP_ON_START = _setting("WARMUP_ON_START", True)
+WARMUP_PING_INTERVAL = _setting("WARMUP_PING_INTERVAL", 240)
+STREAMING = _setting("STREAMING", True)
+STREAM_TO_CLIPBOARD = _setting("STREAM_TO_CLIPBOARD", False)
+STREAM_CLIPBOARD_INTERVAL = _setting("STREAM_CLIPBOARD_INTERVAL", 0.5)
+CACHE_ENABLED = _setting("CACHE_ENABLED", True)
+CACHE_PATH = _setting("CACHE_PATH", ".cache/responses.sqlite3")
+CACHE_MAX_MB = _setting("CACHE_MAX_MB", 50)
+CACHE_MAX_ENTRIES = _setting("CACHE_MAX_ENTRIES", 2000)
+CACHE_TTL = _setting("CACHE_TTL", 7 * 24 * 3600)
+SIMILAR_CACHE_ENABLED = _setting("SIMILAR_CACHE_ENABLED", False)
+SIMILAR_THRESHOLD = _setting("SIMILAR_THRESHOLD", 0.9)
+JOB_POLICY = _setting("JOB_POLICY", "queue")
+JOB_QUEUE_SIZE = _setting("JOB_QUEUE_SIZE", 4)
+OLLAMA_WORKERS = _setting("OLLAMA_WORKERS", 1)
+GEMINI_WORKERS = _setting("GEMINI_WORKERS", 2)
+COALESCE_WINDOW = _setting("COALESCE_WINDOW", 0.0)
+COALESCE_MERGE = _setting("COALESCE_MERGE", True)
+COALESCE_MAX_PARTS = _setting("COALESCE_MAX_PARTS", 4)
+GEMINI_API_KEY = _setting("GEMINI_API_KEY", "")
+GEMINI_MODEL = _setting("GEMINI_MODEL", "gemini-2.0-flash-exp")
+GEMINI_SYSTEM_PROMPT = _setting("GEMINI_SYSTEM_PROMPT", "")
+STARTUP_BUDGET_MS = _setting("STARTUP_BUDGET_MS", 1000)
+LARGE_INPUT_CHARS = _setting("LARGE_INPUT_CHARS", 12000)
+MAX_INPUT_CHARS = _setting("MAX_INPUT_CHARS", 1_000_000)
+CHUNK_MAX_TOKENS = _setting("CHUNK_MAX_TOKENS", 2000)
+CHUNK_PARALLELISM_OLLAMA = _setting("CHUNK_PARALLELISM_OLLAMA", 2)
+CHUNK_PARALLELISM_GEMINI = _setting("CHUNK_PARALLELISM_GEMINI", 4)
+LARGE_INPUT_REDUCE = _setting("LARGE_INPUT_REDUCE", True)
+CLIPBOARD_BACKEND = _setting("CLIPBOARD_BACKEND", "system")
+CLIPBOARD_VERIFY = _setting("CLIPBOARD_VERIFY", "auto")
+CLIPBOARD_VERIFY_TIMEOUT = _setting("CLIPBOARD_VERIFY_TIMEOUT", 0.25)
+TRACE_ENABLED = _setting("TRACE_ENABLED", True)
+TRACE_PATH = _setting("TRACE_PATH", ".cache/traces.jsonl")
+TRACE_MAX_MB = _setting("TRACE_MAX_MB", 5)
+TRACE_BACKUPS = _setting("TRACE_BACKUPS", 3)
+RACE_FIRST = _setting("RACE_FIRST", "ollama")
+RACE_HEDGE_DELAY = _setting("RACE_HEDGE_DELAY", 0.0)
+ROUTER_FALLBACK = _setting("ROUTER_FALLBACK", True)
+OLLAMA_FALLBACK_MODEL = _setting("OLLAMA_FALLBACK_MODEL", "")
+GEMINI_FALLBACK_MODEL = _setting("GEMINI_FALLBACK_MODEL", "")
+CIRCUIT_FAILURE_THRESHOLD = _setting("CIRCUIT_FAILURE_THRESHOLD", 3)
+CIRCUIT_BACKOFF = _setting("CIRCUIT_BACKOFF", 10)
+CIRCUIT_MAX_BACKOFF = _setting("CIRCUIT_MAX_BACKOFF", 300)
+OLLAMA_TIERS = _setting("OLLAMA_TIERS", [])
+GEMINI_TIERS = _setting("GEMINI_TIERS", [])
+DAEMON_HOST = _setting("DAEMON_HOST", "127.0.0.1")
+DAEMON_PORT = _setting("DAEMON_PORT", 8765)
+DAEMON_SOCKET = _setting("DAEMON_SOCKET", "")
+USE_DAEMON = _setting("USE_DAEMON", False)
+HISTORY_ENABLED = _setting("HISTORY_ENABLED", False)
+HISTORY_PATH = _setting("HISTORY_PATH", ".cache/history.sqlite3")
+HISTORY_MAX_ENTRIES = _setting("HISTORY_MAX_ENTRIES", 200000)
+CONVERSATION_WINDOW = _setting("CONVERSATION_WINDOW", 0)
+CONVERSATION_MAX_TURNS = _setting("CONVERSATION_MAX_TURNS", 8)
+STARTUP.phases.append(("import config", time.perf_counter() - _config_started))
 
 OLLAMA_COMMAND = "ollama"
 
-# Import Gemini if API key is configured
+# Resolve the effective system prompts once instead of on every request
+SYSTEM_PROMPT = normalize_system_prompt(SYSTEM_PROMPT)
+GEMINI_SYSTEM_PROMPT = normalize_system_prompt(GEMINI_SYSTEM_PROMPT) or SYSTEM_PROMPT
+
+# Gemini is usable if an API key is configured and the SDK is installed; the SDK
+# itself is only imported (and configured) by the first Gemini request
+GEMINI_AVAILABLE = False
 if GEMINI_API_KEY:
     try:
-        import google.generativeai as genai
-        genai.configure(api_key=GEMINI_API_KEY)
-        GEMINI_AVAILABLE = True
+        GEMINI_AVAILABLE = importlib.util.find_spec("google.generativeai") is not None
     except ImportError:
+        GEMINI_AVAILABLE = False
+    if not GEMINI_AVAILABLE:
         # Avoid non-ASCII emoji here to prevent UnicodeEncodeError on some Windows consoles
         print("Warning: google-generativeai not installed. Run: pip install google-generativeai")
-        GEMINI_AVAILABLE = False
-else:
-    GEMINI_AVAILABLE = False
+
+def open_cache():
+    """Open the on-disk response cache, or return None if it is disabled or unusable"""
+    if not CACHE_ENABLED:
+        return None
+    try:
+        return ResponseCache(CACHE_PATH, max_bytes=int(CACHE_MAX_MB * 1024 * 1024),
+                             max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL)
+    except Exception as e:
+        print(f"⚠️  Response cache disabled: {e}")
+        return None
+
+def open_similar_cache(cache):
+    """Open the near-duplicate index over cache, or return None if it is disabled or unusable"""
+    if not SIMILAR_CACHE_ENABLED or cache is None:
+        return None
+    try:
+        from similarity_cache import SimilarityCache  # imports NumPy when available
+        return SimilarityCache(cache, threshold=SIMILAR_THRESHOLD, max_entries=CACHE_MAX_ENTRIES)
+    except Exception as e:
+        print(f"⚠️  Near-duplicate cache disabled: {e}")
+        return None
+
+def open_history():
+    """Open the clipboard history, or return None if it is disabled or unusable"""
+    if not HISTORY_ENABLED:
+        return None
+    try:
+        return HistoryStore(HISTORY_PATH, max_entries=HISTORY_MAX_ENTRIES)
+    except Exception as e:
+        print(f"⚠️  Clipboard history disabled: {e}")
+        return None
 
 class ClipboardAI:
-    def __init__(self):
-        self.processing = False
+    def __init__(self, clipboard=None):
+        self._lock = threading.Lock()
+        self.clipboard = ClipboardIO(
+            clipboard if clipboard is not None else create_clipboard(CLIPBOARD_BACKEND),
+            verify=CLIPBOARD_VERIFY, verify_timeout=CLIPBOARD_VERIFY_TIMEOUT,
+        )
+        self.active_requests = 0
         self.hotkey_pressed_count = 0
         self.gemini_pressed_count = 0
+        self.race_pressed_count = 0
+        self.race_wins = {"ollama": 0, "gemini": 0}
+        self.ollama = create_ollama_backend(
+            OLLAMA_BACKEND, OLLAMA_MODEL, host=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE,
+            timeout=TIMEOUT, command=OLLAMA_COMMAND,
+        )
+        self.ollama_fallback = None
+        if OLLAMA_CLI_FALLBACK and self.ollama.name != "cli":
+            self.ollama_fallback = OllamaCLIBackend(OLLAMA_MODEL, command=OLLAMA_COMMAND, timeout=TIMEOUT)
+        self.cache = open_cache()
+        self.similar = open_similar_cache(self.cache)
+        self.history = open_history()
+        self.conversations = None
+        if CONVERSATION_WINDOW:
+            self.conversations = ConversationTracker(CONVERSATION_WINDOW, CONVERSATION_MAX_TURNS)
+        self.traces = None
+        if TRACE_ENABLED:
+            try:
+                self.traces = TraceWriter(TRACE_PATH, max_bytes=int(TRACE_MAX_MB * 1024 * 1024),
+                                          backups=TRACE_BACKUPS)
+            except OSError as e:
+                print(f"⚠️  Request traces disabled: {e}")
+        self.gemini = GeminiBackend(GEMINI_API_KEY, GEMINI_MODEL, GEMINI_SYSTEM_PROMPT) if GEMINI_AVAILABLE else None
+        self.router = self._build_router()
+        self.tiers = {"ollama": load_tiers(OLLAMA_TIERS), "gemini": load_tiers(GEMINI_TIERS)}
+        self._tier_routes = {}
+        self.warmer = None
+        if WARMUP_ON_START:
+            self.warmer = ModelWarmer(self.ollama, ping_interval=WARMUP_PING_INTERVAL, verbose=VERBOSE).start()
+        self.jobs = JobEngine(
+            {"ollama": OLLAMA_WORKERS, "gemini": GEMINI_WORKERS, "race": 1},
+            max_queue=JOB_QUEUE_SIZE, policy=JOB_POLICY, on_error=self._job_failed,
+        )
+        self.coalescer = Coalescer(COALESCE_WINDOW, COALESCE_MAX_PARTS, COALESCE_MERGE)
         print("\n" + "="*60)
         print("🚀 LOCAL AI CLIPBOARD STARTED SUCCESSFULLY!")
         print("="*60)
         print(f"📋 Ollama model: {OLLAMA_MODEL}")
+        print(f"🔌 Ollama backend: {self.ollama.describe()}")
+        if self.warmer:
+            print(f"🔥 Warming up {OLLAMA_MODEL} in the background...")
         print(f"⌨️  Ctrl+Shift+G - Process with Ollama (local)")
         
         if GEMINI_AVAILABLE and GEMINI_API_KEY:
             print(f"🌐 Gemini model: {GEMINI_MODEL}")
             print(f"⌨️  Ctrl+Shift+H - Process with Gemini (cloud)")
+            hedge = f", {RACE_HEDGE_DELAY:g}s hedge" if RACE_HEDGE_DELAY else ""
+            print(f"⌨️  Ctrl+Shift+R - Race Ollama and Gemini, keep the first answer ({RACE_FIRST} first{hedge})")
         else:
             print(f"⚠️  Gemini API: Not configured")
             print(f"💡 Add GEMINI_API_KEY to your .env file to enable Ctrl+Shift+H")
         
+        for kind, tiers in self.tiers.items():
+            if tiers and kind in self.router.routes:
+                print(f"🎚️  {kind.title()} model tiers: " + "; ".join(tier.describe() for tier in tiers))
+        fallbacks = [route.name for routes in self.router.routes.values() for route in routes if not route.primary]
+        if fallbacks or ROUTER_FALLBACK:
+            print(f"🔀 Fallback when a backend is failing: "
+                  f"{', '.join(fallbacks + (['the other backend'] if ROUTER_FALLBACK else []))}")
+        if self.cache:
+            cached = self.cache.stats()
+            print(f"💾 Response cache: {cached['entries']} entries (Ctrl+Shift+Alt+G/H = skip cache, Ctrl+Shift+Alt+C = clear)")
+        if self.similar:
+            print(f"≈  Near-duplicates answered from the cache at {SIMILAR_THRESHOLD:.0%} similarity "
+                  f"({self.similar.stats()['entries']} indexed, {self.similar.engine})")
+        if self.history:
+            print(f"📜 History: {self.history.stats()['entries']} entries (Ctrl+Shift+Y = recall the answer for the clipboard)")
+        if self.conversations:
+            print(f"💬 Follow-ups: {self.conversations.describe()}")
+        print(f"🧵 Request policy: {JOB_POLICY} (queue size {JOB_QUEUE_SIZE}) - Ctrl+Shift+X cancels")
+        print(f"🔗 Coalescing: {self.coalescer.describe()}")
         print(f"🛑 Exit: Press Ctrl+Shift+Q OR close this window")
         print(f"🔍 Verbose mode: {VERBOSE}")
+        print(f"📡 Streaming: {STREAMING}{' (live clipboard updates)' if STREAMING and STREAM_TO_CLIPBOARD else ''}")
         if SYSTEM_PROMPT:
             print(f"💬 System prompt: {SYSTEM_PROMPT[:50]}...")
         print("="*60)
-        print("\n✅ Ready! Listening for keyboard input...")
-        print("💡 TIP: Try pressing Ctrl+Shift+G (Ollama) or Ctrl+Shift+H (Gemini)!\n")
+
+    def _new_route(self, kind, model):
+        """A route with its own backend (and `ollama run` fallback) for a non-default model"""
+        health = BackendHealth(f"{kind}:{model}", failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                               backoff=CIRCUIT_BACKOFF, max_backoff=CIRCUIT_MAX_BACKOFF)
+        if kind == "gemini":
+            return Route(kind, model, GeminiBackend(GEMINI_API_KEY, model, GEMINI_SYSTEM_PROMPT), health)
+        backend = create_ollama_backend(
+            OLLAMA_BACKEND, model, host=OLLAMA_HOST, keep_alive=OLLAMA_KEEP_ALIVE,
+            timeout=TIMEOUT, command=OLLAMA_COMMAND,
+        )
+        cli = None
+        if OLLAMA_CLI_FALLBACK and backend.name != "cli":
+            cli = OllamaCLIBackend(model, command=OLLAMA_COMMAND, timeout=TIMEOUT)
+        return Route(kind, model, backend, health, cli)
+
+    def _build_router(self):
+        """Primary and fallback-model routes for each configured backend"""
+        def health(name):
+            return BackendHealth(name, failure_threshold=CIRCUIT_FAILURE_THRESHOLD,
+                                 backoff=CIRCUIT_BACKOFF, max_backoff=CIRCUIT_MAX_BACKOFF)
+        
+        router = Router(fallback_to_other=ROUTER_FALLBACK)
+        router.add(Route("ollama", OLLAMA_MODEL, self.ollama, health(f"ollama:{OLLAMA_MODEL}"),
+                         self.ollama_fallback))
+        if OLLAMA_FALLBACK_MODEL and OLLAMA_FALLBACK_MODEL != OLLAMA_MODEL:
+            router.add(self._new_route("ollama", OLLAMA_FALLBACK_MODEL), primary=False)
+        if self.gemini:
+            router.add(Route("gemini", GEMINI_MODEL, self.gemini, health(f"gemini:{GEMINI_MODEL}")))
+            if GEMINI_FALLBACK_MODEL and GEMINI_FALLBACK_MODEL != GEMINI_MODEL:
+                router.add(self._new_route("gemini", GEMINI_FALLBACK_MODEL), primary=False)
+        return router
+
+    def _tier_route(self, kind, content):
+        """Pick the route for content by model tier; returns (route or None, tier, tokens, content type)"""
+        tier, tokens, content_type = select_tier(content, self.tiers[kind])
+        if tier is None:
+            return None, None, tokens, content_type
+        with self._lock:
+            route = next((r for r in self.router.routes.get(kind, []) if r.model == tier.model), None)
+            if route is None:
+                route = self._tier_routes.get((kind, tier.model))
+            if route is None:
+                route = self._new_route(kind, tier.model)
+                route.primary = False
+                self._tier_routes[(kind, tier.model)] = route
+        return route, tier, tokens, content_type
+
+    def _record_failure(self, route, error, open_now=False):
+        """Count a failed request against its route; returns True for the first failure in a row"""
+        if route.health.record_failure(error, open_now=open_now):
+            print(f"🔌 {route.name} marked unhealthy - skipped for {route.health.retry_in:.0f}s")
+        return route.health.consecutive_failures == 1
+
+    def close(self):
+        """Stop the workers and warm-up pings and write out the queued history"""
+        self.jobs.shutdown()
+        if self.warmer:
+            self.warmer.stop()
+        if self.history:
+            self.history.close()
+        if self.similar:
+            self.similar.close()
+
+    @property
+    def processing(self):
+        return self.active_requests > 0
+
+    def submit(self, use_gemini=False, bypass_cache=False, pressed_at=None, race=False):
+        """Read the clipboard now and queue the press on a worker thread; returns the Job that
+        answers it (shared with other presses when coalesced), or None"""
+        backend = "race" if race else "gemini" if use_gemini else "ollama"
+        content, read_seconds = self.get_clipboard_content()
+        if not content:
+            print("❌ Aborted: No clipboard content")
+            return None
+        waiting = self.jobs.pending(backend)
+
+        def start(batch):
+            return self.jobs.submit(backend, self.process_batch, batch, use_gemini=use_gemini,
+                                    bypass_cache=bypass_cache, race=race)
+
+        batch, status = self.coalescer.add((backend, bypass_cache), content, start, pressed_at, read_seconds)
+        if status == "rejected":
+            print(f"⚠️  Request queue is full ({JOB_QUEUE_SIZE} waiting), press ignored")
+            return None
+        if status == "duplicate":
+            print("🔗 Same text as a request in progress - sharing its answer")
+        elif status == "joined":
+            print(f"🔗 Added to the pending {backend} request ({len(batch.parts)} clipboards)")
+        elif waiting and JOB_POLICY == "queue":
+            print(f"⏳ Queued behind {waiting} request(s)")
+        elif waiting and JOB_POLICY == "supersede":
+            print(f"⏭️  Superseding {waiting} earlier request(s)")
+        return batch.job
+
+    def process_batch(self, batch, use_gemini=False, bypass_cache=False, race=False, cancel=None):
+        """Job for a batch of coalesced presses: wait out COALESCE_WINDOW for more, then answer
+        its clipboards in press order"""
+        parts = self.coalescer.close(batch, cancel)
+        try:
+            if len(parts) > 1 and self.coalescer.merge:
+                self.process_clipboard(use_gemini, bypass_cache, cancel, parts[0].pressed_at, race,
+                                       parts=[part.content for part in parts])
+            else:
+                for part in parts:
+                    if cancel is not None and cancel.is_set():
+                        break
+                    self.process_clipboard(use_gemini, bypass_cache, cancel, part.pressed_at, race,
+                                           content=part.content, read_seconds=part.read_seconds)
+        finally:
+            self.coalescer.finish(batch)
+        saved = batch.presses - self.coalescer.calls(batch)
+        if saved > 0:
+            print(f"🔗 {batch.presses} presses answered with {self.coalescer.calls(batch)} request(s) - "
+                  f"{saved} backend call(s) saved ({self.coalescer.stats()['saved']} so far)")
+
+    @staticmethod
+    def _job_failed(job, error):
+        """A request raised on its worker thread (process_clipboard reports its own errors)"""
+        print(f"❌ Error in {job.backend} request: {error}")
+        if VERBOSE:
+            import traceback
+            traceback.print_exception(type(error), error, error.__traceback__)
+
+    def cancel_requests(self):
+        """Cancel every running and queued request"""
+        cancelled = self.jobs.cancel(reason="cancelled by hotkey")
+        if cancelled:
+            print(f"🛑 Cancelled {cancelled} request(s)")
+        else:
+            print("💤 Nothing to cancel")
+        return cancelled
 
     def get_clipboard_content(self):
-        """Get current clipboard content"""
+        """Get current clipboard content; returns (content or None, seconds the read took)"""
         try:
             if VERBOSE:
                 print("🔍 [DEBUG] Reading clipboard...")
-            content = pyperclip.paste()
-            if not content or content.strip() == "":
+            content, seconds = self.clipboard.read()
+            if is_blank(content):
                 print("⚠️  Clipboard is empty! Copy some text first (Ctrl+C)")
-                return None
+                return None, seconds
             if VERBOSE:
-                print(f"✅ [DEBUG] Clipboard read successfully ({len(content)} characters)")
-            return content
+                print(f"✅ [DEBUG] Clipboard read successfully ({len(content)} characters, "
+                      f"{seconds * 1000:.1f} ms)")
+            return content, seconds
         except Exception as e:
             print(f"❌ Error reading clipboard: {e}")
             import traceback
             if VERBOSE:
                 traceback.print_exc()
+            return None, 0.0
+
+    def _stream_writer(self, live=True):
+        """Clipboard writer for partial responses, or None when disabled"""
+        if not STREAM_TO_CLIPBOARD or not live:
             return None
+        return ClipboardStreamWriter(self.clipboard.write_unverified, STREAM_CLIPBOARD_INTERVAL)
 
-    def send_to_ollama(self, content):
-        """Send content to Ollama and get response"""
+    def _ollama_generate(self, backend, content, stats, cancel=None, live=True, turns=()):
+        # Follow-ups go through the chat endpoint, with the earlier turns as an unchanged prefix
+        messages = chat_messages(SYSTEM_PROMPT, turns, content) if turns else None
+        if STREAMING:
+            if messages:
+                chunks = backend.stream_chat(messages, stats, cancel)
+            else:
+                chunks = backend.stream_generate(content, SYSTEM_PROMPT, stats, cancel)
+            return consume_stream(chunks, stats, self._stream_writer(live), cancel, strip=True)
+        if messages:
+            response = backend.chat(messages, stats, cancel)
+        else:
+            response = backend.generate(content, SYSTEM_PROMPT, stats, cancel)
+        stats.mark_chunk(response)
+        stats.finish()
+        return response
+
+    def send_to_ollama(self, content, stats=None, cancel=None, live=True, route=None, turns=()):
+        """Send content to Ollama and get response (live=False: no partial clipboard updates)"""
+        route = route or self.router.primary("ollama")
         try:
-            print(f"📤 Sending to Ollama ({OLLAMA_MODEL})...")
+            print(f"📤 Sending to Ollama ({route.model})...")
             if VERBOSE:
                 print(f"📝 Input preview: {content[:100]}{'...' if len(content) > 100 else ''}")
                 print(f"🔍 [DEBUG] Input length: {len(content)} characters\n")
-            
-            # Build the prompt with system prompt if configured
-            full_prompt = ""
-            if SYSTEM_PROMPT:
-                full_prompt += f"System: {SYSTEM_PROMPT}\n\n"
-            full_prompt += f"User: {content}\n\nAssistant:"
-            
-            # Construct the ollama command
-            # Disable streaming and use --nowordwrap for clean output
-            if VERBOSE:
-                print(f"🔍 [DEBUG] Executing: {OLLAMA_COMMAND} run {OLLAMA_MODEL} --nowordwrap")
+                print(f"🔍 [DEBUG] Backend: {route.backend.describe()}")
                 print(f"⏳ Waiting for Ollama response (timeout: {TIMEOUT}s)...\n")
             
-            # Set environment to disable streaming animations
-            env = subprocess.os.environ.copy()
-            env['TERM'] = 'dumb'  # Disable ANSI escape codes
-            
-            process = subprocess.Popen(
-                [OLLAMA_COMMAND, "run", OLLAMA_MODEL, "--nowordwrap"],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                encoding='utf-8',
-                errors='replace',  # Replace undecodable characters instead of crashing
-                env=env
-            )
-            
-            # Send input and get output with timeout
+            if stats is None:
+                stats = StreamStats()
+            stats.begin()
             try:
-                stdout, stderr = process.communicate(input=full_prompt, timeout=TIMEOUT)
-            except subprocess.TimeoutExpired:
-                process.kill()
-                print(f"❌ Ollama timed out after {TIMEOUT} seconds")
-                print(f"💡 Try increasing TIMEOUT in config.py or use a smaller model")
-                return None
-            
-            if VERBOSE:
-                print(f"🔍 [DEBUG] Process return code: {process.returncode}")
-                if stderr:
-                    print(f"🔍 [DEBUG] Stderr: {stderr[:200]}")
-            
-            if process.returncode != 0:
-                print(f"❌ Ollama error (exit code {process.returncode})")
-                print(f"   Error details: {stderr[:500]}")  # Limit error message length
-                print(f"\n💡 Troubleshooting:")
-                print(f"   1. Check if Ollama is running: ollama list")
-                print(f"   2. Check if model exists: ollama pull {OLLAMA_MODEL}")
-                print(f"   3. Test manually: echo 'test' | ollama run {OLLAMA_MODEL}")
-                print(f"   4. Try restarting Ollama service")
-                return None
+                response = self._ollama_generate(route.backend, content, stats, cancel, live, turns)
+            except OllamaUnavailable as e:
+                if not route.fallback_backend or stats.chunks:
+                    raise
+                print(f"⚠️  Ollama server unavailable ({e}), falling back to '{OLLAMA_COMMAND} run'...")
+                response = self._ollama_generate(route.fallback_backend, content, stats, cancel, live, turns)
             
-            # Strip ANSI escape codes from response
-            response = stdout.strip()
-            
-            # Remove ANSI escape sequences (like ←[?25l, ←[1G, etc.)
-            # Pattern matches ANSI escape codes
-            ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-            response = ansi_escape.sub('', response)
-            response = response.strip()
+            if self.warmer and route.primary:
+                self.warmer.record_request(stats)
             
             if response:
+                route.health.record_success(stats.total_seconds)
                 print(f"✅ Received response from Ollama!")
                 if VERBOSE:
                     print(f"📝 Output length: {len(response)} characters")
                     print(f"📝 Output preview: {response[:150]}{'...' if len(response) > 150 else ''}\n")
+                    if self.warmer:
+                        print(f"🔍 [DEBUG] Warm-up: {self.warmer.describe()}")
                 return response
             else:
                 print("⚠️  Ollama returned empty response")
+                self._record_failure(route, "empty response")
                 return None
                 
-        except FileNotFoundError:
+        except RequestCancelled:
+            route.health.release()
+            raise
+        except OllamaTimeout as e:
+            print(f"❌ Ollama timed out after {TIMEOUT} seconds")
+            if self._record_failure(route, e):
+                print(f"💡 Try increasing TIMEOUT in config.py or use a smaller model")
+            return None
+        except OllamaUnavailable as e:
+            # Nothing is listening: retrying before the backoff would only repeat the wait
+            if not self._record_failure(route, e, open_now=True):
+                print(f"❌ Ollama still unavailable ({e})")
+                return None
             print(f"\n❌ ERROR: Ollama not found!")
-            print(f"   The command '{OLLAMA_COMMAND}' is not recognized.")
+            print(f"   {e}")
             print(f"\n💡 Solutions:")
             print(f"   1. Close and reopen PowerShell/Terminal")
             print(f"   2. Check if Ollama is installed: ollama --version")
             print(f"   3. Install Ollama: https://ollama.ai/download")
-            print(f"   4. Make sure Ollama is in your PATH\n")
+            print(f"   4. Make sure Ollama is in your PATH and the service is running\n")
+            return None
+        except OllamaError as e:
+            print(f"❌ Ollama error ({e})")
+            if not self._record_failure(route, e):
+                return None
+            print(f"\n💡 Troubleshooting:")
+            print(f"   1. Check if Ollama is running: ollama list")
+            print(f"   2. Check if model exists: ollama pull {route.model}")
+            print(f"   3. Test manually: echo 'test' | ollama run {route.model}")
+            print(f"   4. Try restarting Ollama service")
             return None
         except Exception as e:
+            self._record_failure(route, e)
             print(f"❌ Error communicating with Ollama: {e}")
             import traceback
             if VERBOSE:
@@ -180,8 +515,9 @@ class ClipboardAI:
                 traceback.print_exc()
             return None
     
-    def send_to_gemini(self, content):
-        """Send content to Gemini API and get response"""
+    def send_to_gemini(self, content, stats=None, cancel=None, live=True, route=None, turns=()):
+        """Send content to Gemini API and get response (live=False: no partial clipboard updates)"""
+        route = route or self.router.primary("gemini")
         try:
             if not GEMINI_AVAILABLE:
                 print(f"❌ Gemini API not available!")
@@ -195,34 +531,28 @@ class ClipboardAI:
                 print(f"💡 Add GEMINI_API_KEY to your .env file")
                 return None
             
-            print(f"📤 Sending to Gemini API ({GEMINI_MODEL})...")
+            print(f"📤 Sending to Gemini API ({route.model})...")
             if VERBOSE:
                 print(f"📝 Input preview: {content[:100]}{'...' if len(content) > 100 else ''}")
                 print(f"🔍 [DEBUG] Input length: {len(content)} characters\n")
             
-            # System prompt for Gemini
-            system_prompt = GEMINI_SYSTEM_PROMPT if GEMINI_SYSTEM_PROMPT else SYSTEM_PROMPT
-            
-            if VERBOSE:
-                print(f"🔍 [DEBUG] Initializing Gemini model...")
-            
-            # Initialize Gemini model
-            model = genai.GenerativeModel(GEMINI_MODEL)
-            
-            # Build the prompt with system prompt if configured
-            full_prompt = ""
-            if system_prompt:
-                full_prompt += f"System: {system_prompt}\n\n"
-            full_prompt += f"User: {content}\n\nAssistant:"
-            
             if VERBOSE:
+                print(f"🔍 [DEBUG] Gemini model: {route.backend.describe()}")
                 print(f"⏳ Waiting for Gemini response (cloud API)...\n")
             
+            if stats is None:
+                stats = StreamStats()
+            stats.begin()
+            
             # Generate response
-            response = model.generate_content(full_prompt)
+            if STREAMING:
+                chunks = route.backend.stream_generate(content, stats, cancel, history=turns)
+                result = consume_stream(chunks, stats, self._stream_writer(live), cancel, strip=True)
+            else:
+                result = route.backend.generate(content, stats, cancel, history=turns)
             
-            if response and response.text:
-                result = response.text.strip()
+            if result:
+                route.health.record_success(stats.total_seconds)
                 print(f"✅ Received response from Gemini!")
                 if VERBOSE:
                     print(f"📝 Output length: {len(result)} characters")
@@ -230,15 +560,20 @@ class ClipboardAI:
                 return result
             else:
                 print("⚠️  Gemini returned empty response")
+                self._record_failure(route, "empty response")
                 return None
                 
+        except RequestCancelled:
+            route.health.release()
+            raise
         except Exception as e:
             err_msg = str(e)
-            print(f"❌ Error communicating with Gemini API: {err_msg}")
+            print(f"❌ Error communicating with Gemini API: {err_msg[:300]}")
             # Gracefully surface rate limit errors without noisy tracebacks
-            if '429' in err_msg or 'ResourceExhausted' in err_msg or 'rate limit' in err_msg.lower():
-                print("⚠️  You have hit the Gemini rate limit. Please wait a bit and try again.")
-            else:
+            if is_rate_limited(e):
+                self._record_failure(route, e, open_now=True)
+                print("⚠️  You have hit the Gemini rate limit.")
+            elif self._record_failure(route, e):
                 print(f"\n💡 Troubleshooting:")
                 print(f"   1. Check your API key is valid")
                 print(f"   2. Check your internet connection")
@@ -250,268 +585,606 @@ class ClipboardAI:
             return None
 
     def set_clipboard_content(self, content):
-        """Set clipboard content with retry logic"""
-        max_retries = 5
-        retry_delay = 0.5  # seconds
+        """Set clipboard content with retry logic; returns the ClipboardWrite, or None if it failed"""
+        def on_retry(attempt, error, delay):
+            if VERBOSE:
+                print(f"⚠️  [DEBUG] Clipboard access failed: {error}")
+                print(f"⏳ Waiting {delay:.2f}s before retry {attempt + 1}/{self.clipboard.max_attempts}...")
         
-        for attempt in range(max_retries):
-            try:
-                if VERBOSE and attempt > 0:
-                    print(f"🔍 [DEBUG] Retry attempt {attempt + 1}/{max_retries}...")
-                
-                if VERBOSE:
-                    print(f"🔍 [DEBUG] Writing {len(content)} characters to clipboard...")
-                
-                # Try to copy to clipboard
-                pyperclip.copy(content)
-                
-                # Verify it was copied correctly
-                time.sleep(0.1)  # Small delay to ensure clipboard is updated
-                copied = pyperclip.paste()
-                
-                if copied == content:
-                    print("✅ Response copied to clipboard! Press Ctrl+V to paste.\n")
-                    if VERBOSE:
-                        print("🔍 [DEBUG] Clipboard write verified successfully!")
-                    return True
-                else:
-                    if VERBOSE:
-                        print(f"⚠️  [DEBUG] Clipboard verification failed, retrying...")
-                    raise Exception("Clipboard verification failed")
-                    
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    if VERBOSE:
-                        print(f"⚠️  [DEBUG] Clipboard access failed: {e}")
-                        print(f"⏳ Waiting {retry_delay}s before retry...")
-                    time.sleep(retry_delay)
-                    retry_delay *= 1.5  # Exponential backoff
+        try:
+            if VERBOSE:
+                print(f"🔍 [DEBUG] Writing {len(content)} characters to clipboard...")
+            written = self.clipboard.write(content, on_retry=on_retry)
+            print("✅ Response copied to clipboard! Press Ctrl+V to paste.\n")
+            if VERBOSE:
+                if self.clipboard.should_verify:
+                    print(f"🔍 [DEBUG] Clipboard write verified in {written.seconds * 1000:.1f} ms "
+                          f"(verify {written.verify_seconds * 1000:.1f} ms)")
                 else:
-                    print(f"❌ Error writing to clipboard after {max_retries} attempts: {e}")
-                    print(f"💡 TIP: Close other clipboard managers or wait a moment and try again")
-                    if VERBOSE:
-                        import traceback
-                        traceback.print_exc()
-                    return False
+                    print(f"🔍 [DEBUG] Clipboard written in {written.seconds * 1000:.1f} ms "
+                          f"(synchronous backend, no verification)")
+            return written
+        except ClipboardError as e:
+            print(f"❌ Error writing to clipboard after {e.attempts} attempts: {e}")
+            print(f"💡 TIP: Close other clipboard managers or wait a moment and try again")
+            if VERBOSE:
+                import traceback
+                traceback.print_exc()
+            return None
+
+    def _complete(self, prompt, route, cancel=None):
+        """Plain (non-streaming, quiet) completion used for the chunks of a large input"""
+        if route.kind == "gemini":
+            return route.backend.generate(prompt, cancel=cancel)
+        try:
+            return route.backend.generate(prompt, SYSTEM_PROMPT, cancel=cancel)
+        except OllamaUnavailable:
+            if not route.fallback_backend:
+                raise
+            return route.fallback_backend.generate(prompt, SYSTEM_PROMPT, cancel=cancel)
+
+    def send_large(self, content, route, stats=None, cancel=None):
+        """Map-reduce a large input: process chunks concurrently, then merge the answers"""
+        backend_name = f"{route.kind.title()} ({route.model})"
+        parallelism = CHUNK_PARALLELISM_GEMINI if route.kind == "gemini" else CHUNK_PARALLELISM_OLLAMA
+        chunks = split_into_chunks(content, CHUNK_MAX_TOKENS)
+        print(f"🧩 Large input: {len(content)} characters (~{estimate_tokens(content)} tokens) "
+              f"→ {len(chunks)} chunks, {parallelism} at a time via {backend_name}")
+        
+        if stats is None:
+            stats = StreamStats()
+        stats.begin()
+        started = time.perf_counter()
+        done_chars = 0
+        
+        def on_progress(index, total, chunk_chars, seconds):
+            nonlocal done_chars
+            done_chars += chunk_chars
+            elapsed = time.perf_counter() - started
+            print(f"   ✅ Chunk {index}/{total} done: {chunk_chars} chars in {seconds:.1f}s "
+                  f"({done_chars / elapsed:.0f} chars/s overall)")
         
-        return False
+        def map_fn(prompt, chunk_cancel):
+            return self._complete(prompt, route, chunk_cancel)
+        
+        def reduce_fn(prompt, reduce_cancel):
+            print(f"🔗 Merging {prompt.count('--- Part ')} partial answers...")
+            return self._complete(prompt, route, reduce_cancel)
+        
+        try:
+            result = map_reduce(chunks, map_fn, reduce_fn if LARGE_INPUT_REDUCE else None,
+                                parallelism, on_progress, cancel, max_tokens=CHUNK_MAX_TOKENS)
+        except RequestCancelled:
+            route.health.release()
+            raise
+        except Exception as e:
+            self._record_failure(route, e, open_now=isinstance(e, OllamaUnavailable) or is_rate_limited(e))
+            print(f"❌ Error processing large input with {backend_name}: {e}")
+            if VERBOSE:
+                import traceback
+                traceback.print_exc()
+            return None
+        
+        result = result.strip()
+        stats.mark_chunk(result)
+        stats.finish()
+        route.health.record_success(stats.total_seconds)
+        elapsed = time.perf_counter() - started
+        print(f"✅ Large input processed: {len(content)} chars in {elapsed:.1f}s "
+              f"({len(content) / elapsed:.0f} chars/s)")
+        return result or None
 
-    def process_clipboard(self, use_gemini=False):
-        """Main processing function"""
-        if self.processing:
-            print("⚠️  Already processing, please wait...")
-            return
+    def _is_large(self, content):
+        """Whether content is chunked (map-reduce) instead of sent as one prompt"""
+        return bool(LARGE_INPUT_CHARS) and len(content) > LARGE_INPUT_CHARS
+
+    def _send_route(self, route, content, stats, cancel=None, live=True, turns=()):
+        if self._is_large(content):
+            return self.send_large(content, route, stats, cancel)
+        if route.kind == "gemini":
+            if VERBOSE:
+                print("🔍 [DEBUG] Step 2/3: Sending to Gemini API...")
+            return self.send_to_gemini(content, stats, cancel, live, route, turns)
+        if VERBOSE:
+            print("🔍 [DEBUG] Step 2/3: Sending to Ollama...")
+        return self.send_to_ollama(content, stats, cancel, live, route, turns)
+
+    def _generate(self, content, use_gemini, stats, cancel=None, live=True, others=True, trace=None, turns=()):
+        """Answer with the chosen backend, or the next healthy route if it is failing.
+
+        The model tier for the input's size and type goes first when one matches.
+        Returns (route, response); response is None (after reporting) if every route failed.
+        others=False keeps to the chosen backend's own models; turns are earlier
+        (prompt, response) pairs the answer continues.
+        """
+        kind = "gemini" if use_gemini else "ollama"
+        first = None
+        if kind not in self.router.routes:
+            print(f"❌ Gemini API not available!")
+            print(f"💡 Install: pip install google-generativeai")
+            print(f"💡 Add GEMINI_API_KEY to your .env file")
+        elif self.tiers[kind]:
+            first, tier, tokens, content_type = self._tier_route(kind, content)
+            if tier:
+                print(f"🎚️  Tier '{tier.name}' (~{tokens} tokens, {content_type}) → {tier.model}")
+            elif VERBOSE:
+                print(f"🔍 [DEBUG] No tier for ~{tokens} tokens of {content_type} - using the default model")
+            if trace is not None:
+                trace.extra.update(tier=tier.name if tier else "default", content_type=content_type,
+                                   est_tokens=tokens)
+        routes, skipped = self.router.plan(kind, others, first)
+        for route in skipped:
+            print(f"⏭️  Skipping {route.name} - unhealthy, retry in {route.health.retry_in:.0f}s "
+                  f"({route.health.last_error})")
+        for index, route in enumerate(routes):
+            if cancel is not None and cancel.is_set():
+                self.router.release(routes[index:])
+                cancel.raise_if_cancelled()
+            if index or skipped:
+                print(f"↪️  Using {route.name} instead")
+            attempt = StreamStats(stats.on_chunk)
+            try:
+                response = self._send_route(route, content, attempt, cancel, live, turns)
+            except BaseException:
+                self.router.release(routes[index + 1:])
+                raise
+            if response:
+                self.router.release(routes[index + 1:])
+                stats.update_from(attempt)
+                if VERBOSE and (index or skipped):
+                    print(f"🔍 [DEBUG] Routes: {self.router.describe()}")
+                return route, response
+            if attempt.chunks:
+                # Part of this answer already went out (daemon client, live clipboard);
+                # another model's answer would be appended to it
+                print(f"⚠️  {route.name} failed mid-answer - not retrying with another model")
+                self.router.release(routes[index + 1:])
+                break
+        print(f"❌ Aborted: No response {'for large input' if self._is_large(content) else 'from ' + kind.title()}")
+        return None, None
+
+    def send_race(self, content, stats=None, cancel=None):
+        """Send content to Ollama and Gemini, keep the first answer and cancel the other.
+
+        Returns (route, response); both None if every backend failed.
+        """
+        order = ["gemini", "ollama"] if RACE_FIRST == "gemini" else ["ollama", "gemini"]
+        if not self.gemini:
+            print("⚠️  Gemini not configured - racing Ollama alone")
+            order = ["ollama"]
+        hedge = f" (second starts after {RACE_HEDGE_DELAY:g}s)" if RACE_HEDGE_DELAY and len(order) > 1 else ""
+        print(f"🏁 Racing {' vs '.join(name.title() for name in order)}{hedge}...")
+        
+        contender_stats = {name: StreamStats() for name in order}
+        
+        def contender(name):
+            def run(token):
+                # Both run at once, so neither may stream partial answers into the clipboard;
+                # each sticks to its own backend (the other one is already in the race)
+                route, response = self._generate(content, name == "gemini", contender_stats[name], token,
+                                                 live=False, others=False)
+                return (route, response) if response else None
+            return run
         
-        self.processing = True
+        outcome = race([(name, contender(name)) for name in order], RACE_HEDGE_DELAY, cancel)
+        if VERBOSE:
+            print(f"🔍 [DEBUG] Race: {outcome.describe()}")
+        if outcome.winner is None:
+            print("❌ Aborted: No backend answered")
+            return None, None
         
+        with self._lock:
+            self.race_wins[outcome.winner] += 1
+            wins = ", ".join(f"{name.title()} {count}" for name, count in self.race_wins.items())
+        losers = [name.title() for name, (status, _) in outcome.outcomes.items() if status == "lost"]
+        print(f"🏆 {outcome.winner.title()} won in {outcome.seconds:.2f}s"
+              f"{' (' + ', '.join(losers) + ' cancelled)' if losers else ''} - wins so far: {wins}")
+        if stats is not None:
+            stats.update_from(contender_stats[outcome.winner])
+        return outcome.result
+
+    def _tier_model(self, content, use_gemini):
+        """The model a tier would pick for content (None = the backend's default model)"""
+        tiers = self.tiers["gemini" if use_gemini else "ollama"]
+        if not tiers:
+            return None
+        tier, _, _ = select_tier(content, tiers)
+        return tier.model if tier else None
+
+    def _cache_key(self, content, use_gemini, model=None):
+        if use_gemini:
+            return cache_key("gemini", model or GEMINI_MODEL, GEMINI_SYSTEM_PROMPT, content)
+        return cache_key("ollama", model or OLLAMA_MODEL, SYSTEM_PROMPT, content)
+
+    def clear_cache(self):
+        """Remove every cached response"""
+        if not self.cache:
+            print("⚠️  Response cache is disabled (CACHE_ENABLED = False)")
+            return
+        deleted = self.cache.clear()
+        if self.similar:
+            self.similar.clear()
+        print(f"🧹 Response cache cleared ({deleted} entries removed)")
+
+    def _record_trace(self, trace):
+        if self.traces is None:
+            return
+        try:
+            self.traces.write(trace)
+        except Exception as e:
+            if VERBOSE:
+                print(f"⚠️  [DEBUG] Could not write request trace: {e}")
+
+    def _record_history(self, prompt, response, trace):
+        if self.history is None or not prompt or not response:
+            return
+        first_token = trace.spans.get("first_token")
+        self.history.record(prompt, response, trace.backend, trace.model, trace.trigger, trace.status,
+                            trace.cache, round((trace.total_seconds or 0) * 1000, 2),
+                            round(first_token * 1000, 2) if first_token is not None else None)
+
+    def recall(self):
+        """Replace the clipboard with the past response that best matches it"""
+        if self.history is None:
+            print("⚠️  Clipboard history is off - set HISTORY_ENABLED = True in config.py to keep one")
+            return None
+        query, _ = self.get_clipboard_content()
+        if not query:
+            return None
+        started = time.perf_counter()
+        entry = self.history.lookup(query)
+        elapsed = time.perf_counter() - started
+        if entry is None:
+            print(f"🔎 Nothing in the history matches the clipboard ({elapsed * 1000:.1f} ms)")
+            return None
+        if self.set_clipboard_content(entry.response):
+            match = "same prompt" if entry.snippet is None else "best match"
+            print(f"📜 Recalled {entry.describe()} ({match}, {elapsed * 1000:.1f} ms) - paste with Ctrl+V")
+        return entry
+
+    def new_trace(self, use_gemini=False, race=False, trigger="hotkey"):
+        if race:
+            return RequestTrace("race", f"{OLLAMA_MODEL} | {GEMINI_MODEL}", trigger)
         if use_gemini:
-            self.gemini_pressed_count += 1
-            mode_name = "GEMINI API"
-            request_num = self.gemini_pressed_count
+            return RequestTrace("gemini", GEMINI_MODEL, trigger)
+        return RequestTrace("ollama", OLLAMA_MODEL, trigger)
+
+    def respond(self, content, use_gemini=False, bypass_cache=False, cancel=None, race=False,
+                stats=None, trace=None, live=True, turns=()):
+        """Answer content via the cache, model tiers and router - everything between reading
+        the input and delivering the answer, shared by the hotkeys and batch mode.
+
+        Returns the response, or None (after reporting) if no backend answered.
+        live=False: no partial clipboard updates while streaming. turns: earlier
+        (prompt, response) pairs of a follow-up, which is never answered from the cache.
+        """
+        stats = stats if stats is not None else StreamStats()
+        trace = trace if trace is not None else self.new_trace(use_gemini, race)
+        trace.input_chars = len(content)
+        if MAX_INPUT_CHARS and len(content) > MAX_INPUT_CHARS:
+            print(f"📏 Input too large ({len(content):,} characters, MAX_INPUT_CHARS is {MAX_INPUT_CHARS:,}) - skipped")
+            trace.status = "error"
+            trace.error = f"input of {len(content)} characters exceeds MAX_INPUT_CHARS"
+            return None
+        label = "OLLAMA + GEMINI RACE" if race else "GEMINI API" if use_gemini else "OLLAMA"
+        
+        # Reuse a previous answer for the exact same (or, optionally, an almost identical) request
+        key = None
+        signature = None
+        response = None
+        if self.cache and not turns:
+            with trace.span("prompt_build"):
+                # A race is answered by whichever backend already has it cached
+                targets = [(use_gemini, self._tier_model(content, use_gemini))]
+                if race:
+                    targets.append((True, self._tier_model(content, True)))
+                keys = [self._cache_key(content, gemini, model) for gemini, model in targets]
+                key = keys[0]
+            if bypass_cache:
+                trace.cache = "bypass"
+                print("🔁 Cache bypassed - regenerating")
+            else:
+                lookup_start = time.perf_counter()
+                for candidate in keys:
+                    response = self.cache.get(candidate)
+                    if response:
+                        break
+                lookup_seconds = time.perf_counter() - lookup_start
+                trace.add_span("cache_lookup", lookup_seconds)
+                trace.cache = "hit" if response else "miss"
+                if response:
+                    print(f"⚡ Cache hit ({lookup_seconds * 1000:.1f} ms) - skipping {label}")
+                    return response
+                if VERBOSE:
+                    print(f"🔍 [DEBUG] Cache miss ({lookup_seconds * 1000:.1f} ms)")
+                if self.similar:
+                    lookup_start = time.perf_counter()
+                    # Scopes are the keys of the empty prompt, i.e. the backend/model/system prompt
+                    response, similarity, signature = self.similar.lookup(
+                        content, [self._cache_key("", gemini, model) for gemini, model in targets])
+                    lookup_seconds = time.perf_counter() - lookup_start
+                    trace.add_span("similar_lookup", lookup_seconds)
+                    if similarity:
+                        trace.extra["similarity"] = round(similarity, 3)
+                    if response:
+                        trace.cache = "similar"
+                        print(f"≈  Near-duplicate hit ({similarity:.0%} similar, {lookup_seconds * 1000:.1f} ms)"
+                              f" - skipping {label}")
+                        return response
+                    if VERBOSE:
+                        print(f"🔍 [DEBUG] No near-duplicate (best {similarity:.0%}, {lookup_seconds * 1000:.1f} ms)")
+        
+        if race:
+            route, response = self.send_race(content, stats, cancel)
+            if route:
+                trace.extra["winner"] = route.kind
         else:
-            self.hotkey_pressed_count += 1
-            mode_name = "OLLAMA"
-            request_num = self.hotkey_pressed_count
+            route, response = self._generate(content, use_gemini, stats, cancel, live, trace=trace, turns=turns)
+        trace.add_stream_stats(stats)
+        if not response:
+            trace.status = "error"
+            return None
+        trace.backend = trace.backend if race else route.kind
+        trace.model = route.model
+        if not route.primary or (not race and route.kind != ("gemini" if use_gemini else "ollama")):
+            trace.extra["route"] = route.name
+        # Answers from a fallback route are cached under the backend/model that produced them
+        if key:
+            answered_key = self._cache_key(content, route.kind == "gemini", route.model)
+            self.cache.put(answered_key, response, route.kind, route.model)
+            if signature is not None:
+                self.similar.add(signature, self._cache_key("", route.kind == "gemini", route.model), answered_key)
+        return response
+
+    def complete(self, text, backend="ollama", bypass_cache=False, cancel=None, trigger="api", on_chunk=None):
+        """Answer text without touching the clipboard (batch mode, daemon clients).
+
+        backend is "ollama", "gemini" or "race"; on_chunk(piece) is called as the
+        answer streams in. Returns (response or None, finished RequestTrace).
+        """
+        trace = self.new_trace(backend == "gemini", backend == "race", trigger)
+        response = None
+        try:
+            if is_blank(text):
+                trace.status = "empty"
+            else:
+                response = self.respond(text, backend == "gemini", bypass_cache, cancel, backend == "race",
+                                        StreamStats(on_chunk), trace, live=False)
+                trace.output_chars = len(response or "")
+        except RequestCancelled:
+            trace.status = "cancelled"
+        except Exception as e:
+            trace.finish("error", e)
+            print(f"❌ Unexpected error: {e}")
+        finally:
+            trace.finish()
+            self._record_trace(trace)
+            self._record_history(text, response, trace)
+        return response, trace
+
+    def _follow_up(self, kind, content, trace):
+        """Earlier turns to continue for a press of kind (empty: a new exchange)"""
+        if not self.conversations or kind == "race" or self._is_large(content):
+            return ()
+        turns = self.conversations.current(kind)
+        if turns:
+            trace.extra["turn"] = len(turns) + 1
+            print(f"💬 Follow-up #{len(turns)} ({self.conversations.idle_seconds(kind):.0f}s after the last answer)")
+        return turns
+
+    def process_clipboard(self, use_gemini=False, bypass_cache=False, cancel=None, pressed_at=None,
+                          race=False, content=None, read_seconds=None, parts=None):
+        """Main processing function (race=True: Ollama and Gemini, first answer wins).
+
+        content is the clipboard text when it was read at the hotkey press (taking
+        read_seconds); parts are several such texts, answered with one multi-part prompt.
+        """
+        with self._lock:
+            self.active_requests += 1
+            if race:
+                self.race_pressed_count += 1
+                mode_name = "OLLAMA + GEMINI RACE"
+                request_num = self.race_pressed_count
+            elif use_gemini:
+                self.gemini_pressed_count += 1
+                mode_name = "GEMINI API"
+                request_num = self.gemini_pressed_count
+            else:
+                self.hotkey_pressed_count += 1
+                mode_name = "OLLAMA"
+                request_num = self.hotkey_pressed_count
         
         print("\n" + "="*60)
         print(f"🔄 PROCESSING WITH {mode_name} (Request #{request_num})")
         print("="*60)
         
         start_time = time.time()
+        stats = StreamStats()
+        trace = self.new_trace(use_gemini, race)
+        if pressed_at is not None:
+            trace.add_span("hotkey", time.perf_counter() - pressed_at)
+        clipboard_content = response = answers = None
+        kind = "race" if race else "gemini" if use_gemini else "ollama"
         
         try:
-            # Get clipboard content
-            if VERBOSE:
-                print("🔍 [DEBUG] Step 1/3: Reading clipboard...")
-            clipboard_content = self.get_clipboard_content()
-            if not clipboard_content:
-                print("❌ Aborted: No clipboard content")
-                return
-            
-            # Send to AI (Ollama or Gemini)
-            if use_gemini:
-                if VERBOSE:
-                    print("🔍 [DEBUG] Step 2/3: Sending to Gemini API...")
-                response = self.send_to_gemini(clipboard_content)
-                if not response:
-                    print("❌ Aborted: No response from Gemini")
-                    return
+            if parts:
+                clipboard_content = multi_part_prompt(parts)
+                trace.extra["parts"] = len(parts)
+                print(f"🔗 {len(parts)} clipboards in one request")
             else:
-                if VERBOSE:
-                    print("🔍 [DEBUG] Step 2/3: Sending to Ollama...")
-                response = self.send_to_ollama(clipboard_content)
-                if not response:
-                    print("❌ Aborted: No response from Ollama")
+                # Get clipboard content (unless it was read when the hotkey was pressed)
+                if content is None:
+                    if VERBOSE:
+                        print("🔍 [DEBUG] Step 1/3: Reading clipboard...")
+                    content, read_seconds = self.get_clipboard_content()
+                clipboard_content = content
+                trace.add_span("clipboard_read", read_seconds)
+                if not clipboard_content:
+                    print("❌ Aborted: No clipboard content")
+                    trace.status = "empty"
                     return
             
+            # Continue the previous exchange if the last answer came within CONVERSATION_WINDOW
+            turns = () if parts else self._follow_up(kind, clipboard_content, trace)
+            
+            # Send to AI (Ollama or Gemini), unless the answer is cached
+            response = self.respond(clipboard_content, use_gemini, bypass_cache, cancel, race, stats, trace,
+                                    turns=turns)
+            if not response:
+                return
+            if parts:
+                # The answers go back in press order; a reply that lost the headings is kept whole
+                answers = split_parts(response, len(parts))
+                if answers is None:
+                    print("⚠️  The answer doesn't keep the parts apart - copying it as is")
+                else:
+                    response = "\n\n".join(answers)
+            elif self.conversations and kind != "race" and not self._is_large(clipboard_content):
+                self.conversations.record(kind, clipboard_content, response)
+            
             # Put response back in clipboard
             if VERBOSE:
                 print("🔍 [DEBUG] Step 3/3: Writing to clipboard...")
             
-            # Small delay to ensure clipboard is not locked by previous operation
-            time.sleep(0.2)
-            
-            self.set_clipboard_content(response)
+            # A cancelled/superseded request must not overwrite the clipboard
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            trace.output_chars = len(response)
+            written = self.set_clipboard_content(response)
+            if written is None:
+                trace.status = "clipboard_error"
+            else:
+                trace.add_span("clipboard_write", written.seconds - written.verify_seconds)
+                if written.verify_seconds:
+                    trace.add_span("verify", written.verify_seconds)
             
             elapsed = time.time() - start_time
+            if stats.end is not None and stats.chunks:
+                print(f"⏱️  Model: {stats.summary()}")
+            print(f"⏱️  Clipboard: read {(read_seconds or 0.0) * 1000:.1f} ms, "
+                  f"write {(written.seconds if written else 0.0) * 1000:.1f} ms")
             print(f"⏱️  Total time: {elapsed:.2f} seconds")
             
+        except RequestCancelled as e:
+            trace.status = "cancelled"
+            print(f"🛑 Request #{request_num} {e or 'cancelled'} - clipboard left unchanged")
         except Exception as e:
+            trace.finish("error", e)
             print(f"❌ Unexpected error: {e}")
             import traceback
             if VERBOSE:
                 traceback.print_exc()
         finally:
-            self.processing = False
+            trace.finish()
+            self._record_trace(trace)
+            if answers:
+                for part, answer in zip(parts, answers):
+                    self._record_history(part, answer, trace)
+            else:
+                self._record_history(clipboard_content, response, trace)
+            with self._lock:
+                self.active_requests -= 1
             print("="*60)
-            if use_gemini:
+            if race:
+                print("✅ Ready for next request. Press Ctrl+Shift+R (race), Ctrl+Shift+G (Ollama) or Ctrl+Shift+H (Gemini)!\n")
+            elif use_gemini:
                 print("✅ Ready for next request. Press Ctrl+Shift+H (Gemini) or Ctrl+Shift+G (Ollama)!\n")
             else:
                 print("✅ Ready for next request. Press Ctrl+Shift+G (Ollama) or Ctrl+Shift+H (Gemini)!\n")
 
 def main():
     """Main function to set up hotkey listener"""
-    app = ClipboardAI()
+    if "--stats" in sys.argv[1:]:
+        import tracing
+        print(f"Traces: {TRACE_PATH}\n")
+        print(tracing.format_summary(tracing.summarize(tracing.read_traces(TRACE_PATH))))
+        return
     
-    # Track modifier states explicitly
-    ctrl_down = False
-    shift_down = False
+    if "--clear-cache" in sys.argv[1:]:
+        cache = open_cache()
+        if cache:
+            similar = open_similar_cache(cache)
+            if similar:
+                similar.clear()
+            print(f"🧹 Response cache cleared ({cache.clear()} entries removed)")
+        else:
+            print("⚠️  Response cache is disabled (CACHE_ENABLED = False)")
+        return
     
-    # Track if we've already triggered a hotkey (to prevent re-triggering while keys are held)
-    hotkey_triggered = False
-    last_trigger_time = 0.0
-
-    def detect_letter(k):
-        """Detect if the pressed key is G, H, or Q using multiple strategies."""
-        try:
-            # Character path
-            if hasattr(k, 'char') and k.char:
-                ch = k.char.lower()
-                if ch in ('g', 'h', 'q'):
-                    return ch.upper()
-            # Virtual key path
-            if hasattr(k, 'vk'):
-                if k.vk in (71, 0x47):
-                    if VERBOSE:
-                        print("🔍 [DEBUG] G key detected via virtual key code!")
-                    return 'G'
-                if k.vk in (72, 0x48):
-                    if VERBOSE:
-                        print("🔍 [DEBUG] H key detected via virtual key code!")
-                    return 'H'
-                if k.vk in (81, 0x51):
-                    if VERBOSE:
-                        print("🔍 [DEBUG] Q key detected via virtual key code!")
-                    return 'Q'
-            # Name attribute path
-            if hasattr(k, 'name') and isinstance(k.name, str):
-                nm = k.name.lower()
-                if nm in ('g', 'h', 'q'):
-                    return nm.upper()
-        except Exception:
-            pass
-        return None
+    with STARTUP.phase("import pynput"):
+        from pynput import keyboard
+        from pynput.keyboard import Key
     
-    def on_press(key):
-        """Handle key press"""
-        nonlocal hotkey_triggered, last_trigger_time, ctrl_down, shift_down
-        
+    # With a daemon running, presses are handed to it instead of loading the backends here
+    app = None
+    if USE_DAEMON or "--client" in sys.argv[1:]:
+        from daemon import DaemonClient
+        client = DaemonClient(DAEMON_HOST, DAEMON_PORT, DAEMON_SOCKET)
         try:
-            # Update modifier states
-            if key in (Key.ctrl, Key.ctrl_l, Key.ctrl_r):
-                ctrl_down = True
-            if key in (Key.shift, Key.shift_l, Key.shift_r):
-                shift_down = True
-
-            # Debug: Show modifiers when they change or a key is pressed
-            if VERBOSE:
-                mods = []
-                if ctrl_down:
-                    mods.append('CTRL')
-                if shift_down:
-                    mods.append('SHIFT')
-                if mods:
-                    print(f"🔍 [DEBUG] Keys currently held: {' + '.join(mods)}")
-
-            # Detect if this key press is G/H/Q
-            letter = detect_letter(key)
-            
-            # Only process if not already processing
-            if app.processing:
-                return
-            
-            # Debounce very quick repeats
-            now = time.time()
-            if now - last_trigger_time < 0.2:
-                return
-            
-            # Don't re-trigger if we've already triggered this key combo
-            if hotkey_triggered:
-                return
-
-            # Check for Ctrl+Shift+Q to exit
-            if letter == 'Q' and ctrl_down and shift_down:
-                print("\n👋 Exit hotkey (Ctrl+Shift+Q) detected!")
-                print("Shutting down...")
-                import os
-                os._exit(0)
-            
-            # Check for Ctrl+Shift+H to process with Gemini
-            if letter == 'H' and ctrl_down and shift_down:
-                print("\n🎯 HOTKEY DETECTED: Ctrl+Shift+H pressed! (Gemini mode)")
-                hotkey_triggered = True
-                last_trigger_time = now
-                app.process_clipboard(use_gemini=True)
-            
-            # Check for Ctrl+Shift+G to process with Ollama
-            elif letter == 'G' and ctrl_down and shift_down:
-                print("\n🎯 HOTKEY DETECTED: Ctrl+Shift+G pressed! (Ollama mode)")
-                hotkey_triggered = True
-                last_trigger_time = now
-                app.process_clipboard(use_gemini=False)
-                    
-        except AttributeError:
-            pass
+            with STARTUP.phase("connect to daemon"):
+                info = client.health()
+            print(f"🛰️  Using the daemon at {client.address} "
+                  f"({', '.join(name for name in (info.get('ollama'), info.get('gemini')) if name)})")
+            app = client
         except Exception as e:
-            print(f"❌ Error in key press handler: {e}")
-            if VERBOSE:
-                import traceback
-                traceback.print_exc()
+            print(f"⚠️  No daemon at {client.address} ({e}) - starting in-process")
+    if app is None:
+        with STARTUP.phase("ClipboardAI()"):
+            app = ClipboardAI()
+    
+    def exit_app(pressed_at):
+        print("\n👋 Exit hotkey detected!")
+        print("Shutting down...")
+        if getattr(app, "history", None):
+            app.history.flush(timeout=2)
+        import os
+        os._exit(0)
 
-    def on_release(key):
-        """Handle key release"""
-        nonlocal hotkey_triggered, ctrl_down, shift_down
-        
-        try:
-            # Update modifier states
-            if key in (Key.ctrl, Key.ctrl_l, Key.ctrl_r):
-                ctrl_down = False
-                hotkey_triggered = False
-            if key in (Key.shift, Key.shift_l, Key.shift_r):
-                shift_down = False
-                hotkey_triggered = False
-            # Reset on releasing the hotkey letters as well
-            letter = detect_letter(key)
-            if letter in ('G','H','Q'):
-                hotkey_triggered = False
-                
-        except KeyError:
-            pass
-        except Exception as e:
-            if VERBOSE:
-                print(f"🔍 [DEBUG] Error in key release handler: {e}")
+    # Action name -> (label shown when it fires, handler(pressed_at)); handlers run in
+    # press order on the HotkeyWorker thread, never on the listener's
+    actions = {
+        "ollama": ("Ollama mode", lambda pressed_at: app.submit(pressed_at=pressed_at)),
+        "ollama_fresh": ("Ollama mode, skip cache",
+                         lambda pressed_at: app.submit(bypass_cache=True, pressed_at=pressed_at)),
+        "gemini": ("Gemini mode", lambda pressed_at: app.submit(use_gemini=True, pressed_at=pressed_at)),
+        "gemini_fresh": ("Gemini mode, skip cache",
+                         lambda pressed_at: app.submit(use_gemini=True, bypass_cache=True, pressed_at=pressed_at)),
+        "race": ("race mode", lambda pressed_at: app.submit(pressed_at=pressed_at, race=True)),
+        "race_fresh": ("race mode, skip cache",
+                       lambda pressed_at: app.submit(bypass_cache=True, pressed_at=pressed_at, race=True)),
+        "clear_cache": ("clear cache", lambda pressed_at: app.clear_cache()),
+        "recall": ("recall from history",
+                   lambda pressed_at: threading.Thread(target=app.recall, name="recall", daemon=True).start()),
+        "cancel": ("cancel", lambda pressed_at: app.cancel_requests()),
+        "exit": (None, exit_app),
+    }
+    try:
+        bindings = compile_bindings(merge_hotkeys(HOTKEYS), actions)
+    except ValueError as e:
+        print(f"❌ Invalid HOTKEYS in config.py: {e}")
+        sys.exit(1)
+    modifier_keys = {
+        Key.ctrl: CTRL, Key.ctrl_l: CTRL, Key.ctrl_r: CTRL,
+        Key.shift: SHIFT, Key.shift_l: SHIFT, Key.shift_r: SHIFT,
+        Key.alt: ALT, Key.alt_l: ALT, Key.alt_r: ALT, Key.alt_gr: ALT,
+    }
+    # The listener calls the dispatcher directly for every keystroke system-wide; it
+    # only looks keys up and enqueues, so nothing here can block or raise into pynput
+    dispatcher = HotkeyDispatcher(bindings, modifier_keys, HotkeyWorker(), verbose=VERBOSE)
 
     # Start listening for keyboard events
     print("🎧 Keyboard listener started...")
     if VERBOSE:
         print("🔍 [DEBUG] Listening for:")
-        print("🔍 [DEBUG]   - Ctrl+Shift+G (Ollama)")
-        print("🔍 [DEBUG]   - Ctrl+Shift+H (Gemini)")
-        print("🔍 [DEBUG]   - Ctrl+Shift+Q (exit)")
+        for combo, label in dispatcher.describe():
+            print(f"🔍 [DEBUG]   - {combo} ({label})")
         print("🔍 [DEBUG] Press keys to see them detected")
         print("🔍 [DEBUG] Or just close the terminal window to exit\n")
     
-    with keyboard.Listener(on_press=on_press, on_release=on_release) as listener:
+    with keyboard.Listener(on_press=dispatcher.on_press, on_release=dispatcher.on_release) as listener:
+        print("\n✅ Ready! Listening for keyboard input...")
+        print(f"⏱️  Startup: {STARTUP.summary(STARTUP_BUDGET_MS)}")
+        print("💡 TIP: Try pressing Ctrl+Shift+G (Ollama) or Ctrl+Shift+H (Gemini)!\n")
         try:
             listener.join()
         except KeyboardInterrupt:
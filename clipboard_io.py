@@ -0,0 +1,162 @@
+"""
+Clipboard access layer - reads and writes with timing metrics, and verifies
+writes by polling against a short deadline instead of sleeping a fixed time.
+Timings are returned by each call rather than kept on the shared ClipboardIO,
+so concurrent requests (parallel jobs, the daemon, batch mode) each get their own.
+
+Backends:
+  SystemClipboard   - pyperclip (imported on first use)
+  InMemoryClipboard - a plain in-process clipboard for headless runs and benchmarks
+"""
+
+import sys
+import threading
+import time
+
+
+class ClipboardError(Exception):
+    """The clipboard could not be read or written"""
+
+    def __init__(self, message, attempts=1):
+        super().__init__(message)
+        self.attempts = attempts
+
+
+class ClipboardWrite:
+    """How one write went: total seconds, the part spent verifying it, and attempts made"""
+
+    def __init__(self, seconds=0.0, verify_seconds=0.0, attempts=0):
+        self.seconds = seconds
+        self.verify_seconds = verify_seconds
+        self.attempts = attempts
+
+
+class SystemClipboard:
+    """The desktop clipboard through pyperclip"""
+
+    name = "system"
+
+    def __init__(self):
+        self._pyperclip = None
+        # Windows (SetClipboardData) and macOS (pbcopy exits after the write) update the
+        # clipboard before copy() returns; X11/Wayland helpers may not, so verify there.
+        self.synchronous_writes = sys.platform in ("win32", "darwin")
+
+    @property
+    def pyperclip(self):
+        if self._pyperclip is None:
+            import pyperclip
+            self._pyperclip = pyperclip
+        return self._pyperclip
+
+    def read(self):
+        return self.pyperclip.paste()
+
+    def write(self, text):
+        self.pyperclip.copy(text)
+
+
+class InMemoryClipboard:
+    """Thread-safe in-process clipboard; optional delays simulate a slow desktop clipboard"""
+
+    name = "memory"
+
+    def __init__(self, text="", read_delay=0.0, write_delay=0.0):
+        self._text = text
+        self._lock = threading.Lock()
+        self.read_delay = read_delay
+        self.write_delay = write_delay
+        self.synchronous_writes = True
+        self.writes = 0
+
+    def read(self):
+        if self.read_delay:
+            time.sleep(self.read_delay)
+        with self._lock:
+            return self._text
+
+    def write(self, text):
+        if self.write_delay:
+            time.sleep(self.write_delay)
+        with self._lock:
+            self._text = text
+            self.writes += 1
+
+
+def create_clipboard(kind="system"):
+    if kind == "system":
+        return SystemClipboard()
+    if kind == "memory":
+        return InMemoryClipboard()
+    raise ValueError(f"Unknown CLIPBOARD_BACKEND '{kind}' (expected 'system' or 'memory')")
+
+
+class ClipboardIO:
+    """Timed clipboard reads/writes with deadline-based write verification"""
+
+    def __init__(self, backend, verify="auto", verify_timeout=0.25, poll_interval=0.005,
+                 max_attempts=5, retry_delay=0.05):
+        self.backend = backend
+        self.verify = verify
+        self.verify_timeout = verify_timeout
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    @property
+    def should_verify(self):
+        if self.verify == "auto":
+            return not getattr(self.backend, "synchronous_writes", False)
+        return bool(self.verify)
+
+    def read(self):
+        """Returns (text, seconds the read took)"""
+        started = time.perf_counter()
+        try:
+            text = self.backend.read()
+        except Exception as e:
+            raise ClipboardError(f"reading clipboard failed: {e}") from e
+        return text, time.perf_counter() - started
+
+    def write_unverified(self, text):
+        """Best-effort write (used for partial streaming updates)"""
+        self.backend.write(text)
+
+    def _wait_for(self, text):
+        """Poll until the clipboard holds text or the deadline passes"""
+        deadline = time.perf_counter() + self.verify_timeout
+        while True:
+            if self.backend.read() == text:
+                return True
+            if time.perf_counter() >= deadline:
+                return False
+            time.sleep(self.poll_interval)
+
+    def write(self, text, on_retry=None):
+        """Write text, verifying it landed when needed; returns a ClipboardWrite, or raises
+        ClipboardError (with .attempts) after max_attempts.
+
+        on_retry(attempt, error, delay) is called before each retry.
+        """
+        started = time.perf_counter()
+        result = ClipboardWrite()
+        delay = self.retry_delay
+        for attempt in range(1, self.max_attempts + 1):
+            result.attempts = attempt
+            try:
+                self.backend.write(text)
+                if self.should_verify:
+                    verify_started = time.perf_counter()
+                    landed = self._wait_for(text)
+                    result.verify_seconds += time.perf_counter() - verify_started
+                    if not landed:
+                        raise ClipboardError("clipboard verification failed")
+                result.seconds = time.perf_counter() - started
+                return result
+            except Exception as e:
+                if attempt == self.max_attempts:
+                    raise ClipboardError(str(e), attempts=attempt) from e
+                if on_retry is not None:
+                    on_retry(attempt, e, delay)
+                time.sleep(delay)
+                delay *= 2  # Exponential backoff
@@ -0,0 +1,138 @@
+"""
+Request coalescing - what a burst of hotkey presses turns into.
+
+The clipboard is read when the hotkey is pressed (not when a worker gets to
+the request), and the press joins a batch for its backend:
+
+- the same text as a request that is still queued or running shares that
+  request's answer instead of asking the model again
+- other text pressed within COALESCE_WINDOW seconds of the batch's first
+  press, or while the batch waits behind a running request, is added to the
+  batch; the batch is answered by one multi-part prompt (COALESCE_MERGE) or
+  as a sequence of requests, in press order
+
+Without a window every distinct press is its own batch, as before.
+"""
+
+import threading
+import time
+
+
+class Part:
+    """One distinct clipboard text in a batch"""
+
+    def __init__(self, content, pressed_at=None, read_seconds=None):
+        self.content = content
+        self.pressed_at = pressed_at
+        self.read_seconds = read_seconds
+        self.presses = 1
+
+
+class Batch:
+    """Presses for one backend that are answered by the same job"""
+
+    def __init__(self, key):
+        self.key = key
+        self.parts = []
+        self.opened = time.perf_counter()
+        self.closed = False
+        self.job = None
+
+    @property
+    def presses(self):
+        return sum(part.presses for part in self.parts)
+
+    @property
+    def live(self):
+        """Still queued or running and not cancelled; a cancelled job may still be winding
+        down, but it will not answer, so new presses must not wait on it"""
+        if self.job is None:
+            return True
+        return not (self.job.done.is_set() or self.job.cancel.is_set())
+
+
+class Coalescer:
+    """Groups presses into batches and counts the backend calls that saves"""
+
+    def __init__(self, window=0.0, max_parts=4, merge=True):
+        self.window = window
+        self.max_parts = max(1, max_parts)
+        self.merge = merge
+        self.presses = 0
+        self.duplicates = 0
+        self.merged = 0
+        self._batches = {}  # key -> live batches, oldest first
+        self._lock = threading.Lock()
+
+    def add(self, key, content, start, pressed_at=None, read_seconds=None):
+        """Place a press; start(batch) is called (under the lock) to submit the job for a new
+        batch and returns the job, or None if it was rejected.
+
+        Returns (batch, status): status is "new", "joined" (a new part of a pending batch),
+        "duplicate" (shares an identical part's answer) or "rejected".
+        """
+        with self._lock:
+            self.presses += 1
+            batches = self._batches[key] = [batch for batch in self._batches.get(key, ()) if batch.live]
+            for batch in batches:
+                for part in batch.parts:
+                    if part.content == content:
+                        part.presses += 1
+                        self.duplicates += 1
+                        return batch, "duplicate"
+            if self.window:
+                for batch in batches:
+                    if not batch.closed and len(batch.parts) < self.max_parts:
+                        batch.parts.append(Part(content, pressed_at, read_seconds))
+                        return batch, "joined"
+            batch = Batch(key)
+            batch.parts.append(Part(content, pressed_at, read_seconds))
+            batch.job = start(batch)
+            if batch.job is None:
+                self.presses -= 1
+                return batch, "rejected"
+            batches.append(batch)
+            return batch, "new"
+
+    def close(self, batch, cancel=None):
+        """Wait until the window since the batch's first press has passed, then stop it
+        taking new parts; returns its parts in press order"""
+        remaining = batch.opened + self.window - time.perf_counter()
+        if remaining > 0:
+            if cancel is not None:
+                cancel.wait(remaining)
+            else:
+                time.sleep(remaining)
+        with self._lock:
+            batch.closed = True
+            if self.merge and len(batch.parts) > 1:
+                self.merged += len(batch.parts) - 1
+            return list(batch.parts)
+
+    def finish(self, batch):
+        with self._lock:
+            batches = self._batches.get(batch.key, [])
+            if batch in batches:
+                batches.remove(batch)
+
+    def calls(self, batch):
+        """Requests the batch's presses took (one per part, or one for a merged prompt)"""
+        return 1 if self.merge else len(batch.parts)
+
+    def stats(self):
+        with self._lock:
+            saved = self.duplicates + self.merged
+            return {
+                "presses": self.presses,
+                "requests": self.presses - saved,
+                "duplicates": self.duplicates,
+                "merged": self.merged,
+                "saved": saved,
+            }
+
+    def describe(self):
+        if not self.window:
+            return "identical presses share one request"
+        how = "one prompt" if self.merge else "a sequence"
+        return (f"identical presses share one request; others within {self.window:g}s are answered "
+                f"together as {how} (up to {self.max_parts})")
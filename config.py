@@ -1,9 +1,12 @@
 # Configuration file for Local AI Clipboard
 import os
-from dotenv import load_dotenv
 
-# Load environment variables from .env file
-load_dotenv()
+# Load environment variables from the .env file next to this one
+# (python-dotenv is only imported when there is a .env file to read)
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_ENV_FILE):
+    from dotenv import load_dotenv
+    load_dotenv(_ENV_FILE)
 
 # ============================================================
 # OLLAMA CONFIGURATION (Ctrl+Shift+G)
@@ -20,9 +23,29 @@ SYSTEM_PROMPT = '''
 
 # Timeout for Ollama response (seconds)
 # Increase this if you get timeout errors
-# First run might be slow as model loads into memory
+# First run might be slow as model loads into memory (see WARMUP_ON_START below)
 TIMEOUT = 300  # 5 minutes (increased from 120s)
 
+# How to talk to Ollama:
+#   "http" - reuse keep-alive connections to the local Ollama server (fastest)
+#   "cli"  - spawn `ollama run` for every request (old behavior)
+OLLAMA_BACKEND = "http"
+
+# Address of the Ollama server (used by the "http" backend)
+OLLAMA_HOST = os.getenv("OLLAMA_HOST", "http://localhost:11434")
+
+# How long Ollama keeps the model in memory after a request (e.g. "30m", "1h", -1 = forever)
+OLLAMA_KEEP_ALIVE = "30m"
+
+# Fall back to `ollama run` if the HTTP server can't be reached
+OLLAMA_CLI_FALLBACK = True
+
+# Load the model in the background when the app starts, so the first request is fast
+WARMUP_ON_START = True
+
+# Re-ping the model after this many idle seconds so it stays loaded (0 = rely on OLLAMA_KEEP_ALIVE only)
+WARMUP_PING_INTERVAL = 240
+
 # ============================================================
 # GEMINI API CONFIGURATION (Ctrl+Shift+H)
 # ============================================================
@@ -41,9 +64,220 @@ GEMINI_SYSTEM_PROMPT = '''
 
 '''
 
+# ============================================================
+# MODEL TIERS
+# ============================================================
+
+# Pick the model from the size (estimated tokens, ~4 characters each) and type
+# ("code", "data" or "prose") of the clipboard, so short snippets go to a small, fast
+# model. Tiers are checked in order; inputs that match none use MODEL / GEMINI_MODEL.
+# Pull the models first, then check the thresholds on your own samples with
+#   python model_tiers.py explain <folder>   and   python model_tiers.py compare <folder>
+# Example:
+# OLLAMA_TIERS = [
+#     {"name": "tiny", "max_tokens": 60, "model": "qwen2.5:0.5b"},
+#     {"name": "code", "max_tokens": 1500, "types": ["code"], "model": "qwen2.5-coder:1.5b"},
+#     {"name": "small", "max_tokens": 1500, "model": "phi3:mini"},
+# ]
+OLLAMA_TIERS = []
+GEMINI_TIERS = []  # e.g. [{"name": "short", "max_tokens": 500, "model": "gemini-2.5-flash"}]
+
+# ============================================================
+# ROUTING AND FALLBACKS
+# ============================================================
+
+# When the chosen backend is down, rate limited or keeps failing, answer with the
+# other one instead of failing the press
+ROUTER_FALLBACK = True
+
+# Smaller models to try before switching backend (leave empty to skip)
+OLLAMA_FALLBACK_MODEL = ""                 # e.g. "qwen2.5-coder:1.5b"
+GEMINI_FALLBACK_MODEL = "gemini-2.5-flash"  # has its own rate limit
+
+# A backend/model is skipped after this many failures in a row (rate limits and an
+# unreachable Ollama server count at once)...
+CIRCUIT_FAILURE_THRESHOLD = 3
+# ...for this many seconds, or longer if the server asks for it (doubles while it keeps failing)
+CIRCUIT_BACKOFF = 10
+CIRCUIT_MAX_BACKOFF = 300
+
+# ============================================================
+# RACE MODE (Ctrl+Shift+R)
+# ============================================================
+
+# Ctrl+Shift+R sends the clipboard to both Ollama and Gemini and keeps the first answer;
+# the slower one is cancelled. Needs Gemini to be configured.
+# Which backend starts first
+RACE_FIRST = "ollama"
+
+# Seconds to wait for the first backend before also starting the other one
+# (0 = start both at once; e.g. 1.5 only calls Gemini when Ollama is slow)
+RACE_HEDGE_DELAY = 0.0
+
 # ============================================================
 # GENERAL SETTINGS
 # ============================================================
 
 # Show verbose output in terminal
 VERBOSE = True
+
+# Extra or changed hotkeys: "modifiers+key" -> action, added to the defaults in hotkeys.py
+# (None turns a default off). Actions: ollama, ollama_fresh, gemini, gemini_fresh, race,
+# race_fresh (the _fresh ones skip the cache), clear_cache, recall, cancel, exit.
+# Example: HOTKEYS = {"ctrl+alt+o": "ollama", "ctrl+shift+alt+c": None}
+HOTKEYS = {}
+
+# Clipboard access: "system" (desktop clipboard via pyperclip) or "memory" (in-process, for headless runs)
+CLIPBOARD_BACKEND = "system"
+
+# Check that a write actually landed by reading it back:
+#   "auto" - only where the OS clipboard may update asynchronously (Linux/X11/Wayland)
+#   True / False - always / never
+CLIPBOARD_VERIFY = "auto"
+
+# How long to keep polling for a write to show up before retrying it (seconds)
+CLIPBOARD_VERIFY_TIMEOUT = 0.25
+
+# Record per-request timings (clipboard, first token, generation, ...) as JSON lines.
+# Show p50/p95/p99 per backend and model with: python clipboard_ai.py --stats
+TRACE_ENABLED = True
+TRACE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "traces.jsonl")
+TRACE_MAX_MB = 5     # rotate the file at this size
+TRACE_BACKUPS = 3    # rotated files to keep
+
+# Warn at startup if reaching "Ready! Listening" takes longer than this (milliseconds)
+STARTUP_BUDGET_MS = 1000
+
+# What a hotkey press does while an earlier request for the same backend is still running
+# (requests always run in the background, Ctrl+Shift+X cancels them):
+#   "queue"     - wait for the earlier one to finish, then run
+#   "supersede" - cancel the earlier one and run the new press instead
+#   "parallel"  - run alongside it (up to OLLAMA_WORKERS / GEMINI_WORKERS at once)
+JOB_POLICY = "queue"
+
+# How many presses can wait per backend before new ones are ignored
+JOB_QUEUE_SIZE = 4
+
+# Concurrent requests per backend when JOB_POLICY = "parallel"
+OLLAMA_WORKERS = 1
+GEMINI_WORKERS = 2
+
+# The clipboard is read the moment a hotkey is pressed, and a press for text that is
+# already queued or being answered shares that answer. Presses with other text
+# within this many seconds of the first (or while it waits for a running request)
+# are answered together, in press order (0 = every press is its own request)
+COALESCE_WINDOW = 0.0
+
+# True: ask once with a multi-part prompt and split the answer (one backend call);
+# False: answer the parts one after another
+COALESCE_MERGE = True
+
+# Most clipboards answered together
+COALESCE_MAX_PARTS = 4
+
+# Stream responses token by token (reports time-to-first-token and tokens/sec)
+STREAMING = True
+
+# While streaming, also copy the partial response to the clipboard as it grows
+# (the final answer is always written once generation finishes)
+STREAM_TO_CLIPBOARD = False
+
+# Minimum seconds between partial clipboard updates while streaming
+STREAM_CLIPBOARD_INTERVAL = 0.5
+
+# ============================================================
+# LARGE CLIPBOARDS
+# ============================================================
+
+# Inputs longer than this (characters) are split into chunks that are processed
+# in parallel and then merged (0 = always send the whole clipboard as one prompt)
+LARGE_INPUT_CHARS = 12000
+
+# Clipboards longer than this (characters) are refused instead of processed,
+# so an accidental multi-hundred-megabyte copy can't exhaust memory (0 = no limit)
+MAX_INPUT_CHARS = 1_000_000
+
+# Approximate size of each chunk (tokens, ~4 characters each)
+CHUNK_MAX_TOKENS = 2000
+
+# How many chunks are sent at the same time
+CHUNK_PARALLELISM_OLLAMA = 2  # also raise OLLAMA_NUM_PARALLEL on the Ollama server to benefit
+CHUNK_PARALLELISM_GEMINI = 4
+
+# Merge the partial answers with one final request (False = just join them)
+LARGE_INPUT_REDUCE = True
+
+# ============================================================
+# RESPONSE CACHE
+# ============================================================
+
+# Reuse the previous answer when the same text is sent to the same model again.
+# Hold Alt with the hotkey (Ctrl+Shift+Alt+G/H) to skip the cache and regenerate,
+# press Ctrl+Shift+Alt+C or run `python clipboard_ai.py --clear-cache` to empty it.
+CACHE_ENABLED = True
+
+# Where cached responses are stored
+CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "responses.sqlite3")
+
+# Evict least recently used entries beyond these limits
+CACHE_MAX_MB = 50
+CACHE_MAX_ENTRIES = 2000
+
+# Entries older than this are ignored and removed (seconds)
+CACHE_TTL = 7 * 24 * 3600  # 1 week
+
+# Also reuse an answer when the text is almost the same as an earlier request, e.g. the
+# same stack trace with other timestamps or ids, or the same text with other whitespace.
+# Off by default: a near match can differ in a detail that matters. Faster with NumPy installed.
+SIMILAR_CACHE_ENABLED = False
+
+# How similar the text must be (0-1: estimated share of 3-word phrases in common;
+# timestamps, UUIDs, hex ids and numbers of 5+ digits are ignored)
+SIMILAR_THRESHOLD = 0.9
+
+# ============================================================
+# CLIPBOARD HISTORY (Ctrl+Shift+Y)
+# ============================================================
+
+# Keep every prompt and response in a searchable history. Ctrl+Shift+Y replaces the
+# clipboard with the past response that best matches it; from a terminal:
+# `python history.py search <words>` and `python history.py paste <id|last>`
+# Off by default: it stores everything you send (passwords and keys you happen to
+# copy included) as plain text in HISTORY_PATH. Delete that file to forget it.
+HISTORY_ENABLED = False
+
+# Where the history is stored
+HISTORY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "history.sqlite3")
+
+# Oldest entries are removed beyond this many (0 = keep everything)
+HISTORY_MAX_ENTRIES = 200000
+
+# ============================================================
+# FOLLOW-UPS
+# ============================================================
+
+# A press within this many seconds of the last answer continues that exchange: the
+# model sees the earlier prompts and answers, and Ollama (HTTP backend) only
+# evaluates the new text because the rest is still in its cache. Follow-ups skip
+# the response cache. 0 = every press stands alone.
+CONVERSATION_WINDOW = 0
+
+# Earlier turns kept per backend; beyond this the older half is dropped
+CONVERSATION_MAX_TURNS = 8
+
+# ============================================================
+# DAEMON
+# ============================================================
+
+# `python daemon.py` keeps one warm instance (Ollama connection, cache, Gemini client)
+# running and serves it to scripts and the hotkey listener over a local HTTP API
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8765
+
+# Listen on a Unix socket at this path instead of host/port (Linux/macOS; "" = TCP)
+DAEMON_SOCKET = ""
+
+# Send hotkey presses to a running daemon instead of loading the backends in the
+# listener itself (same as `python clipboard_ai.py --client`; falls back to
+# in-process when no daemon answers)
+USE_DAEMON = False
@@ -0,0 +1,66 @@
+"""
+Follow-up mode - a hotkey press shortly after an answer continues that
+exchange instead of starting over.
+
+Each backend keeps one running conversation. Its earlier turns are sent again
+in exactly the same form every time (Ollama /api/chat messages, a Gemini chat
+history), so each request starts with the prefix the model processed last
+time: Ollama still holds that prefix in its KV cache and only evaluates the
+new turn, and Gemini 2.5 models cache repeated prefixes implicitly. `ollama run`
+keeps no state between processes, so it is sent the whole exchange as text.
+Compare the prompt_eval and followup_eval rows of `python clipboard_ai.py --stats`.
+"""
+
+import threading
+import time
+
+
+class ConversationTracker:
+    """The (prompt, response) turns of the current exchange per backend, kept while
+    presses come within `window` seconds of the last answer"""
+
+    def __init__(self, window=120, max_turns=8):
+        self.window = window
+        self.max_turns = max_turns
+        self._turns = {}  # kind -> list of (prompt, response)
+        self._updated = {}  # kind -> time.monotonic() of the last answer
+        self._lock = threading.Lock()
+
+    def current(self, kind):
+        """Earlier turns to continue for kind (a tuple, empty once the window has passed)"""
+        with self._lock:
+            updated = self._updated.get(kind)
+            if updated is None or time.monotonic() - updated > self.window:
+                self._turns.pop(kind, None)
+                self._updated.pop(kind, None)
+                return ()
+            return tuple(self._turns.get(kind, ()))
+
+    def idle_seconds(self, kind):
+        with self._lock:
+            updated = self._updated.get(kind)
+        return None if updated is None else time.monotonic() - updated
+
+    def record(self, kind, prompt, response):
+        """Append an answered turn; restarts the exchange if the window had already passed"""
+        with self._lock:
+            updated = self._updated.get(kind)
+            turns = self._turns.setdefault(kind, [])
+            if updated is None or time.monotonic() - updated > self.window:
+                turns.clear()
+            turns.append((prompt, response))
+            if self.max_turns and len(turns) > self.max_turns:
+                # Drop the older half at once: every drop changes the prefix, so the
+                # next request re-evaluates it in full. Always keep the latest turn, or
+                # max_turns=1 would forget every other answer
+                del turns[:len(turns) - max(1, self.max_turns // 2)]
+            self._updated[kind] = time.monotonic()
+
+    def reset(self, kind=None):
+        with self._lock:
+            for name in [kind] if kind else list(self._turns):
+                self._turns.pop(name, None)
+                self._updated.pop(name, None)
+
+    def describe(self):
+        return f"presses within {self.window:.0f}s of an answer continue it (up to {self.max_turns} turns)"
@@ -0,0 +1,516 @@
+"""
+Daemon - one resident ClipboardAI per machine (warm Ollama connection, model
+warm-up, response cache, Gemini client, router state) served over a small
+local HTTP API, so scripts and the hotkey listener share it instead of each
+starting a cold copy.
+
+    python daemon.py [serve] [--host 127.0.0.1] [--port 8765] [--socket PATH]
+    python daemon.py ask [--backend ollama|gemini|race] [--no-cache] [TEXT]   # TEXT or stdin
+
+Endpoints (JSON bodies). Only local clients are served: the Host header must be
+localhost, 127.0.0.1 or [::1], requests carrying an Origin header (web pages) are
+refused and POSTs must be sent as application/json.
+
+  GET  /health       models, routes, cache size, near-duplicate hit rate, request counts and
+                     backend calls saved by coalescing
+  POST /complete     {"text": ..., "backend": "ollama"|"gemini"|"race", "no_cache": false, "stream": true}
+                     streams NDJSON {"response": "<piece>"} lines, then a final
+                     {"done": true, "status": ..., "response": "<full answer>", "trace": {...}};
+                     with "stream": false only the final object is returned
+  POST /clipboard    {"backend": ..., "no_cache": false} - a hotkey press: process the clipboard
+  POST /recall       replace the clipboard with the best matching answer from the history
+  POST /cancel       cancel running and queued clipboard requests
+  POST /cache/clear  empty the response cache
+
+The hotkey listener becomes a client with `python clipboard_ai.py --client`
+(or USE_DAEMON = True in config.py).
+"""
+
+import argparse
+import asyncio
+import functools
+import http.client
+import json
+import os
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cancellation import CancelToken
+
+BACKENDS = ("ollama", "gemini", "race")
+
+# Bodies are prompts; anything bigger than this is not a clipboard
+MAX_BODY = 64 * 1024 * 1024
+
+_REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 403: "Forbidden", 404: "Not Found",
+            405: "Method Not Allowed", 413: "Payload Too Large", 415: "Unsupported Media Type",
+            429: "Too Many Requests", 431: "Request Header Fields Too Large"}
+
+# Host headers a local client sends; anything else is a browser that was pointed here
+# by DNS rebinding (or a remote client, if the daemon was bound to a public address)
+LOCAL_HOSTS = ("localhost", "127.0.0.1", "[::1]")
+
+
+class BadRequest(Exception):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _check_local(method, headers):
+    """Refuse requests a web page could make: browsers always send Origin on cross-site
+    POSTs, can't set a JSON Content-Type on a "simple" request without a preflight this
+    server never answers, and send the attacker's name as Host after DNS rebinding"""
+    host = headers.get("host", "")
+    name = host.rsplit(":", 1)[0] if not host.endswith("]") else host
+    if name.lower() not in LOCAL_HOSTS:
+        raise BadRequest(f"Host {host!r} is not a local address", 403)
+    if "origin" in headers:
+        raise BadRequest("requests from web pages are not accepted", 403)
+    content_type = headers.get("content-type", "").split(";", 1)[0].strip().lower()
+    if method == "POST" and content_type != "application/json":
+        raise BadRequest("Content-Type must be application/json", 415)
+
+
+async def _readline(reader):
+    try:
+        return await reader.readline()
+    except (ValueError, asyncio.LimitOverrunError):
+        # Longer than the stream's buffer limit (64 KiB) - nothing a local client sends
+        raise BadRequest("request line or header too long", 431)
+
+
+async def _read_request(reader):
+    """Read one HTTP/1.1 request; returns (method, path, headers, body) or None at EOF"""
+    line = await _readline(reader)
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split(" ", 2)
+    except ValueError:
+        raise BadRequest("malformed request line")
+    headers = {}
+    while True:
+        line = await _readline(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise BadRequest("bad Content-Length")
+    if length > MAX_BODY:
+        raise BadRequest(f"body larger than {MAX_BODY} bytes", 413)
+    body = await reader.readexactly(length) if length else b""
+    return method.upper(), target.split("?", 1)[0], headers, body
+
+
+def _head(status, content_type, length=None):
+    lines = [f"HTTP/1.1 {status} {_REASONS.get(status, '')}", f"Content-Type: {content_type}"]
+    lines.append(f"Content-Length: {length}" if length is not None else "Transfer-Encoding: chunked")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(writer, data, status=200):
+    body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    writer.write(_head(status, "application/json", len(body)) + body)
+    await writer.drain()
+
+
+async def _send_chunk(writer, data):
+    line = json.dumps(data, ensure_ascii=False).encode("utf-8") + b"\n"
+    writer.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+    await writer.drain()
+
+
+class DaemonServer:
+    """Serves one ClipboardAI to many local clients.
+
+    Completions run on a thread pool per backend (OLLAMA_WORKERS / GEMINI_WORKERS
+    requests at once), so clients share the app's connections and cache without
+    overloading a backend; clipboard presses go through the app's job queue
+    exactly like local hotkeys.
+    """
+
+    def __init__(self, app, workers):
+        self.app = app
+        self.pools = {name: ThreadPoolExecutor(max(1, count), thread_name_prefix=f"daemon-{name}")
+                      for name, count in workers.items()}
+        self.started = time.time()
+        self.completions = 0
+        self.active = 0
+        self.socket_path = None
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request = await _read_request(reader)
+                except BadRequest as e:
+                    await _send_json(writer, {"error": str(e)}, e.status)
+                    break
+                if request is None:
+                    break
+                method, path, headers, body = request
+                try:
+                    _check_local(method, headers)
+                    try:
+                        payload = json.loads(body) if body else {}
+                    except ValueError as e:
+                        raise BadRequest(f"bad JSON body: {e}")
+                    if not isinstance(payload, dict):
+                        raise BadRequest("body must be a JSON object")
+                    await self.dispatch(method, path, payload, writer)
+                except BadRequest as e:
+                    await _send_json(writer, {"error": str(e)}, e.status)
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, payload, writer):
+        routes = {
+            ("GET", "/health"): self.health,
+            ("POST", "/complete"): self.complete,
+            ("POST", "/clipboard"): self.clipboard,
+            ("POST", "/recall"): self.recall,
+            ("POST", "/cancel"): self.cancel,
+            ("POST", "/cache/clear"): self.clear_cache,
+        }
+        handler = routes.get((method, path))
+        if handler is None:
+            known = {p for _, p in routes}
+            raise BadRequest(f"{method} {path} not supported", 405 if path in known else 404)
+        await handler(payload, writer)
+
+    async def health(self, payload, writer):
+        app = self.app
+        primaries = {kind: app.router.primary(kind) for kind in ("ollama", "gemini")}
+        await _send_json(writer, {
+            "status": "ok",
+            "uptime_s": round(time.time() - self.started, 1),
+            **{kind: route.name if route else None for kind, route in primaries.items()},
+            "routes": app.router.describe(),
+            "cache_entries": app.cache.stats()["entries"] if app.cache else None,
+            "similar_cache": app.similar.stats() if app.similar else None,
+            "completions": self.completions,
+            "active": self.active,
+            "clipboard_jobs": app.jobs.pending(),
+            "coalescing": app.coalescer.stats(),
+        })
+
+    async def complete(self, payload, writer):
+        text = payload.get("text")
+        backend = payload.get("backend") or "ollama"
+        if not isinstance(text, str):
+            raise BadRequest('"text" must be a string')
+        if backend not in BACKENDS:
+            raise BadRequest(f'"backend" must be one of {", ".join(BACKENDS)}')
+        stream = payload.get("stream", True)
+
+        loop = asyncio.get_running_loop()
+        pieces = asyncio.Queue()
+        cancel = CancelToken()
+
+        def on_chunk(piece):
+            loop.call_soon_threadsafe(pieces.put_nowait, piece)
+
+        self.completions += 1
+        self.active += 1
+        work = loop.run_in_executor(self.pools[backend], self.app.complete, text, backend,
+                                    bool(payload.get("no_cache")), cancel, "api", on_chunk if stream else None)
+        try:
+            if not stream:
+                response, trace = await work
+                await _send_json(writer, self._final(response, trace))
+                return
+            writer.write(_head(200, "application/x-ndjson"))
+            streamed = False
+            while not work.done() or not pieces.empty():
+                if pieces.empty():
+                    getter = asyncio.ensure_future(pieces.get())
+                    await asyncio.wait({getter, work}, return_when=asyncio.FIRST_COMPLETED)
+                    if not getter.done():
+                        getter.cancel()
+                        continue
+                    piece = getter.result()
+                else:
+                    piece = pieces.get_nowait()
+                await _send_chunk(writer, {"response": piece})
+                streamed = True
+            response, trace = work.result()
+            if response and not streamed:
+                # Cached, raced or map-reduced answers arrive in one piece
+                await _send_chunk(writer, {"response": response})
+            await _send_chunk(writer, self._final(response, trace))
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            # The client went away: stop generating for it
+            cancel.cancel("client disconnected")
+            raise
+        finally:
+            self.active -= 1
+
+    @staticmethod
+    def _final(response, trace):
+        return {"done": True, "status": trace.status, "response": response, "trace": trace.to_dict()}
+
+    async def clipboard(self, payload, writer):
+        backend = payload.get("backend") or "ollama"
+        if backend not in BACKENDS:
+            raise BadRequest(f'"backend" must be one of {", ".join(BACKENDS)}')
+        pressed_at = None
+        if payload.get("pressed_ms_ago") is not None:
+            try:
+                pressed_at = time.perf_counter() - float(payload["pressed_ms_ago"]) / 1000
+            except (TypeError, ValueError):
+                raise BadRequest('"pressed_ms_ago" must be a number')
+        # submit() reads the clipboard (with retries and write-verification polling), so it
+        # runs on a thread instead of stalling every other connection on the event loop
+        loop = asyncio.get_running_loop()
+        job = await loop.run_in_executor(None, functools.partial(
+            self.app.submit, use_gemini=backend == "gemini", bypass_cache=bool(payload.get("no_cache")),
+            pressed_at=pressed_at, race=backend == "race"))
+        if job is None:
+            await _send_json(writer, {"accepted": False, "error": "request queue is full"}, 429)
+        else:
+            await _send_json(writer, {"accepted": True, "job": job.id, "pending": self.app.jobs.pending(backend)}, 202)
+
+    async def recall(self, payload, writer):
+        loop = asyncio.get_running_loop()
+        entry = await loop.run_in_executor(None, self.app.recall)
+        await _send_json(writer, {"recalled": entry.id if entry else None,
+                                  "describe": entry.describe() if entry else None})
+
+    async def cancel(self, payload, writer):
+        await _send_json(writer, {"cancelled": self.app.cancel_requests()})
+
+    async def clear_cache(self, payload, writer):
+        def clear():
+            removed = self.app.cache.clear() if self.app.cache else 0
+            if self.app.similar:
+                self.app.similar.clear()
+            return removed
+
+        removed = await asyncio.get_running_loop().run_in_executor(None, clear)  # SQLite deletes
+        await _send_json(writer, {"removed": removed, "enabled": self.app.cache is not None})
+
+    async def serve(self, host="127.0.0.1", port=8765, socket_path=""):
+        if socket_path:
+            _remove_stale_socket(socket_path)
+            server = await asyncio.start_unix_server(self.handle, path=socket_path)
+            self.socket_path = where = socket_path
+        else:
+            server = await asyncio.start_server(self.handle, host, port)
+            where = "http://{}:{}".format(*server.sockets[0].getsockname()[:2])
+        print(f"🛰️  Daemon listening on {where} (Ctrl+C to stop)")
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+
+def _remove_stale_socket(path):
+    """Delete a socket file left behind by a daemon that is no longer running"""
+    if not os.path.exists(path):
+        return
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except OSError:
+        os.unlink(path)
+        return
+    finally:
+        probe.close()
+    raise OSError(f"another daemon is already listening on {path}")
+
+
+# --- Client -------------------------------------------------------------------
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+class DaemonError(Exception):
+    """The daemon answered with an error status"""
+
+
+class DaemonClient:
+    """Talks to a running daemon.
+
+    submit(), recall(), cancel_requests() and clear_cache() mirror ClipboardAI, so the
+    hotkey listener can use a client in place of an in-process app.
+    """
+
+    def __init__(self, host="127.0.0.1", port=8765, socket_path="", timeout=600):
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.timeout = timeout
+
+    @property
+    def address(self):
+        return self.socket_path or f"http://{self.host}:{self.port}"
+
+    def _connect(self, timeout):
+        if self.socket_path:
+            return _UnixHTTPConnection(self.socket_path, timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=timeout)
+
+    def _request(self, method, path, payload=None, timeout=None):
+        """Send a request; returns the open response (caller reads and closes the connection)"""
+        conn = self._connect(timeout if timeout is not None else self.timeout)
+        body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        try:
+            conn.request(method, path, body, {"Content-Type": "application/json", "Connection": "close"})
+            return conn, conn.getresponse()
+        except BaseException:
+            conn.close()
+            raise
+
+    def _call(self, method, path, payload=None, timeout=None):
+        conn, response = self._request(method, path, payload, timeout)
+        try:
+            data = json.loads(response.read() or b"{}")
+        finally:
+            conn.close()
+        if response.status >= 400 and response.status != 429:
+            raise DaemonError(data.get("error") or f"HTTP {response.status}")
+        return data
+
+    def health(self, timeout=2.0):
+        return self._call("GET", "/health", timeout=timeout)
+
+    def complete(self, text, backend="ollama", no_cache=False, on_chunk=None):
+        """Return the daemon's final result dict; on_chunk(piece) receives the answer as it streams"""
+        payload = {"text": text, "backend": backend, "no_cache": no_cache, "stream": on_chunk is not None}
+        if on_chunk is None:
+            return self._call("POST", "/complete", payload)
+        conn, response = self._request("POST", "/complete", payload)
+        try:
+            if response.status >= 400:
+                raise DaemonError(json.loads(response.read() or b"{}").get("error") or f"HTTP {response.status}")
+            for line in response:
+                message = json.loads(line)
+                if message.get("done"):
+                    return message
+                on_chunk(message["response"])
+        finally:
+            conn.close()
+        raise DaemonError("stream ended without a final message")
+
+    def submit(self, use_gemini=False, bypass_cache=False, pressed_at=None, race=False):
+        """Hand a hotkey press to the daemon without blocking the keyboard listener"""
+        backend = "race" if race else "gemini" if use_gemini else "ollama"
+        payload = {"backend": backend, "no_cache": bypass_cache}
+
+        def send():
+            if pressed_at is not None:
+                payload["pressed_ms_ago"] = (time.perf_counter() - pressed_at) * 1000
+            try:
+                reply = self._call("POST", "/clipboard", payload, timeout=5.0)
+            except (OSError, DaemonError) as e:
+                print(f"❌ Daemon at {self.address} did not take the request: {e}")
+                return
+            if reply.get("accepted"):
+                waiting = reply.get("pending", 1) - 1
+                print(f"🛰️  Sent to daemon ({backend}){f' - {waiting} ahead of it' if waiting > 0 else ''}")
+            else:
+                print(f"⚠️  Daemon: {reply.get('error')}, press ignored")
+
+        threading.Thread(target=send, name="daemon-submit", daemon=True).start()
+
+    def recall(self):
+        try:
+            reply = self._call("POST", "/recall", timeout=30.0)
+        except (OSError, DaemonError) as e:
+            print(f"❌ Could not reach the daemon: {e}")
+            return
+        if reply["recalled"]:
+            print(f"📜 Recalled {reply['describe']} - paste with Ctrl+V")
+        else:
+            print("🔎 Nothing in the history matches the clipboard")
+
+    def cancel_requests(self):
+        try:
+            cancelled = self._call("POST", "/cancel", timeout=5.0)["cancelled"]
+        except (OSError, DaemonError) as e:
+            print(f"❌ Could not reach the daemon: {e}")
+            return 0
+        print(f"🛑 Cancelled {cancelled} request(s)" if cancelled else "💤 Nothing to cancel")
+        return cancelled
+
+    def clear_cache(self):
+        try:
+            reply = self._call("POST", "/cache/clear", timeout=5.0)
+        except (OSError, DaemonError) as e:
+            print(f"❌ Could not reach the daemon: {e}")
+            return
+        if reply["enabled"]:
+            print(f"🧹 Response cache cleared ({reply['removed']} entries removed)")
+        else:
+            print("⚠️  Response cache is disabled (CACHE_ENABLED = False)")
+
+
+def main(argv=None):
+    import clipboard_ai
+
+    parser = argparse.ArgumentParser(description="Serve one warm Clipboard AI to local clients")
+    parser.add_argument("command", nargs="?", choices=["serve", "ask"], default="serve")
+    parser.add_argument("text", nargs="?", help="ask: text to send (default: stdin)")
+    parser.add_argument("--host", default=clipboard_ai.DAEMON_HOST)
+    parser.add_argument("--port", type=int, default=clipboard_ai.DAEMON_PORT)
+    parser.add_argument("--socket", default=clipboard_ai.DAEMON_SOCKET, help="Unix socket path instead of TCP")
+    parser.add_argument("--backend", choices=BACKENDS, default="ollama", help="ask: backend to use")
+    parser.add_argument("--no-cache", action="store_true", help="ask: regenerate even if cached")
+    args = parser.parse_intermixed_args(argv)
+
+    if args.command == "ask":
+        client = DaemonClient(args.host, args.port, args.socket)
+        text = args.text if args.text is not None else sys.stdin.read()
+        try:
+            result = client.complete(text, args.backend, args.no_cache,
+                                     on_chunk=lambda piece: print(piece, end="", flush=True))
+        except (OSError, DaemonError) as e:
+            print(f"❌ Daemon at {client.address}: {e}", file=sys.stderr)
+            return 1
+        print()
+        return 0 if result.get("status") == "ok" else 1
+
+    app = clipboard_ai.ClipboardAI()
+    server = DaemonServer(app, {"ollama": clipboard_ai.OLLAMA_WORKERS, "gemini": clipboard_ai.GEMINI_WORKERS,
+                                "race": 1})
+    try:
+        asyncio.run(server.serve(args.host, args.port, args.socket))
+    except KeyboardInterrupt:
+        print("\n👋 Daemon stopped")
+    except OSError as e:
+        print(f"❌ Could not start the daemon: {e}")
+        return 1
+    finally:
+        server.close()
+        app.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Gemini backend - one GenerativeModel handle per (model, system prompt),
+created on first use and reused for every request afterwards. The
+google-generativeai SDK itself is only imported at that point too.
+
+The system prompt is passed as `system_instruction` rather than being
+concatenated into the user text.
+"""
+
+import threading
+
+from prompts import normalize_system_prompt
+
+
+class GeminiBackend:
+    """Reusable Gemini model handle with plain and streaming generation"""
+
+    name = "gemini"
+
+    def __init__(self, api_key, model, system_prompt=""):
+        self.api_key = api_key
+        self.model_name = model
+        self.system_prompt = normalize_system_prompt(system_prompt)
+        self._model = None
+        self._lock = threading.Lock()
+
+    def describe(self):
+        return f"{self.model_name}{' (with system instruction)' if self.system_prompt else ''}"
+
+    @property
+    def model(self):
+        """The GenerativeModel, built once on first use"""
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._model = genai.GenerativeModel(
+                        self.model_name, system_instruction=self.system_prompt or None
+                    )
+        return self._model
+
+    def _send(self, content, history, stream=False):
+        """generate_content, or a chat continuing earlier (prompt, response) turns"""
+        if not history:
+            return self.model.generate_content(content, stream=stream)
+        turns = []
+        for prompt, answer in history:
+            turns.append({"role": "user", "parts": [prompt]})
+            turns.append({"role": "model", "parts": [answer]})
+        return self.model.start_chat(history=turns).send_message(content, stream=stream)
+
+    def generate(self, content, stats=None, cancel=None, history=()):
+        response = self._send(content, history)
+        result = response.text.strip() if response and response.text else ""
+        if stats is not None:
+            stats.mark_chunk(result)
+            apply_gemini_usage(stats, response)
+            stats.finish()
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        return result
+
+    def stream_generate(self, content, stats=None, cancel=None, history=()):
+        """Yield text as Gemini streams it, skipping chunks without text parts"""
+        if cancel is not None:
+            cancel.raise_if_cancelled()
+        response = self._send(content, history, stream=True)
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks that only carry safety/finish metadata have no text
+                continue
+            if text:
+                yield text
+        if stats is not None:
+            apply_gemini_usage(stats, response)
+
+
+def apply_gemini_usage(stats, response):
+    """Copy token counts from Gemini's usage metadata onto a StreamStats"""
+    usage = getattr(response, "usage_metadata", None)
+    if usage is None:
+        return
+    if getattr(usage, "candidates_token_count", None):
+        stats.output_tokens = usage.candidates_token_count
+    if getattr(usage, "prompt_token_count", None):
+        stats.prompt_tokens = usage.prompt_token_count
+    if getattr(usage, "cached_content_token_count", None):
+        stats.cached_tokens = usage.cached_content_token_count
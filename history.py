@@ -0,0 +1,383 @@
+"""
+Clipboard history - every prompt and response with its backend, model and
+timings, kept in SQLite with a full-text (FTS5) index so an earlier answer can
+be found and pasted again instead of generated anew.
+
+Off unless HISTORY_ENABLED = True: the history stores every clipboard you send
+(passwords, keys, private messages included) unencrypted in HISTORY_PATH.
+
+Requests only put entries on a queue; a background thread writes them in
+batches, so recording never adds latency to the hotkey path.
+
+    python history.py search <words> [--limit 20]   # newest matches first
+    python history.py show <id|last> [--prompt]      # print a response (and its prompt)
+    python history.py paste <id|last>                # copy a response back to the clipboard
+    python history.py stats
+
+Ctrl+Shift+Y does the same from the keyboard: the clipboard is looked up in the
+history (the same prompt first, then the best full-text match) and replaced
+with that response.
+"""
+
+import hashlib
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from text_slices import update_hash
+
+_WORDS = re.compile(r"\w+", re.UNICODE)
+
+# A clipboard is looked up by its uncommon words: words found in more than this
+# share of entries match (and would have to be ranked) almost everywhere
+_COMMON_SHARE = 0.01
+_COMMON_REFRESH = 600  # seconds
+
+_COLUMNS = ("id", "ts", "backend", "model", "trigger", "status", "cache", "prompt", "response",
+            "total_ms", "first_token_ms")
+
+
+def prompt_hash(text):
+    return update_hash(hashlib.sha256(), text).hexdigest()
+
+
+def words(text):
+    return list(dict.fromkeys(word.lower() for word in _WORDS.findall(text)))
+
+
+def fts_query(terms, any_term=False):
+    """Quote words for an FTS5 MATCH (all of them, or any with any_term)"""
+    if not terms:
+        return None
+    quoted = ['"' + term.replace('"', '""') + '"' for term in terms]
+    if not any_term:
+        quoted[-1] += "*"  # the last word may still be being typed
+    return (" OR " if any_term else " ").join(quoted)
+
+
+class HistoryEntry:
+    def __init__(self, row, snippet=None):
+        for name, value in zip(_COLUMNS, row):
+            setattr(self, name, value)
+        self.snippet = snippet
+
+    def describe(self):
+        age = time.time() - self.ts
+        if age < 3600:
+            when = f"{age / 60:.0f} min ago"
+        elif age < 86400:
+            when = f"{age / 3600:.0f} h ago"
+        else:
+            when = time.strftime("%Y-%m-%d", time.localtime(self.ts))
+        return f"#{self.id} {when}, {self.backend} {self.model}"
+
+
+class HistoryStore:
+    """SQLite history with batched background inserts and an FTS5 index.
+
+    record() never blocks on the database; searches use their own connection,
+    which WAL mode lets read while the writer commits. Prompts are stored (and
+    searchable) up to max_prompt_chars; recalling the same prompt still compares
+    the whole text through its hash.
+    """
+
+    def __init__(self, path, max_entries=200000, batch_size=64, flush_interval=0.25, max_prompt_chars=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_prompt_chars = max_prompt_chars
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=10000)
+        self._writer = None
+        self._common = None
+        self._common_at = 0.0
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = self._connect()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " id INTEGER PRIMARY KEY,"
+            " ts REAL NOT NULL,"
+            " backend TEXT,"
+            " model TEXT,"
+            " trigger TEXT,"
+            " status TEXT,"
+            " cache TEXT,"
+            " prompt_hash TEXT NOT NULL,"
+            " prompt TEXT NOT NULL,"
+            " response TEXT NOT NULL,"
+            " total_ms REAL,"
+            " first_token_ms REAL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS history_prompt ON history (prompt_hash)")
+        try:
+            # External-content index: the text is stored once, in the history table
+            self._db.execute(
+                "CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5("
+                " prompt, response, content='history', content_rowid='id')"
+            )
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS history_ai AFTER INSERT ON history BEGIN"
+                " INSERT INTO history_fts (rowid, prompt, response) VALUES (new.id, new.prompt, new.response);"
+                " END"
+            )
+            self._db.execute("CREATE VIRTUAL TABLE IF NOT EXISTS history_vocab USING fts5vocab(history_fts, 'row')")
+            self._db.execute(
+                "CREATE TRIGGER IF NOT EXISTS history_ad AFTER DELETE ON history BEGIN"
+                " INSERT INTO history_fts (history_fts, rowid, prompt, response)"
+                " VALUES ('delete', old.id, old.prompt, old.response);"
+                " END"
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: searches fall back to LIKE scans
+            self.fts = False
+        self._db.commit()
+
+    def _connect(self):
+        db = sqlite3.connect(self.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    # --- Writing ------------------------------------------------------------------
+
+    def record(self, prompt, response, backend="", model="", trigger="", status="ok", cache="",
+               total_ms=None, first_token_ms=None):
+        """Queue one exchange for the background writer; never blocks"""
+        if self._writer is None:
+            with self._lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+                    self._writer.start()
+        row = (time.time(), backend, model, trigger, status, cache, prompt_hash(prompt),
+               self._indexed(prompt), response, total_ms, first_token_ms)
+        try:
+            self._queue.put_nowait(row)
+        except queue.Full:
+            self.dropped += 1
+
+    def _indexed(self, text):
+        """The part of a prompt that is stored and searched"""
+        if self.max_prompt_chars and len(text) > self.max_prompt_chars:
+            return text[:self.max_prompt_chars]
+        return text
+
+    def flush(self, timeout=None):
+        """Wait until everything queued so far is committed"""
+        if self._writer is None:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() > deadline:
+                return False
+            time.sleep(0.005)
+        return True
+
+    def _write_loop(self):
+        db = self._connect()
+        batches = 0
+        while True:
+            rows = [self._queue.get()]
+            # Give a burst a moment to arrive, then write it as one transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(rows) < self.batch_size:
+                try:
+                    rows.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                with db:
+                    db.executemany(
+                        "INSERT INTO history (ts, backend, model, trigger, status, cache, prompt_hash, prompt,"
+                        " response, total_ms, first_token_ms) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows,
+                    )
+                batches += 1
+                # The limit is checked every 50 batches, so it can be overshot a little
+                if self.max_entries and batches % 50 == 1:
+                    self._prune(db)
+            except sqlite3.Error as e:
+                self.dropped += len(rows)
+                print(f"⚠️  Could not write clipboard history: {e}")
+            finally:
+                for _ in rows:
+                    self._queue.task_done()
+
+    def _prune(self, db):
+        """Drop the oldest entries beyond max_entries"""
+        with db:
+            db.execute(
+                "DELETE FROM history WHERE id <= (SELECT id FROM history ORDER BY id DESC LIMIT 1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    # --- Reading ------------------------------------------------------------------
+
+    def _select(self, where, params=(), order="h.id DESC", limit=1, fts=False):
+        columns = ", ".join(f"h.{name}" for name in _COLUMNS)
+        snippet = ", snippet(history_fts, -1, '[', ']', '…', 12)" if fts else ""
+        source = "history_fts JOIN history h ON h.id = history_fts.rowid" if fts else "history h"
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {columns}{snippet} FROM {source} WHERE {where} ORDER BY {order} LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [HistoryEntry(row[:len(_COLUMNS)], row[len(_COLUMNS)] if fts else None) for row in rows]
+
+    def get(self, entry_id):
+        """The entry with this id, or the latest one for "last"""
+        if entry_id == "last":
+            found = self._select("1")
+        else:
+            found = self._select("h.id = ?", (int(entry_id),))
+        return found[0] if found else None
+
+    def search(self, text, limit=20):
+        """The most recent entries containing all words of text"""
+        if self.fts:
+            match = fts_query(words(text))
+            if match is None:
+                return []
+            # Walking the index newest-first stops after `limit` hits; ranking would score every match
+            return self._select("history_fts MATCH ?", (match,), "history_fts.rowid DESC", limit, fts=True)
+        terms = words(text)
+        if not terms:
+            return []
+        where = " AND ".join("(h.prompt LIKE ? OR h.response LIKE ?)" for _ in terms)
+        return self._select(where, tuple(p for term in terms for p in (f"%{term}%",) * 2), limit=limit)
+
+    def lookup(self, text):
+        """The response to recall for text: the same prompt's latest answer, else the closest match"""
+        found = self._select("h.prompt_hash = ?", (prompt_hash(text),))
+        if found or not self.fts:
+            return found[0] if found else None
+        terms = words(self._indexed(text))
+        common = self._common_terms()
+        rare = [term for term in terms if term not in common]
+        if rare:
+            # A clipboard is most often a new version of an earlier prompt, so prompt matches weigh more
+            found = self._select("history_fts MATCH ?", (fts_query(rare, any_term=True),),
+                                 "bm25(history_fts, 5.0, 1.0)", 1, fts=True)
+        elif terms:
+            found = self._select("history_fts MATCH ?", (fts_query(terms),), "history_fts.rowid DESC", 1, fts=True)
+        else:
+            found = []
+        return found[0] if found else None
+
+    def _common_terms(self):
+        """Words found in more than _COMMON_SHARE of entries (one vocabulary scan every few minutes)"""
+        now = time.monotonic()
+        if self._common is None or now - self._common_at > _COMMON_REFRESH:
+            with self._lock:
+                total = self._db.execute("SELECT COUNT(*) FROM history").fetchone()[0]
+                rows = self._db.execute("SELECT term FROM history_vocab WHERE doc > ?",
+                                        (max(20, int(total * _COMMON_SHARE)),)).fetchall()
+            self._common = {term for (term,) in rows}
+            self._common_at = now
+        return self._common
+
+    def stats(self):
+        with self._lock:
+            count, first, last, size = self._db.execute(
+                "SELECT COUNT(*), MIN(ts), MAX(ts), COALESCE(SUM(LENGTH(prompt) + LENGTH(response)), 0)"
+                " FROM history"
+            ).fetchone()
+        return {"entries": count, "first": first, "last": last, "chars": size, "fts": self.fts,
+                "pending": self._queue.unfinished_tasks, "dropped": self.dropped}
+
+    def clear(self):
+        self.flush()
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM history").rowcount
+            if self.fts:
+                self._db.execute("INSERT INTO history_fts (history_fts) VALUES ('rebuild')")
+            self._db.commit()
+        self._common = None
+        return deleted
+
+    def close(self):
+        self.flush(timeout=5)
+        with self._lock:
+            self._db.close()
+
+
+def _open_default():
+    try:
+        import config
+        path = config.HISTORY_PATH
+        max_entries = getattr(config, "HISTORY_MAX_ENTRIES", 200000)
+    except (ImportError, AttributeError):
+        path, max_entries = ".cache/history.sqlite3", 200000
+    return HistoryStore(path, max_entries)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Usage: python history.py search <words> [--limit N]\n"
+             "       python history.py show <id|last> [--prompt]\n"
+             "       python history.py paste <id|last>\n"
+             "       python history.py stats")
+    if not argv or argv[0] not in ("search", "show", "paste", "stats"):
+        print(usage)
+        return 2
+    command, args = argv[0], argv[1:]
+    store = _open_default()
+
+    if command == "stats":
+        stats = store.stats()
+        print(f"{stats['entries']} entries, {stats['chars'] / 1e6:.1f}M characters"
+              f"{'' if stats['fts'] else ' (no FTS5 - searches scan the table)'}")
+        if stats["entries"]:
+            print(f"from {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats['first']))} "
+                  f"to {time.strftime('%Y-%m-%d %H:%M', time.localtime(stats['last']))}")
+        return 0
+
+    if command == "search":
+        limit = 20
+        if "--limit" in args:
+            index = args.index("--limit")
+            try:
+                limit = int(args[index + 1])
+            except (IndexError, ValueError):
+                print(f"--limit needs a number\n{usage}")
+                return 2
+            args = args[:index] + args[index + 2:]
+        started = time.perf_counter()
+        results = store.search(" ".join(args), limit)
+        elapsed = time.perf_counter() - started
+        for entry in results:
+            text = (entry.snippet or entry.response).replace("\n", " ")
+            print(f"{entry.describe()}\n    {text[:160]}")
+        print(f"{len(results)} result(s) in {elapsed * 1000:.1f} ms")
+        return 0
+
+    if not args:
+        print(usage)
+        return 2
+    if args[0] != "last" and not args[0].isdigit():
+        print(f"Not an entry id: {args[0]!r} (use a number from `search`, or last)\n{usage}")
+        return 2
+    entry = store.get(args[0])
+    if entry is None:
+        print(f"No history entry {args[0]}")
+        return 1
+    if command == "show":
+        if "--prompt" in args:
+            print(f"--- prompt ({entry.describe()}) ---\n{entry.prompt}\n--- response ---")
+        print(entry.response)
+        return 0
+    from clipboard_io import ClipboardIO, create_clipboard
+    ClipboardIO(create_clipboard("system")).write(entry.response)
+    print(f"📋 Copied {entry.describe()} to the clipboard ({len(entry.response)} characters)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,206 @@
+"""
+Hotkey registry and the per-keystroke dispatch path.
+
+The keyboard listener sees every key typed anywhere on the system, so its
+callbacks have to cost next to nothing for keys that are not hotkeys. Bindings
+("ctrl+shift+g" -> "ollama") are compiled once into a dict keyed on
+(virtual key code or character, modifier bitmask); a keystroke is then one
+dict lookup for a modifier key, one set lookup while typing normally and at
+most two dict lookups while a modifier is held. Nothing is printed on the
+listener thread: messages and the hotkey actions themselves go through a
+HotkeyWorker and run in order on its own thread, so a slow action (a daemon
+round trip, a clipboard read) never holds up the next keystroke.
+
+This module does not import pynput; the listener passes in its modifier keys.
+"""
+
+import queue
+import threading
+import time
+
+CTRL, SHIFT, ALT = 1, 2, 4
+
+_MODIFIERS = {"ctrl": CTRL, "control": CTRL, "shift": SHIFT, "alt": ALT}
+
+# combo -> action name; HOTKEYS in config.py adds to / overrides these (None removes one)
+DEFAULT_HOTKEYS = {
+    "ctrl+shift+g": "ollama",
+    "ctrl+shift+alt+g": "ollama_fresh",
+    "ctrl+shift+h": "gemini",
+    "ctrl+shift+alt+h": "gemini_fresh",
+    "ctrl+shift+r": "race",
+    "ctrl+shift+alt+r": "race_fresh",
+    "ctrl+shift+alt+c": "clear_cache",
+    "ctrl+shift+y": "recall",
+    "ctrl+shift+x": "cancel",
+    "ctrl+shift+q": "exit",
+}
+
+
+def parse_combo(combo):
+    """"ctrl+shift+g" -> (CTRL | SHIFT, "g"); the key is a single character"""
+    *names, char = [part.strip().lower() for part in combo.split("+")]
+    mask = 0
+    for name in names:
+        if name not in _MODIFIERS:
+            raise ValueError(f"unknown modifier {name!r} in hotkey {combo!r} (use ctrl, shift, alt)")
+        mask |= _MODIFIERS[name]
+    if len(char) != 1:
+        raise ValueError(f"hotkey {combo!r} must end in a single character")
+    return mask, char
+
+
+def format_modifiers(mask):
+    return "+".join(name for bit, name in ((CTRL, "Ctrl"), (SHIFT, "Shift"), (ALT, "Alt")) if mask & bit)
+
+
+def format_combo(mask, char):
+    return f"{format_modifiers(mask)}+{char.upper()}" if mask else char.upper()
+
+
+def key_tokens(char):
+    """What a key event may report for char: the character itself (either case, or the
+    control character Ctrl turns a letter into) and the Windows virtual key code, which
+    stays the same across keyboard layouts"""
+    tokens = {char.lower(), char.upper()}
+    upper = char.upper()
+    if "A" <= upper <= "Z":
+        tokens.add(chr(ord(upper) - 64))
+    if "A" <= upper <= "Z" or "0" <= upper <= "9":
+        tokens.add(ord(upper))
+    return tokens
+
+
+class Binding:
+    """A compiled hotkey: the combo as shown to the user and what it runs"""
+
+    def __init__(self, combo, action, label, handler):
+        self.combo = combo
+        self.action = action
+        self.label = label
+        self.handler = handler
+
+
+def compile_bindings(hotkeys, actions):
+    """Build the lookup table {(vk or char, modifier mask): Binding}.
+
+    hotkeys maps combos to action names (None drops a combo); actions maps action
+    names to (label, handler). A label of None means the handler reports itself.
+    """
+    table = {}
+    for combo, action in hotkeys.items():
+        if action is None:
+            continue
+        if action not in actions:
+            raise ValueError(f"unknown action {action!r} for hotkey {combo!r} "
+                             f"(choose from {', '.join(sorted(actions))})")
+        mask, char = parse_combo(combo)
+        label, handler = actions[action]
+        binding = Binding(format_combo(mask, char), action, label, handler)
+        for token in key_tokens(char):
+            table[(token, mask)] = binding
+    return table
+
+
+def merge_hotkeys(overrides):
+    """DEFAULT_HOTKEYS with the user's combos added or replaced (combos compare by keys, not spelling)"""
+    merged = {}
+    for combo, action in list(DEFAULT_HOTKEYS.items()) + list((overrides or {}).items()):
+        merged[parse_combo(combo)] = (combo, action)
+    return dict(merged.values())
+
+
+class HotkeyWorker:
+    """Runs hotkey actions and prints messages in order on a background thread; call() and log() only enqueue.
+
+    Messages are formatted on that thread too, so the caller pays for one queue put.
+    """
+
+    def __init__(self, name="hotkey-worker"):
+        self._queue = queue.SimpleQueue()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def log(self, message, *args):
+        self._queue.put((_print, (message, args)))
+
+    def call(self, func, *args):
+        self._queue.put((func, args))
+
+    def close(self, timeout=1.0):
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            func, args = item
+            try:
+                func(*args)
+            except Exception as e:
+                print(f"❌ Error in hotkey handler: {e}")
+
+
+def _print(message, args):
+    print(message.format(*args) if args else message)
+
+
+class HotkeyDispatcher:
+    """Tracks held modifiers and turns key events into hotkey actions.
+
+    modifier_keys maps the listener's modifier key objects to CTRL/SHIFT/ALT; they are
+    looked up by identity (pynput's Key members are singletons, and hashing a KeyCode
+    builds its repr). A hotkey fires once per press: holding it, or pressing it again
+    within `debounce` seconds, does nothing until a key is released. `log` is the
+    HotkeyWorker that prints messages and runs the handlers.
+    """
+
+    def __init__(self, table, modifier_keys, log, debounce=0.2, verbose=False):
+        self.table = table
+        self.log = log
+        self.debounce = debounce
+        self.verbose = verbose
+        self.mods = 0
+        self._modifiers = {id(key): bit for key, bit in modifier_keys.items()}
+        self._masks = frozenset(mask for _, mask in table)
+        self._triggered = False
+        self._last_trigger = float("-inf")
+
+    def on_press(self, key, *_):
+        """Returns the Binding that fired, if any (newer pynput versions also pass `injected`)"""
+        bit = self._modifiers.get(id(key))
+        if bit is not None:
+            if self.verbose and not self.mods & bit:
+                self.log.log("🔍 [DEBUG] Keys currently held: {}", format_modifiers(self.mods | bit))
+            self.mods |= bit
+            return None
+        mods = self.mods
+        if mods not in self._masks:
+            return None
+        binding = self.table.get((getattr(key, "vk", None), mods)) or self.table.get((getattr(key, "char", None), mods))
+        if binding is None or self._triggered:
+            return None
+        now = time.perf_counter()
+        if now - self._last_trigger < self.debounce:
+            return None
+        self._triggered = True
+        self._last_trigger = now
+        if binding.label:
+            self.log.log("\n🎯 HOTKEY DETECTED: {} pressed! ({})", binding.combo, binding.label)
+        self.log.call(binding.handler, now)
+        return binding
+
+    def on_release(self, key, *_):
+        bit = self._modifiers.get(id(key))
+        if bit is not None:
+            self.mods &= ~bit
+        self._triggered = False
+
+    def describe(self):
+        """(combo, label) per binding, in registry order"""
+        seen = {}
+        for binding in self.table.values():
+            seen.setdefault(binding.combo, binding.label or binding.action)
+        return list(seen.items())
@@ -0,0 +1,169 @@
+"""
+Background job engine - runs clipboard requests on worker threads so the
+keyboard listener never blocks on a model round-trip.
+
+Each backend ("ollama", "gemini", ...) gets its own bounded queue and worker
+threads. The policy decides what a new hotkey press does while a request
+for the same backend is still running:
+
+  "queue"     - wait behind it; one request per backend at a time, in press order
+  "supersede" - cancel the running/queued requests and start the new one
+  "parallel"  - run alongside it, up to the backend's worker count
+"""
+
+import itertools
+import queue
+import threading
+import time
+
+from cancellation import CancelToken
+
+POLICIES = ("queue", "supersede", "parallel")
+
+_job_ids = itertools.count(1)
+
+
+class Job:
+    """One queued request; func is called as func(*args, cancel=token, **kwargs)"""
+
+    def __init__(self, backend, func, args, kwargs):
+        self.id = next(_job_ids)
+        self.backend = backend
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.cancel = CancelToken()
+        self.submitted = time.perf_counter()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def queue_wait(self):
+        if self.started is None:
+            return None
+        return self.started - self.submitted
+
+    def run(self):
+        self.started = time.perf_counter()
+        try:
+            self.result = self.func(*self.args, cancel=self.cancel, **self.kwargs)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.finished = time.perf_counter()
+            self.done.set()
+
+
+class JobEngine:
+    """Per-backend bounded queues served by daemon worker threads"""
+
+    def __init__(self, workers, max_queue=4, policy="queue", on_error=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown JOB_POLICY '{policy}' (expected one of {', '.join(POLICIES)})")
+        self.policy = policy
+        self.on_error = on_error
+        self._lock = threading.Lock()
+        self._queues = {}
+        self._running = {}
+        self._cancelled = {}  # backend -> (perf_counter of the last cancel, reason)
+        self._threads = []
+        for backend, count in workers.items():
+            # Only the parallel policy runs more than one job per backend at once
+            count = max(1, count) if policy == "parallel" else 1
+            self._queues[backend] = queue.Queue(maxsize=max_queue)
+            self._running[backend] = set()
+            for n in range(count):
+                thread = threading.Thread(
+                    target=self._worker, args=(backend,), name=f"{backend}-worker-{n + 1}", daemon=True
+                )
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, backend, func, *args, **kwargs):
+        """Queue a job; returns the Job, or None if the backend's queue is full"""
+        if backend not in self._queues:
+            raise ValueError(f"No workers configured for backend '{backend}'")
+        if self.policy == "supersede":
+            self.cancel(backend, reason="superseded")
+        job = Job(backend, func, args, kwargs)  # created after the cancel, so it isn't caught by it
+        try:
+            self._queues[backend].put_nowait(job)
+        except queue.Full:
+            return None
+        return job
+
+    def cancel(self, backend=None, reason="cancelled"):
+        """Cancel running and queued jobs (for one backend or all); returns how many"""
+        backends = [backend] if backend else list(self._queues)
+        cancelled = 0
+        for name in backends:
+            q = self._queues[name]
+            # Drain queued jobs so they never start
+            while True:
+                try:
+                    job = q.get_nowait()
+                except queue.Empty:
+                    break
+                job.cancel.cancel(reason)
+                job.done.set()
+                q.task_done()
+                cancelled += 1
+            with self._lock:
+                # A worker may hold a job it took from the queue but has not marked as
+                # running yet; it checks this when it does
+                self._cancelled[name] = (time.perf_counter(), reason)
+                running = list(self._running[name])
+            for job in running:
+                if not job.cancel.is_set():
+                    job.cancel.cancel(reason)
+                    cancelled += 1
+        return cancelled
+
+    def pending(self, backend=None):
+        """Number of queued plus running jobs"""
+        backends = [backend] if backend else list(self._queues)
+        with self._lock:
+            running = sum(len(self._running[name]) for name in backends)
+        return running + sum(self._queues[name].qsize() for name in backends)
+
+    def busy(self):
+        return self.pending() > 0
+
+    def _worker(self, backend):
+        q = self._queues[backend]
+        while True:
+            job = q.get()
+            try:
+                if job is None:
+                    return
+                with self._lock:
+                    self._running[backend].add(job)
+                    cancelled_at, reason = self._cancelled.get(backend, (None, None))
+                if cancelled_at is not None and job.submitted <= cancelled_at:
+                    job.cancel.cancel(reason)
+                if job.cancel.is_set():
+                    with self._lock:
+                        self._running[backend].discard(job)
+                    job.done.set()
+                    continue
+                try:
+                    job.run()
+                finally:
+                    with self._lock:
+                        self._running[backend].discard(job)
+                if job.error is not None and self.on_error is not None:
+                    self.on_error(job, job.error)
+            finally:
+                q.task_done()
+
+    def shutdown(self, cancel=True):
+        """Stop the workers (cancelling outstanding jobs unless cancel=False)"""
+        if cancel:
+            self.cancel(reason="shutting down")
+        for backend, q in self._queues.items():
+            for thread in self._threads:
+                if thread.name.startswith(f"{backend}-"):
+                    q.put(None)
@@ -0,0 +1,255 @@
+"""
+Model tiers - pick the model for a request from the size and type of the
+clipboard, so a three-word rewrite goes to the smallest, fastest model and a
+long document to one that can hold it.
+
+Tiers are checked in order; the first one whose token limit and content types
+fit is used, and inputs that fit none go to the configured MODEL/GEMINI_MODEL.
+
+Tune the thresholds offline on a folder of sample clipboards (or a JSONL file
+with a "text" field per line):
+
+    python model_tiers.py explain samples/            # which tier each sample gets
+    python model_tiers.py compare samples/ [--backend ollama|gemini] [--models a,b] [--repeat N]
+"""
+
+import json
+import os
+import re
+import sys
+import time
+
+from chunking import estimate_tokens
+from tracing import percentile
+
+CONTENT_TYPES = ("code", "data", "prose")
+
+# Lines that look like source code: keywords at the start, or ending in a brace/semicolon
+_CODE_LINE = re.compile(
+    r"^\s*(?:def |class |import |from \S+ import |function |const |let |var |return\b|if \(|for \(|"
+    r"#include|public |private |package |fn |func |SELECT |INSERT |UPDATE |<\?php|<!DOCTYPE|<html|@\w+)"
+    r"|[{};]\s*$",
+    re.I,
+)
+
+# Only the start of a big clipboard is inspected
+_SAMPLE_LINES = 200
+_SAMPLE_CHARS = 64 * 1024
+
+
+def detect_content_type(text):
+    """Classify text as "code", "data" (JSON/CSV/TSV) or "prose" with cheap heuristics"""
+    if not text or text.isspace():
+        return "prose"
+    # Work on copies of the ends only, so a huge clipboard is never copied whole
+    head = text[:_SAMPLE_CHARS].lstrip()
+    tail = text[-_SAMPLE_CHARS:].rstrip()
+    if head[:1] in ("{", "[") and tail[-1:] in ("}", "]"):
+        if len(text) <= _SAMPLE_CHARS:
+            try:
+                json.loads(text)
+                return "data"
+            except ValueError:
+                pass
+        else:
+            return "data"  # too big to parse just to pick a model
+    if "```" in text:
+        return "code"
+    lines = head.splitlines()
+    if len(text) > _SAMPLE_CHARS and len(lines) > 1:
+        lines.pop()  # cut off mid-line
+    lines = [line for line in lines[:_SAMPLE_LINES] if line.strip()]
+    if len(lines) >= 3:
+        for sep in (",", "\t", ";"):
+            counts = {line.count(sep) for line in lines}
+            if len(counts) == 1 and counts.pop() >= 2:
+                return "data"
+    code_lines = sum(1 for line in lines if _CODE_LINE.search(line))
+    if lines and code_lines / len(lines) >= 0.3:
+        return "code"
+    return "prose"
+
+
+class Tier:
+    """One size/type bracket and the model that serves it"""
+
+    def __init__(self, model, max_tokens=None, types=None, name=None):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.types = tuple(types) if types else None
+        self.name = name or model
+        unknown = set(self.types or ()) - set(CONTENT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown content type(s) in tier '{self.name}': {', '.join(sorted(unknown))}")
+
+    @classmethod
+    def from_config(cls, entry):
+        """Build a tier from a config dict: {"model": ..., "max_tokens": ..., "types": [...], "name": ...}"""
+        if isinstance(entry, Tier):
+            return entry
+        if "model" not in entry:
+            raise ValueError(f"Model tier {entry!r} has no 'model'")
+        return cls(entry["model"], entry.get("max_tokens"), entry.get("types"), entry.get("name"))
+
+    def fits(self, tokens, content_type):
+        if self.max_tokens is not None and tokens > self.max_tokens:
+            return False
+        return self.types is None or content_type in self.types
+
+    def describe(self):
+        limits = [f"≤{self.max_tokens} tokens" if self.max_tokens is not None else "any size"]
+        if self.types:
+            limits.append("/".join(self.types))
+        return f"{self.name}: {self.model} ({', '.join(limits)})"
+
+
+def load_tiers(entries):
+    return [Tier.from_config(entry) for entry in entries or ()]
+
+
+def select_tier(text, tiers):
+    """Return (tier or None, estimated tokens, content type) for text"""
+    tokens = estimate_tokens(text)
+    content_type = detect_content_type(text)
+    for tier in tiers:
+        if tier.fits(tokens, content_type):
+            return tier, tokens, content_type
+    return None, tokens, content_type
+
+
+# --- Offline comparison -------------------------------------------------------
+
+def read_corpus(path):
+    """Yield (name, text) from a folder of text files or a JSONL file with a "text" field"""
+    if os.path.isdir(path):
+        for name in sorted(os.listdir(path)):
+            full = os.path.join(path, name)
+            if os.path.isfile(full):
+                with open(full, encoding="utf-8", errors="replace") as f:
+                    yield name, f.read()
+        return
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                yield str(record.get("id", number)), record["text"]
+
+
+def _load_settings(backend_kind):
+    try:
+        import config
+    except ImportError:
+        config = None
+
+    def setting(name, default):
+        return getattr(config, name, default)
+
+    if backend_kind == "gemini":
+        return load_tiers(setting("GEMINI_TIERS", [])), setting("GEMINI_MODEL", "gemini-2.5-pro"), setting
+    return load_tiers(setting("OLLAMA_TIERS", [])), setting("MODEL", "llama3.2"), setting
+
+
+def _make_generate(backend_kind, model, setting):
+    from prompts import normalize_system_prompt
+    system_prompt = normalize_system_prompt(setting("SYSTEM_PROMPT", ""))
+    if backend_kind == "gemini":
+        from gemini_backend import GeminiBackend
+        backend = GeminiBackend(setting("GEMINI_API_KEY", ""), model,
+                                normalize_system_prompt(setting("GEMINI_SYSTEM_PROMPT", "")) or system_prompt)
+        return backend.generate
+    from ollama_backend import create_ollama_backend
+    backend = create_ollama_backend(
+        setting("OLLAMA_BACKEND", "http"), model, host=setting("OLLAMA_HOST", "http://localhost:11434"),
+        keep_alive=setting("OLLAMA_KEEP_ALIVE", "30m"), timeout=setting("TIMEOUT", 300),
+    )
+    return lambda text: backend.generate(text, system_prompt)
+
+
+def explain(corpus, tiers, default_model):
+    print(f"{'sample':<32}{'tokens':>8}  {'type':<7}tier")
+    for name, text in read_corpus(corpus):
+        tier, tokens, content_type = select_tier(text, tiers)
+        chosen = tier.describe() if tier else f"default: {default_model}"
+        print(f"{name[:31]:<32}{tokens:>8}  {content_type:<7}{chosen}")
+
+
+def compare(corpus, backend_kind, models, tiers, default_model, setting, repeat=1):
+    """Run every sample through every model; print latency per selected tier and model"""
+    samples = list(read_corpus(corpus))
+    results = {}  # (tier name, model) -> list of seconds
+    failures = {}
+    for model in models:
+        generate = _make_generate(backend_kind, model, setting)
+        print(f"Running {len(samples)} samples x {repeat} on {model}...")
+        try:
+            generate("Hello")  # load the model so the first sample isn't charged for it
+        except Exception as e:
+            print(f"  could not load {model}: {e}")
+        for name, text in samples:
+            tier, _, _ = select_tier(text, tiers)
+            key = (tier.name if tier else "default", model)
+            for _ in range(repeat):
+                started = time.perf_counter()
+                try:
+                    if not generate(text):
+                        raise RuntimeError("empty response")
+                except Exception as e:
+                    failures[key] = failures.get(key, 0) + 1
+                    print(f"  {name}: {e}")
+                    continue
+                results.setdefault(key, []).append(time.perf_counter() - started)
+
+    print(f"\n{'selected tier':<16}{'model':<28}{'n':>4}{'p50 s':>9}{'p95 s':>9}{'failed':>8}")
+    for tier_name in [t.name for t in tiers] + ["default"]:
+        for model in models:
+            key = (tier_name, model)
+            seconds = results.get(key, [])
+            if not seconds and key not in failures:
+                continue
+            p50 = f"{percentile(seconds, 50):.2f}" if seconds else "-"
+            p95 = f"{percentile(seconds, 95):.2f}" if seconds else "-"
+            print(f"{tier_name[:15]:<16}{model[:27]:<28}{len(seconds):>4}{p50:>9}{p95:>9}{failures.get(key, 0):>8}")
+    print(f"\nInputs matching no tier use {default_model}. A tier is worth it when its model is much "
+          f"faster than the others on its rows without failing more often.")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    usage = ("Usage: python model_tiers.py explain <corpus>\n"
+             "       python model_tiers.py compare <corpus> [--backend ollama|gemini] [--models a,b] [--repeat N]")
+    if len(argv) < 2 or argv[0] not in ("explain", "compare"):
+        print(usage)
+        return 2
+    command, corpus, options = argv[0], argv[1], argv[2:]
+    backend_kind = "ollama"
+    models = None
+    repeat = 1
+    while options:
+        option = options.pop(0)
+        if option == "--backend" and options:
+            backend_kind = options.pop(0)
+        elif option == "--models" and options:
+            models = [m.strip() for m in options.pop(0).split(",") if m.strip()]
+        elif option == "--repeat" and options:
+            repeat = max(1, int(options.pop(0)))
+        else:
+            print(usage)
+            return 2
+
+    tiers, default_model, setting = _load_settings(backend_kind)
+    if tiers:
+        print("Tiers:\n" + "\n".join(f"  {tier.describe()}" for tier in tiers) + "\n")
+    else:
+        print(f"No {backend_kind.upper()}_TIERS configured - every input uses {default_model}\n")
+    if command == "explain":
+        explain(corpus, tiers, default_model)
+    else:
+        if models is None:
+            models = list(dict.fromkeys([tier.model for tier in tiers] + [default_model]))
+        compare(corpus, backend_kind, models, tiers, default_model, setting, repeat)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,495 @@
+"""
+Ollama backends for Local AI Clipboard
+
+- OllamaHTTPBackend talks to the local Ollama server (/api/generate, /api/chat)
+  over pooled keep-alive connections and asks the server to keep the model loaded.
+- OllamaCLIBackend is the original `ollama run <model> --nowordwrap` subprocess
+  path, kept as a fallback when the server can't be reached.
+"""
+
+import http.client
+import json
+import os
+import re
+import socket
+import subprocess
+import threading
+from urllib.parse import urlsplit
+
+from cancellation import RequestCancelled
+from prompts import PromptTemplate
+from streaming import consume_stream
+from text_slices import SLICE_CHARS, JSONBody
+
+# Pattern matches ANSI escape codes (like ←[?25l, ←[1G, etc.) printed by `ollama run`
+ANSI_ESCAPE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+
+DEFAULT_HOST = "http://localhost:11434"
+
+
+class OllamaError(Exception):
+    """Ollama failed to produce a response"""
+
+
+class OllamaUnavailable(OllamaError):
+    """The Ollama server or binary could not be reached"""
+
+
+class OllamaTimeout(OllamaError):
+    """Ollama did not answer within the configured timeout"""
+
+
+def encode_body(payload):
+    """Request body: bytes, or a JSONBody sent a slice at a time when it carries a huge prompt"""
+    if payload is None:
+        return None
+    chars = len(payload.get("prompt") or "") + sum(len(m.get("content") or "") for m in payload.get("messages") or ())
+    if chars > SLICE_CHARS:
+        return JSONBody(payload)
+    return json.dumps(payload).encode("utf-8")
+
+
+def apply_ollama_stats(stats, data):
+    """Copy the counters from Ollama's final ("done") message onto a StreamStats"""
+    if data.get("eval_count") is not None:
+        stats.output_tokens = data["eval_count"]
+    if data.get("prompt_eval_count") is not None:
+        stats.prompt_tokens = data["prompt_eval_count"]
+    # Durations are reported in nanoseconds
+    if data.get("prompt_eval_duration") is not None:
+        stats.prompt_eval_seconds = data["prompt_eval_duration"] / 1e9
+    if data.get("load_duration") is not None:
+        stats.load_seconds = data["load_duration"] / 1e9
+
+
+class ConnectionPool:
+    """A small thread-safe pool of keep-alive HTTP connections to one host"""
+
+    def __init__(self, host, port, timeout, maxsize=4):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.maxsize = maxsize
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Return (connection, reused) - an idle connection if one exists, else a new one"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout), False
+
+    def release(self, conn):
+        """Hand a healthy connection back for reuse"""
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def discard(self, conn):
+        """Drop a connection that is broken or mid-response"""
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self.discard(conn)
+
+
+class OllamaHTTPBackend:
+    """Ollama over its local HTTP API, reusing connections between requests"""
+
+    name = "http"
+
+    def __init__(self, model, host=DEFAULT_HOST, keep_alive="30m", timeout=300, pool_size=4):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        parts = urlsplit(host if "://" in host else f"http://{host}")
+        self.host = parts.hostname or "localhost"
+        self.port = parts.port or 11434
+        self.pool = ConnectionPool(self.host, self.port, timeout, maxsize=pool_size)
+
+    def describe(self):
+        return f"HTTP http://{self.host}:{self.port} (keep_alive={self.keep_alive})"
+
+    def _watch(self, conn, cancel):
+        """Register a cancel callback that aborts blocking I/O on conn; returns it"""
+        def abort():
+            sock = conn.sock
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        cancel.add_callback(abort)
+        return abort
+
+    def _unwatch(self, cancel, abort):
+        if abort is not None:
+            cancel.remove_callback(abort)
+
+    def _cancelled_or(self, cancel, error):
+        """The error to raise - RequestCancelled if the failure was caused by a cancel"""
+        if cancel is not None and cancel.is_set():
+            return RequestCancelled(cancel.reason)
+        return error
+
+    def _open(self, method, path, payload=None, cancel=None):
+        """Send one request and return (connection, response, abort) with the body still unread"""
+        body = encode_body(payload)
+        headers = {"Content-Type": "application/json", "Connection": "keep-alive"}
+        if isinstance(body, JSONBody):
+            headers["Content-Length"] = str(body.length)  # so http.client doesn't switch to chunked encoding
+
+        # A pooled connection may have been closed by the server while idle;
+        # in that case retry once on a fresh connection.
+        for attempt in range(2):
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            conn, reused = self.pool.acquire()
+            abort = None
+            try:
+                if cancel is not None:
+                    if conn.sock is None:
+                        conn.connect()  # connect eagerly so a cancel has a socket to shut down
+                    abort = self._watch(conn, cancel)
+                conn.request(method, path, body=body, headers=headers)
+                return conn, conn.getresponse(), abort
+            except (socket.timeout, TimeoutError):
+                self._unwatch(cancel, abort)
+                self.pool.discard(conn)
+                raise self._cancelled_or(cancel, OllamaTimeout(f"Ollama timed out after {self.timeout} seconds"))
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+                self._unwatch(cancel, abort)
+                self.pool.discard(conn)
+                if reused and attempt == 0 and not (cancel is not None and cancel.is_set()):
+                    continue
+                raise self._cancelled_or(cancel, OllamaUnavailable(
+                    f"Connection to Ollama at {self.host}:{self.port} lost: {e}"))
+            except (OSError, http.client.HTTPException) as e:
+                self._unwatch(cancel, abort)
+                self.pool.discard(conn)
+                raise self._cancelled_or(cancel, OllamaUnavailable(
+                    f"Cannot reach Ollama at {self.host}:{self.port}: {e}"))
+        raise OllamaUnavailable(f"Cannot reach Ollama at {self.host}:{self.port}")
+
+    def _finish(self, conn, resp, complete=True):
+        """Return the connection to the pool if the response was fully consumed"""
+        if complete and not resp.will_close:
+            self.pool.release(conn)
+        else:
+            self.pool.discard(conn)
+
+    def _read_body(self, conn, resp, cancel=None):
+        """Read the whole response body; the connection is discarded on failure"""
+        try:
+            return resp.read()
+        except (socket.timeout, TimeoutError):
+            self.pool.discard(conn)
+            raise self._cancelled_or(cancel, OllamaTimeout(f"Ollama timed out after {self.timeout} seconds"))
+        except (OSError, http.client.HTTPException) as e:
+            self.pool.discard(conn)
+            raise self._cancelled_or(cancel, OllamaUnavailable(
+                f"Connection to Ollama at {self.host}:{self.port} lost: {e}"))
+
+    def _decode(self, resp, raw):
+        try:
+            data = json.loads(raw.decode("utf-8")) if raw else {}
+        except ValueError:
+            raise OllamaError(f"Invalid JSON from Ollama (HTTP {resp.status}): {raw[:200]!r}")
+        if resp.status != 200:
+            message = data.get("error") if isinstance(data, dict) else None
+            raise OllamaError(f"HTTP {resp.status}: {message or raw[:500]!r}")
+        return data
+
+    def _request(self, method, path, payload=None, cancel=None):
+        """Send one JSON request and return the decoded JSON body"""
+        conn, resp, abort = self._open(method, path, payload, cancel)
+        try:
+            raw = self._read_body(conn, resp, cancel)
+        finally:
+            self._unwatch(cancel, abort)
+        self._finish(conn, resp)
+        return self._decode(resp, raw)
+
+    def _stream(self, path, payload, extract, stats=None, cancel=None):
+        """Yield text pieces from an NDJSON streaming endpoint"""
+        conn, resp, abort = self._open("POST", path, payload, cancel)
+        complete = False
+        try:
+            if resp.status != 200:
+                raw = self._read_body(conn, resp, cancel)
+                complete = True
+                self._decode(resp, raw)  # raises with the server's error message
+            for line in resp:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    data = json.loads(line)
+                except ValueError:
+                    raise OllamaError(f"Invalid JSON line from Ollama: {line[:200]!r}")
+                if data.get("error"):
+                    raise OllamaError(data["error"])
+                text = extract(data)
+                if text:
+                    yield text
+                if data.get("done"):
+                    if stats is not None:
+                        apply_ollama_stats(stats, data)
+                    resp.read()  # consume the terminating chunk so the connection can be reused
+                    complete = True
+                    break
+            if not complete:
+                raise self._cancelled_or(cancel, OllamaUnavailable("Ollama closed the stream before finishing"))
+        except (socket.timeout, TimeoutError):
+            raise self._cancelled_or(cancel, OllamaTimeout(f"Ollama timed out after {self.timeout} seconds"))
+        except (OSError, http.client.HTTPException) as e:
+            raise self._cancelled_or(cancel, OllamaUnavailable(
+                f"Connection to Ollama at {self.host}:{self.port} lost: {e}"))
+        finally:
+            # Abandoning a stream early closes the socket, which also stops generation server-side
+            self._unwatch(cancel, abort)
+            self._finish(conn, resp, complete)
+
+    def generate(self, content, system_prompt="", stats=None, cancel=None):
+        """One-shot completion via /api/generate"""
+        payload = {
+            "model": self.model,
+            "prompt": content,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        data = self._request("POST", "/api/generate", payload, cancel)
+        if stats is not None:
+            apply_ollama_stats(stats, data)
+        return (data.get("response") or "").strip()
+
+    def stream_generate(self, content, system_prompt="", stats=None, cancel=None):
+        """Streaming completion via /api/generate; yields text as tokens arrive"""
+        payload = {
+            "model": self.model,
+            "prompt": content,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+        }
+        if system_prompt:
+            payload["system"] = system_prompt
+        return self._stream("/api/generate", payload, lambda d: d.get("response"), stats, cancel)
+
+    def chat(self, messages, stats=None, cancel=None):
+        """Chat completion via /api/chat; messages are {'role', 'content'} dicts"""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": False,
+            "keep_alive": self.keep_alive,
+        }
+        data = self._request("POST", "/api/chat", payload, cancel)
+        if stats is not None:
+            apply_ollama_stats(stats, data)
+        return ((data.get("message") or {}).get("content") or "").strip()
+
+    def stream_chat(self, messages, stats=None, cancel=None):
+        """Streaming chat completion via /api/chat"""
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "stream": True,
+            "keep_alive": self.keep_alive,
+        }
+        return self._stream("/api/chat", payload,
+                            lambda d: (d.get("message") or {}).get("content"), stats, cancel)
+
+    def load_model(self):
+        """Load the model into memory (an empty prompt just loads it) and refresh
+        its keep-alive; returns the load time Ollama reports, in seconds"""
+        payload = {"model": self.model, "keep_alive": self.keep_alive}
+        data = self._request("POST", "/api/generate", payload)
+        return (data.get("load_duration") or 0) / 1e9
+
+    def is_available(self):
+        """Cheap health check against /api/version"""
+        try:
+            self._request("GET", "/api/version")
+            return True
+        except OllamaError:
+            return False
+
+    def close(self):
+        self.pool.close()
+
+
+class _StderrTail:
+    """Reads a child's stderr on a daemon thread and keeps only its last `limit` characters,
+    so a chatty child (spinner escapes) never fills the pipe and blocks while we read stdout"""
+
+    def __init__(self, pipe, limit=4096):
+        self.limit = limit
+        self._text = ""
+        self._thread = threading.Thread(target=self._drain, args=(pipe,), name="ollama-stderr", daemon=True)
+        self._thread.start()
+
+    def _drain(self, pipe):
+        try:
+            for chunk in iter(lambda: pipe.read(4096), ""):
+                self._text = (self._text + chunk)[-self.limit:]
+        except (OSError, ValueError):
+            pass  # pipe closed under us after a kill
+
+    def text(self, timeout=1.0):
+        self._thread.join(timeout)
+        return ANSI_ESCAPE.sub("", self._text).strip()
+
+
+class OllamaCLIBackend:
+    """Ollama through a fresh `ollama run` subprocess per request"""
+
+    name = "cli"
+
+    def __init__(self, model, command="ollama", timeout=300):
+        self.model = model
+        self.command = command
+        self.timeout = timeout
+        self._template = PromptTemplate()
+
+    def _build_prompt(self, content, system_prompt):
+        """The stdin prompt in pieces, rebuilding the template only when the system prompt changes"""
+        template = self._template
+        if template.system_prompt != system_prompt.strip():
+            template = self._template = PromptTemplate(system_prompt)
+        return template.pieces(content)
+
+    def _write_prompt(self, process, content, system_prompt):
+        """Write the prompt to stdin a piece at a time and close it"""
+        try:
+            for piece in self._build_prompt(content, system_prompt):
+                process.stdin.write(piece)
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass  # the process died early; its exit code is reported below
+
+    def describe(self):
+        return f"CLI {self.command} run {self.model} --nowordwrap"
+
+    def _spawn(self):
+        # Set environment to disable streaming animations
+        env = os.environ.copy()
+        env['TERM'] = 'dumb'  # Disable ANSI escape codes
+
+        try:
+            return subprocess.Popen(
+                [self.command, "run", self.model, "--nowordwrap"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                encoding='utf-8',
+                errors='replace',  # Replace undecodable characters instead of crashing
+                env=env
+            )
+        except FileNotFoundError:
+            raise OllamaUnavailable(f"The command '{self.command}' is not recognized")
+
+    def generate(self, content, system_prompt="", stats=None, cancel=None):
+        # The streaming path with its timeout and cancel handling; output is cleaned line by line
+        return consume_stream(self.stream_generate(content, system_prompt, cancel=cancel), strip=True)
+
+    def stream_generate(self, content, system_prompt="", stats=None, cancel=None):
+        """Yield cleaned output line by line as `ollama run` prints it"""
+        process = self._spawn()
+        stderr = _StderrTail(process.stderr)
+        if cancel is not None:
+            cancel.add_callback(process.kill)
+        timed_out = threading.Event()
+
+        def kill_on_timeout():
+            timed_out.set()
+            process.kill()
+
+        timer = threading.Timer(self.timeout, kill_on_timeout)
+        timer.daemon = True
+        timer.start()
+        try:
+            self._write_prompt(process, content, system_prompt)
+            for line in iter(process.stdout.readline, ''):
+                text = ANSI_ESCAPE.sub('', line)
+                if text:
+                    yield text
+            process.wait()
+            if cancel is not None:
+                cancel.raise_if_cancelled()
+            if timed_out.is_set():
+                raise OllamaTimeout(f"Ollama timed out after {self.timeout} seconds")
+            if process.returncode != 0:
+                raise OllamaError(f"exit code {process.returncode}: {stderr.text()[-500:]}")
+        finally:
+            timer.cancel()
+            if cancel is not None:
+                cancel.remove_callback(process.kill)
+            if process.poll() is None:
+                # Consumer stopped early (or failed) - don't leave the model process running
+                process.kill()
+                process.wait()
+            process.stdout.close()
+            stderr.text()  # let the reader reach EOF before its pipe is closed
+            process.stderr.close()
+
+    @staticmethod
+    def _transcript(messages):
+        """(system prompt, body) for chat messages; the template adds the first 'User: ' and the
+        final 'Assistant:', so earlier turns are written out in between with the same labels"""
+        system_prompt = "\n".join(m["content"] for m in messages if m["role"] == "system")
+        parts = []
+        for m in messages:
+            if m["role"] == "system":
+                continue
+            if parts:
+                parts.append("\n\nAssistant: " if m["role"] == "assistant" else "\n\nUser: ")
+            parts.append(m["content"])
+        return system_prompt, "".join(parts)
+
+    def chat(self, messages, stats=None, cancel=None):
+        # `ollama run` keeps no state between processes, so the whole exchange is sent as text
+        system_prompt, content = self._transcript(messages)
+        return self.generate(content, system_prompt, stats, cancel)
+
+    def stream_chat(self, messages, stats=None, cancel=None):
+        system_prompt, content = self._transcript(messages)
+        return self.stream_generate(content, system_prompt, stats, cancel)
+
+    def load_model(self):
+        """Run a tiny prompt so the server loads the model; returns None (no load timing)"""
+        self.generate("Hello")
+        return None
+
+    def is_available(self):
+        try:
+            subprocess.run([self.command, "--version"], capture_output=True, timeout=10)
+            return True
+        except (OSError, subprocess.TimeoutExpired):
+            return False
+
+    def close(self):
+        pass
+
+
+def create_ollama_backend(kind, model, host=DEFAULT_HOST, keep_alive="30m", timeout=300,
+                          command="ollama", pool_size=4):
+    """Build the configured backend ('http' or 'cli')"""
+    if kind == "cli":
+        return OllamaCLIBackend(model, command=command, timeout=timeout)
+    if kind == "http":
+        return OllamaHTTPBackend(model, host=host, keep_alive=keep_alive,
+                                 timeout=timeout, pool_size=pool_size)
+    raise ValueError(f"Unknown OLLAMA_BACKEND '{kind}' (expected 'http' or 'cli')")
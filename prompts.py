@@ -0,0 +1,67 @@
+"""
+Prompt templates - the constant parts of each prompt are resolved once at
+startup so building a request is a single string concatenation.
+"""
+
+import re
+
+from text_slices import slices
+
+# Section headings of a multi-part prompt and of its answer ("### Part 2", "## **Part 2:**")
+_PART_HEADING = re.compile(r"^[ \t]*#{1,6}[ \t]*\**[ \t]*Part[ \t]+(\d+)\b.*$", re.M | re.I)
+
+
+def normalize_system_prompt(system_prompt):
+    """Treat a whitespace-only system prompt (the config default) as no system prompt"""
+    return (system_prompt or "").strip()
+
+
+def chat_messages(system_prompt, turns, content):
+    """Chat messages for content after earlier (prompt, response) turns; the same turns
+    always give the same leading messages, so the server can reuse their evaluation"""
+    system_prompt = normalize_system_prompt(system_prompt)
+    messages = [{"role": "system", "content": system_prompt}] if system_prompt else []
+    for prompt, response in turns:
+        messages.append({"role": "user", "content": prompt})
+        messages.append({"role": "assistant", "content": response})
+    messages.append({"role": "user", "content": content})
+    return messages
+
+
+def multi_part_prompt(parts):
+    """One prompt for several clipboards answered together; split the answer with split_parts()"""
+    sections = "\n\n".join(f"### Part {i}\n{text}" for i, text in enumerate(parts, 1))
+    return (f"The {len(parts)} parts below are separate requests. Handle each one on its own, exactly as "
+            f"if it had been sent alone. Answer with one section per part, in the same order, each "
+            f"starting with its '### Part N' heading line, and nothing before the first heading.\n\n{sections}")
+
+
+def split_parts(text, count):
+    """The answers to a multi_part_prompt() in order, or None if the headings don't match up"""
+    headings = list(_PART_HEADING.finditer(text))
+    if [int(match.group(1)) for match in headings] != list(range(1, count + 1)):
+        return None
+    ends = [match.start() for match in headings[1:]] + [len(text)]
+    answers = [text[match.end():end].strip() for match, end in zip(headings, ends)]
+    return answers if all(answers) else None
+
+
+class PromptTemplate:
+    """The plain-text 'System: ... User: ... Assistant:' prompt used by `ollama run`"""
+
+    def __init__(self, system_prompt=""):
+        self.system_prompt = normalize_system_prompt(system_prompt)
+        if self.system_prompt:
+            self.prefix = f"System: {self.system_prompt}\n\nUser: "
+        else:
+            self.prefix = "User: "
+        self.suffix = "\n\nAssistant:"
+
+    def render(self, content):
+        return self.prefix + content + self.suffix
+
+    def pieces(self, content):
+        """The rendered prompt in pieces, for writing a huge clipboard to a pipe without copying it"""
+        yield self.prefix
+        yield from slices(content)
+        yield self.suffix
@@ -0,0 +1,105 @@
+"""
+Race-to-first - send the same request to several backends and keep whichever
+answers first.
+
+Contenders start in order; with a hedge delay the next one only starts if no
+answer has arrived by then (or as soon as an earlier contender fails). The
+losers are cancelled through their own CancelToken, which closes their HTTP
+stream or kills their `ollama run` process.
+"""
+
+import queue
+import threading
+import time
+
+from cancellation import CancelToken
+
+
+class RaceResult:
+    """Outcome of a race: the winner (None if every contender failed) and per-contender results"""
+
+    def __init__(self):
+        self.winner = None
+        self.result = None
+        self.seconds = None
+        # name -> (status, seconds); status is "won", "lost", "failed" or "not started"
+        self.outcomes = {}
+
+    def describe(self):
+        parts = []
+        for name, (status, seconds) in self.outcomes.items():
+            parts.append(f"{name} {status}" + (f" after {seconds:.2f}s" if seconds is not None else ""))
+        return ", ".join(parts)
+
+
+def race(contenders, hedge_delay=0.0, cancel=None):
+    """Run fn(cancel) for each (name, fn) in contenders and return a RaceResult.
+
+    A falsy return value or an exception counts as a failure; the first truthy
+    answer wins and every other contender is cancelled. Raises RequestCancelled
+    if the caller's token is cancelled before anyone wins.
+    """
+    outcome = RaceResult()
+    tokens = [CancelToken() for _ in contenders]
+    finished = queue.Queue()
+    started = time.perf_counter()
+
+    def cancel_all():
+        for token in tokens:
+            token.cancel("race cancelled")
+
+    def run(index, fn):
+        began = time.perf_counter()
+        try:
+            answer = fn(tokens[index])
+            error = None
+        except Exception as e:
+            answer, error = None, e
+        finished.put((index, answer, error, time.perf_counter() - began))
+
+    if cancel is not None:
+        cancel.add_callback(cancel_all)
+    launched = 0
+    running = 0
+    next_start = started
+    try:
+        while launched < len(contenders) or running:
+            if launched < len(contenders) and time.perf_counter() >= next_start:
+                name, fn = contenders[launched]
+                threading.Thread(target=run, args=(launched, fn), name=f"race-{name}", daemon=True).start()
+                launched += 1
+                running += 1
+                next_start = time.perf_counter() + hedge_delay
+                continue
+            timeout = None
+            if launched < len(contenders):
+                timeout = max(0.0, next_start - time.perf_counter())
+            try:
+                index, answer, error, seconds = finished.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            running -= 1
+            name = contenders[index][0]
+            if answer:
+                outcome.winner = name
+                outcome.result = answer
+                outcome.seconds = time.perf_counter() - started
+                outcome.outcomes[name] = ("won", seconds)
+                break
+            outcome.outcomes[name] = ("failed", seconds)
+            # A failure should not wait out the hedge delay
+            next_start = time.perf_counter()
+    finally:
+        if cancel is not None:
+            cancel.remove_callback(cancel_all)
+
+    for index, (name, _) in enumerate(contenders):
+        if index >= launched:
+            outcome.outcomes[name] = ("not started", None)
+        elif name not in outcome.outcomes:
+            tokens[index].cancel(f"lost the race to {outcome.winner}")
+            outcome.outcomes[name] = ("lost", None)
+
+    if outcome.winner is None and cancel is not None:
+        cancel.raise_if_cancelled()
+    return outcome
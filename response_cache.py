@@ -0,0 +1,131 @@
+"""
+On-disk response cache for Local AI Clipboard
+
+Responses are stored in a small SQLite file, keyed by a hash of
+(backend, model, system prompt, clipboard text). Entries expire after a TTL
+and the least recently used ones are evicted once the cache grows past its
+size or entry limits.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from text_slices import json_pieces
+
+
+def cache_key(backend, model, system_prompt, content):
+    """Stable content-addressed key for one request: SHA-256 of the JSON list of its parts,
+    encoded and hashed a slice at a time so a huge clipboard is not copied"""
+    hasher = hashlib.sha256()
+    for piece in json_pieces([backend, model, system_prompt or "", content]):
+        hasher.update(piece.encode("utf-8"))
+    return hasher.hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe SQLite-backed LRU cache with TTL and size-based eviction"""
+
+    def __init__(self, path, max_bytes=50 * 1024 * 1024, max_entries=2000, ttl=7 * 24 * 3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " backend TEXT,"
+            " model TEXT,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access)")
+        self._db.commit()
+
+    def get(self, key):
+        """Return the cached response, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(
+                "SELECT response, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created = row
+            if self.ttl and now - created > self.ttl:
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return response
+
+    def put(self, key, response, backend="", model=""):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, backend, model, response, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, backend, model, response, size, now, now),
+            )
+            self._evict(now)
+            self._db.commit()
+
+    def _evict(self, now):
+        """Drop expired entries, then least recently used ones until within limits"""
+        if self.ttl:
+            self._db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count, total = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._db.execute(
+            "SELECT key, size FROM responses ORDER BY last_access ASC"
+        ).fetchall()
+        doomed = []
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            doomed.append((key,))
+            count -= 1
+            total -= size
+        self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+
+    def clear(self):
+        """Remove every entry; returns how many were deleted"""
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM responses").rowcount
+            self._db.commit()
+            self._db.execute("VACUUM")
+        return deleted
+
+    def stats(self):
+        with self._lock:
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        return {"entries": count, "bytes": total, "hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
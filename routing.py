@@ -0,0 +1,200 @@
+"""
+Backend routing - rolling latency/error tracking per backend and model, and a
+circuit breaker so a press never waits on a backend that is known to be down
+or rate limited.
+
+A circuit opens after CIRCUIT_FAILURE_THRESHOLD failures in a row, or at once
+for a rate limit or an unreachable server. While open the route is skipped;
+after the backoff (or the server's retry-after hint) one trial request is let
+through, which closes the circuit again on success or reopens it with a
+doubled backoff on failure.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+
+# "Please retry in 37.09s", "retry_delay { seconds: 37 }", "Retry-After: 37"
+_RETRY_AFTER = (
+    re.compile(r"retry in ([\d.]+)\s*s", re.I),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.I),
+    re.compile(r"retry-after:?\s*([\d.]+)", re.I),
+)
+
+
+def is_rate_limited(error):
+    message = str(error)
+    return ("429" in message or "ResourceExhausted" in type(error).__name__
+            or "ResourceExhausted" in message or "rate limit" in message.lower()
+            or "quota" in message.lower())
+
+
+def retry_after_hint(error):
+    """Seconds the server asked us to wait, if the error carries a hint"""
+    delay = getattr(error, "retry_after", None)
+    if delay:
+        return float(delay)
+    message = str(error)
+    for pattern in _RETRY_AFTER:
+        match = pattern.search(message)
+        if match:
+            try:
+                return float(match.group(1))
+            except ValueError:
+                continue
+    return None
+
+
+class BackendHealth:
+    """Rolling outcomes for one route plus its circuit breaker state"""
+
+    def __init__(self, name, window=20, failure_threshold=3, backoff=10.0, max_backoff=300.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self._outcomes = deque(maxlen=window)
+        self.consecutive_failures = 0
+        self.state = "closed"  # "closed", "open" or "half-open"
+        self.open_until = 0.0
+        self.backoff = backoff
+        self.last_error = None
+        self._trial_running = False
+
+    def allow(self):
+        """True if a request may use this route now (claims the trial slot when half-open)"""
+        with self._lock:
+            if self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() < self.open_until:
+                return False
+            if self._trial_running:
+                return False
+            self.state = "half-open"
+            self._trial_running = True
+            return True
+
+    def record_success(self, seconds=None):
+        with self._lock:
+            if seconds is not None:
+                self._latencies.append(seconds)
+            self._outcomes.append(True)
+            self.consecutive_failures = 0
+            self.state = "closed"
+            self.backoff = self.base_backoff
+            self._trial_running = False
+
+    def record_failure(self, error, open_now=False):
+        """Count a failure; returns True if this opened the circuit"""
+        retry_after = retry_after_hint(error)
+        with self._lock:
+            self._outcomes.append(False)
+            self.consecutive_failures += 1
+            self.last_error = str(error)[:200]
+            trial_failed = self.state == "half-open"
+            self._trial_running = False
+            if not (open_now or trial_failed or self.consecutive_failures >= self.failure_threshold):
+                return False
+            was_open = self.state != "closed"
+            delay = max(self.backoff, retry_after or 0)
+            self.state = "open"
+            self.open_until = time.monotonic() + min(delay, max(self.max_backoff, retry_after or 0))
+            # Each reopen without a success in between waits twice as long
+            self.backoff = min(self.backoff * 2, self.max_backoff)
+            return not was_open or trial_failed
+
+    def release(self):
+        """Give back a half-open trial slot without an outcome (e.g. the request was cancelled)"""
+        with self._lock:
+            self._trial_running = False
+
+    @property
+    def retry_in(self):
+        return max(0.0, self.open_until - time.monotonic()) if self.state == "open" else 0.0
+
+    @property
+    def error_rate(self):
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @property
+    def median_latency(self):
+        if not self._latencies:
+            return None
+        ordered = sorted(self._latencies)
+        return ordered[len(ordered) // 2]
+
+    def describe(self):
+        parts = [self.state]
+        if self.state == "open":
+            parts.append(f"retry in {self.retry_in:.0f}s")
+        if self.median_latency is not None:
+            parts.append(f"p50 {self.median_latency:.2f}s")
+        if self._outcomes:
+            parts.append(f"{self.error_rate:.0%} errors over {len(self._outcomes)}")
+        return f"{self.name}: {', '.join(parts)}"
+
+
+class Route:
+    """One way to answer a request: a backend kind, its model and the backend object"""
+
+    def __init__(self, kind, model, backend, health, fallback_backend=None):
+        self.kind = kind            # "ollama" or "gemini"
+        self.model = model
+        self.backend = backend
+        self.health = health
+        self.fallback_backend = fallback_backend
+        self.primary = True
+        self.tier = None            # name of the model tier that picked this route, if any
+
+    @property
+    def name(self):
+        return f"{self.kind}:{self.model}"
+
+
+class Router:
+    """Orders the routes for a request, skipping ones whose circuit is open"""
+
+    def __init__(self, fallback_to_other=True):
+        self.fallback_to_other = fallback_to_other
+        self.routes = {}
+
+    def add(self, route, primary=True):
+        route.primary = primary
+        self.routes.setdefault(route.kind, []).append(route)
+        return route
+
+    def primary(self, kind):
+        routes = self.routes.get(kind)
+        return routes[0] if routes else None
+
+    def plan(self, kind, others=True, first=None):
+        """Routes to try for a press of `kind`, best first, and the ones skipped as unhealthy.
+
+        `first` (e.g. the route picked by a model tier) leads, then the chosen
+        backend's models; the other backends follow (when allowed), fastest
+        recent median latency first.
+        """
+        candidates = list(self.routes.get(kind, []))
+        if first is not None:
+            candidates = [first] + [r for r in candidates if r is not first]
+        if others and self.fallback_to_other:
+            rest = [r for name, routes in self.routes.items() if name != kind for r in routes]
+            # Stable sort: routes without latency data keep their configured order at the end
+            rest.sort(key=lambda r: (r.health.median_latency is None, r.health.median_latency or 0))
+            candidates += rest
+        allowed, skipped = [], []
+        for route in candidates:
+            (allowed if route.health.allow() else skipped).append(route)
+        return allowed, skipped
+
+    def release(self, routes):
+        for route in routes:
+            route.health.release()
+
+    def describe(self):
+        return "; ".join(route.health.describe() for routes in self.routes.values() for route in routes)
@@ -0,0 +1,312 @@
+"""
+Near-duplicate response cache for Local AI Clipboard
+
+The exact-match cache misses text that is almost the same as an earlier request:
+the same stack trace with other timestamps, a paragraph re-copied with different
+whitespace. This index finds such requests and serves their cached answer.
+
+Text is normalized (lower case, volatile tokens like timestamps, UUIDs, hex ids
+and long numbers masked), cut into overlapping 3-token shingles and summarized
+as a MinHash-style signature (one-permutation hashing: every shingle is hashed
+once into one of 128 bins, each bin keeps its smallest value). The share of
+equal bins estimates the Jaccard similarity of two texts. Signatures live in one
+NumPy matrix, so a lookup compares against every entry in a single vectorized
+step; without NumPy the same comparison runs in pure Python.
+
+Responses stay in the ResponseCache; this index only maps a signature to a
+response-cache key, stored in a table of the same SQLite file.
+"""
+
+import hashlib
+import itertools
+import re
+import sqlite3
+import threading
+import time
+from array import array
+from collections import Counter, deque
+
+from text_slices import SLICE_CHARS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NUM_BINS = 128
+EMPTY = 0xFFFFFFFF
+
+# Volatile tokens (matched in lower-cased text with collapsed whitespace) become
+# placeholders like <ts>; small numbers such as line numbers are kept
+_TOKEN = re.compile(
+    r"(?P<ts>\b\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?(?:z|[+-]\d{2}:?\d{2})?)"
+    r"|(?P<date>\b\d{4}[-/.]\d{2}[-/.]\d{2}\b)"
+    r"|(?P<time>\b\d{1,2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?\b)"
+    r"|(?P<uuid>\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b)"
+    r"|(?P<hex>\b0x[0-9a-f]+\b|\b(?=[0-9a-f]*\d)(?=[0-9a-f]*[a-f])[0-9a-f]{8,}\b)"  # addresses, hashes
+    r"|(?P<num>\b\d{5,}\b)"  # pids, epoch times, request ids
+    r"|\w+|[^\w\s]"
+)
+
+
+def normalize(text):
+    """Tokens of text: lower case, whitespace ignored, volatile tokens masked"""
+    return [f"<{m.lastgroup}>" if m.lastgroup else m.group()
+            for m in _TOKEN.finditer(" ".join(text.lower().split()))]
+
+
+def shingles(tokens, size=3):
+    """Overlapping runs of `size` tokens (the whole text if it is shorter)"""
+    if len(tokens) <= size:
+        return {" ".join(tokens)} if tokens else set()
+    return {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+
+
+def _pieces(text, size=SLICE_CHARS):
+    """Consecutive pieces of text of about `size` characters, cut at a line break (or a space)
+    so no token is split"""
+    start = 0
+    while start < len(text):
+        end = start + size
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            if cut <= start:
+                cut = text.rfind(" ", start, end)
+            if cut > start:
+                end = cut + 1
+        yield text[start:end]
+        start = end
+
+
+def signature(text, bins=NUM_BINS):
+    """One-permutation MinHash of text's shingles: array of `bins` uint32 (EMPTY = no shingle).
+
+    Long text is tokenized a slice at a time, carrying the last tokens of each
+    slice over, so memory stays bounded however big the clipboard is.
+    """
+    values = [EMPTY] * bins
+
+    def update(found):
+        for shingle in found:
+            h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+            slot, value = h % bins, (h >> 32) & 0xFFFFFFFE  # never equal to EMPTY
+            if value < values[slot]:
+                values[slot] = value
+
+    pending, hashed = [], False
+    for piece in _pieces(text):
+        pending += normalize(piece)
+        if len(pending) >= 3:
+            update(shingles(pending))
+            pending, hashed = pending[-2:], True
+    if not hashed:
+        update(shingles(pending))  # fewer than 3 tokens: the whole text is one shingle
+    return array("I", values)
+
+
+def _packed(sig):
+    """Pure-Python form of a signature: (set of bin<<32|value, bitmask of non-empty bins)"""
+    pairs, mask = set(), 0
+    for i, value in enumerate(sig):
+        if value != EMPTY:
+            pairs.add(i << 32 | value)
+            mask |= 1 << i
+    return pairs, mask
+
+
+class SimilarityCache:
+    """In-memory signature index over the ResponseCache, persisted next to it"""
+
+    def __init__(self, cache, threshold=0.9, max_entries=2000, bins=NUM_BINS):
+        self.cache = cache
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bins = bins
+        self.lookups = 0
+        self.hits = 0
+        self._latencies = deque(maxlen=1000)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(cache.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS similar ("
+            " key TEXT PRIMARY KEY,"
+            " scope TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " created REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._reset()
+        rows = self._db.execute("SELECT key, scope, signature FROM similar ORDER BY created").fetchall()
+        for key, scope, blob in rows:
+            sig = array("I")
+            sig.frombytes(blob)
+            if len(sig) == bins:
+                self._append(key, scope, sig)
+
+    @property
+    def engine(self):
+        return "numpy" if np is not None else "python"
+
+    def _reset(self):
+        self._scope_ids = {}
+        if np is not None:
+            self._keys = []
+            self._rows = {}
+            self._scopes = array("i")
+            self._matrix = np.empty((self.bins, 0), dtype=np.uint32)  # one row per bin, one column per entry
+        else:
+            self._entries = {}  # key -> (pairs, mask, scope id), in insertion order
+            self._postings = {}  # bin<<32|value -> keys whose signature has it
+
+    def _count(self):
+        return len(self._keys) if np is not None else len(self._entries)
+
+    def _append(self, key, scope, sig):
+        scope_id = self._scope_ids.setdefault(scope, len(self._scope_ids))
+        if np is None:
+            self._remove([key])
+            pairs, mask = _packed(sig)
+            self._entries[key] = (pairs, mask, scope_id)
+            for pair in pairs:
+                self._postings.setdefault(pair, set()).add(key)
+            return
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            self._keys.append(key)
+            self._rows[key] = row
+            self._scopes.append(scope_id)
+            if row == self._matrix.shape[1]:
+                grown = np.empty((self.bins, max(64, 2 * row)), dtype=np.uint32)
+                grown[:, :row] = self._matrix[:, :row]
+                self._matrix = grown
+        self._scopes[row] = scope_id
+        self._matrix[:, row] = np.frombuffer(sig, dtype=np.uint32)
+
+    def _remove(self, keys):
+        if np is None:
+            for key in keys:
+                entry = self._entries.pop(key, None)
+                for pair in entry[0] if entry else ():
+                    holders = self._postings[pair]
+                    holders.discard(key)
+                    if not holders:
+                        del self._postings[pair]
+            return
+        keys = set(keys) & self._rows.keys()
+        if not keys:
+            return
+        keep = [row for row, key in enumerate(self._keys) if key not in keys]
+        self._keys = [self._keys[row] for row in keep]
+        self._rows = {key: row for row, key in enumerate(self._keys)}
+        self._scopes = array("i", (self._scopes[row] for row in keep))
+        self._matrix = np.ascontiguousarray(self._matrix[:, np.array(keep, dtype=np.intp)])
+
+    def _forget(self, keys):
+        """Drop keys from the index and its table"""
+        self._remove(keys)
+        self._db.executemany("DELETE FROM similar WHERE key = ?", [(key,) for key in keys])
+        self._db.commit()
+
+    def _oldest(self, count):
+        return self._keys[:count] if np is not None else list(itertools.islice(self._entries, count))
+
+    def _best(self, sig, scope_ids):
+        """(key, estimated Jaccard similarity) of the closest entry in scope_ids"""
+        if not self._count():
+            return None, -1.0
+        if np is not None:
+            # Equal bins over the bins that are non-empty in either signature, for every entry at
+            # once; bins are rows so each comparison runs over contiguous memory
+            count = len(self._keys)
+            query = np.frombuffer(sig, dtype=np.uint32)
+            filled = query != EMPTY
+            matrix = self._matrix[:, :count]
+            matches = (matrix[filled] == query[filled, None]).sum(axis=0, dtype=np.int32)
+            only_entry = (matrix[~filled] != EMPTY).sum(axis=0, dtype=np.int32)
+            scores = matches / (int(filled.sum()) + only_entry)
+            scores[~np.isin(np.frombuffer(self._scopes, dtype=np.int32), list(scope_ids))] = -1.0
+            row = int(scores.argmax())
+            return self._keys[row], float(scores[row])
+        # Without NumPy, count equal bins through the postings and only score entries that share one
+        query, query_mask = _packed(sig)
+        matches = Counter()
+        for pair in query:
+            matches.update(self._postings.get(pair, ()))
+        best_key, best = None, -1.0
+        for key, count in matches.most_common():
+            if count / len(query) <= best:
+                break  # the union is at least len(query), so no later entry can score higher
+            _, mask, scope_id = self._entries[key]
+            if scope_id in scope_ids:
+                score = count / bin(mask | query_mask).count("1")
+                if score > best:
+                    best_key, best = key, score
+        return best_key, best
+
+    def lookup(self, text, scopes):
+        """Find the most similar earlier request in any of scopes (cache keys of the empty prompt
+        for each backend/model that may answer).
+
+        Returns (response or None, similarity of the best candidate, signature of text);
+        pass the signature to add() once the request is answered.
+        """
+        started = time.perf_counter()
+        sig = signature(text, self.bins)
+        response, best = None, 0.0
+        with self._lock:
+            self.lookups += 1
+            scope_ids = {self._scope_ids[scope] for scope in scopes if scope in self._scope_ids}
+            if scope_ids and sig.count(EMPTY) < self.bins:
+                key, score = self._best(sig, scope_ids)
+                if key is not None and score > 0:
+                    best = score
+                    if best >= self.threshold:
+                        response = self.cache.get(key)
+                        if response is None:
+                            self._forget([key])  # expired or evicted from the response cache
+                        else:
+                            self.hits += 1
+            self._latencies.append(time.perf_counter() - started)
+        return response, best, sig
+
+    def add(self, sig, scope, key):
+        """Index the response-cache entry `key` under text's signature"""
+        if sig.count(EMPTY) == self.bins:
+            return
+        with self._lock:
+            self._append(key, scope, sig)
+            self._db.execute("INSERT OR REPLACE INTO similar (key, scope, signature, created) VALUES (?, ?, ?, ?)",
+                             (key, scope, sig.tobytes(), time.time()))
+            self._db.commit()
+            if self.max_entries and self._count() > self.max_entries:
+                # Oldest first, a tenth at a time so the matrix is not rebuilt on every add
+                self._forget(self._oldest(self._count() - self.max_entries * 9 // 10))
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM similar")
+            self._db.commit()
+            self._reset()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            return {
+                "entries": self._count(),
+                "engine": self.engine,
+                "lookups": self.lookups,
+                "hits": self.hits,
+                "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+                "p50_ms": latencies[len(latencies) // 2] * 1000 if latencies else 0.0,
+                "p95_ms": latencies[min(len(latencies) - 1, len(latencies) * 95 // 100)] * 1000 if latencies else 0.0,
+            }
+
+    def describe(self):
+        stats = self.stats()
+        return (f"{stats['entries']} entries, {stats['hits']}/{stats['lookups']} hits ({stats['hit_rate']:.0%}), "
+                f"lookup p50 {stats['p50_ms']:.2f} ms / p95 {stats['p95_ms']:.2f} ms ({stats['engine']})")
+
+    def close(self):
+        with self._lock:
+            self._db.close()
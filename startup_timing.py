@@ -0,0 +1,47 @@
+"""
+Startup timing - records how long each import and setup phase takes so the
+time to "Ready! Listening" can be reported and kept within a budget.
+"""
+
+import importlib
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Collects (phase, seconds) pairs measured from a common start point"""
+
+    def __init__(self, start=None):
+        self.start = start if start is not None else time.perf_counter()
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - began))
+
+    def import_module(self, name):
+        """Import a module and record how long it took (0 if it was already loaded)"""
+        with self.phase(f"import {name}"):
+            return importlib.import_module(name)
+
+    @property
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.start) * 1000
+
+    def slowest(self, count=5):
+        return sorted(self.phases, key=lambda item: item[1], reverse=True)[:count]
+
+    def summary(self, budget_ms=None):
+        """One-line report, e.g. '142 ms to ready (pynput 61 ms, config 9 ms, ...)'"""
+        total = self.elapsed_ms
+        details = ", ".join(f"{name} {seconds * 1000:.0f} ms" for name, seconds in self.slowest())
+        line = f"{total:.0f} ms to ready"
+        if details:
+            line += f" ({details})"
+        if budget_ms and total > budget_ms:
+            line += f" - over the {budget_ms} ms budget!"
+        return line
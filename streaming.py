@@ -0,0 +1,160 @@
+"""
+Streaming helpers - latency metrics for token streams and coalesced
+clipboard updates while a response is still being generated.
+"""
+
+import time
+
+from cancellation import RequestCancelled
+
+
+class StreamStats:
+    """Timing for one generation: time-to-first-token, generation time and throughput"""
+
+    def __init__(self, on_chunk=None):
+        self.start = time.perf_counter()
+        self.first_token_at = None
+        self.end = None
+        self.chunks = 0
+        self.chars = 0
+        # Filled in by backends that report exact numbers (Ollama's final NDJSON
+        # message, Gemini's usage metadata); otherwise chunks are used as tokens.
+        self.output_tokens = None
+        self.prompt_tokens = None
+        self.cached_tokens = None  # prompt tokens the backend reports as served from its cache
+        self.prompt_eval_seconds = None
+        self.load_seconds = None
+        # Called with each chunk as it arrives (e.g. to stream it on to a daemon client)
+        self.on_chunk = on_chunk
+
+    def begin(self):
+        """Restart the clock right before the request is sent to the model"""
+        self.start = time.perf_counter()
+
+    def mark_chunk(self, text):
+        if not text:
+            return
+        if self.first_token_at is None:
+            self.first_token_at = time.perf_counter()
+        self.chunks += 1
+        self.chars += len(text)
+        if self.on_chunk is not None:
+            self.on_chunk(text)
+
+    def finish(self):
+        if self.end is None:
+            self.end = time.perf_counter()
+
+    def update_from(self, other):
+        """Take over another generation's measurements (e.g. the winner of a race)"""
+        self.__dict__.update(other.__dict__)
+
+    @property
+    def time_to_first_token(self):
+        if self.first_token_at is None:
+            return None
+        return self.first_token_at - self.start
+
+    @property
+    def generation_seconds(self):
+        if self.first_token_at is None or self.end is None:
+            return None
+        return self.end - self.first_token_at
+
+    @property
+    def total_seconds(self):
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def tokens(self):
+        return self.output_tokens if self.output_tokens is not None else self.chunks
+
+    @property
+    def tokens_per_second(self):
+        gen = self.generation_seconds
+        if not gen or self.tokens <= 1:
+            return None
+        # The first token arrives at first_token_at, so only the rest count toward the rate
+        return (self.tokens - 1) / gen
+
+    def summary(self):
+        parts = []
+        if self.time_to_first_token is not None:
+            parts.append(f"first token {self.time_to_first_token:.2f}s")
+        if self.generation_seconds is not None:
+            parts.append(f"generation {self.generation_seconds:.2f}s")
+        if self.tokens_per_second is not None:
+            parts.append(f"{self.tokens_per_second:.1f} tok/s ({self.tokens} tokens)")
+        prompt = ""
+        if self.prompt_tokens is not None:
+            prompt = f"{self.prompt_tokens} tokens" + (f", {self.cached_tokens} cached" if self.cached_tokens else "")
+        if self.prompt_eval_seconds is not None:
+            parts.append(f"prompt eval {self.prompt_eval_seconds:.2f}s" + (f" ({prompt})" if prompt else ""))
+        elif prompt:
+            parts.append(f"prompt {prompt}")
+        if self.load_seconds:
+            parts.append(f"model load {self.load_seconds:.2f}s")
+        return " | ".join(parts) if parts else "no tokens received"
+
+
+class ClipboardStreamWriter:
+    """Copy the partial response to the clipboard at most once per interval"""
+
+    def __init__(self, copy_func, interval=0.5):
+        self.copy_func = copy_func
+        self.interval = interval
+        self.last_flush = 0.0
+        self.flushes = 0
+        self._dirty = False
+
+    def update(self, parts):
+        """Called after every chunk with the list of chunks received so far"""
+        self._dirty = True
+        now = time.perf_counter()
+        if now - self.last_flush >= self.interval:
+            self.flush(parts, now)
+
+    def flush(self, parts, now=None):
+        if not self._dirty:
+            return
+        self.copy_func("".join(parts))
+        self.last_flush = now if now is not None else time.perf_counter()
+        self.flushes += 1
+        self._dirty = False
+
+
+def consume_stream(chunks, stats=None, writer=None, cancel=None, strip=False):
+    """Drain a chunk iterator into a string, updating stats and the clipboard writer.
+
+    strip=True trims surrounding whitespace on the chunks before joining them,
+    so a long answer is copied once instead of again by str.strip().
+    """
+    parts = []
+    try:
+        for text in chunks:
+            if cancel is not None and cancel.is_set():
+                # Closing the generator lets the backend drop its connection/process
+                if hasattr(chunks, "close"):
+                    chunks.close()
+                raise RequestCancelled(cancel.reason)
+            if not text:
+                continue
+            if stats is not None:
+                stats.mark_chunk(text)
+            parts.append(text)
+            if writer is not None:
+                writer.update(parts)
+    finally:
+        if stats is not None:
+            stats.finish()
+    if strip:
+        start, end = 0, len(parts)
+        while start < end and parts[start].isspace():
+            start += 1
+        while end > start and parts[end - 1].isspace():
+            end -= 1
+        parts = parts[start:end]
+        if parts:
+            parts[0] = parts[0].lstrip()
+            parts[-1] = parts[-1].rstrip()
+    return "".join(parts)
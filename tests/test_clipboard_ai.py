@@ -0,0 +1,115 @@
+"""ClipboardAI end to end against the fake Ollama server and an in-memory clipboard"""
+
+import contextlib
+import io
+import os
+import socket
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.join(REPO, "benchmarks"))
+
+import clipboard_ai  # noqa: E402
+from clipboard_io import ClipboardError, InMemoryClipboard  # noqa: E402
+from fakes import FakeOllamaServer, TokenSource, write_fake_ollama_cli  # noqa: E402
+from ollama_backend import OllamaUnavailable  # noqa: E402
+
+
+class BrokenWriteClipboard(InMemoryClipboard):
+    """Reads fine; every write fails like a clipboard held open by another app"""
+
+    def write(self, text):
+        raise ClipboardError("clipboard is locked")
+
+
+@pytest.fixture
+def ollama_server():
+    with FakeOllamaServer(TokenSource(tokens=6)) as server:
+        yield server
+
+
+@pytest.fixture
+def make_app(ollama_server, monkeypatch):
+    """ClipboardAI on the fake server, with nothing written to disk"""
+    settings = {
+        "OLLAMA_BACKEND": "http", "OLLAMA_HOST": ollama_server.url, "OLLAMA_CLI_FALLBACK": False,
+        "OLLAMA_FALLBACK_MODEL": "", "OLLAMA_TIERS": [], "GEMINI_AVAILABLE": False, "GEMINI_API_KEY": "",
+        "WARMUP_ON_START": False, "CACHE_ENABLED": False, "TRACE_ENABLED": False, "HISTORY_ENABLED": False,
+        "STREAM_TO_CLIPBOARD": False, "VERBOSE": False,
+    }
+    for name, value in settings.items():
+        monkeypatch.setattr(clipboard_ai, name, value)
+    apps = []
+
+    def make(clipboard):
+        with contextlib.redirect_stdout(io.StringIO()):
+            app = clipboard_ai.ClipboardAI(clipboard=clipboard)
+        app.clipboard.retry_delay = 0.0
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        app.close()
+
+
+def run(app, **kwargs):
+    """process_clipboard with its console output and trace captured"""
+    traces = []
+    app._record_trace = traces.append
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        app.process_clipboard(**kwargs)
+    return out.getvalue(), traces[0]
+
+
+def test_answer_replaces_the_clipboard(make_app):
+    clipboard = InMemoryClipboard("fix this sentence")
+    output, trace = run(make_app(clipboard))
+    assert trace.status == "ok"
+    assert clipboard.read() == "fix this sentence fix this sentence"
+    assert "Response copied to clipboard" in output
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a shebang script")
+def test_falls_back_to_ollama_run_when_the_server_is_down(make_app, monkeypatch, tmp_path):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    monkeypatch.setattr(clipboard_ai, "OLLAMA_HOST", f"http://127.0.0.1:{port}")
+    monkeypatch.setattr(clipboard_ai, "OLLAMA_CLI_FALLBACK", True)
+    monkeypatch.setattr(clipboard_ai, "OLLAMA_COMMAND", write_fake_ollama_cli(str(tmp_path), TokenSource(tokens=3)))
+    clipboard = InMemoryClipboard("fix this sentence")
+    output, trace = run(make_app(clipboard))
+    assert trace.status == "ok"
+    assert "Ollama server unavailable" in output and "falling back to" in output
+    assert clipboard.writes == 1 and "fix this" in clipboard.read()
+
+
+def test_failed_clipboard_write_is_reported_not_raised(make_app):
+    app = make_app(BrokenWriteClipboard("fix this sentence"))
+    output, trace = run(app)
+    assert trace.status == "clipboard_error"
+    assert "Error writing to clipboard after 5 attempts" in output
+    assert "Unexpected error" not in output
+
+
+def test_no_fallback_after_part_of_the_answer_was_streamed(make_app, ollama_server, monkeypatch):
+    monkeypatch.setattr(clipboard_ai, "OLLAMA_FALLBACK_MODEL", "fallback-model")
+    app = make_app(InMemoryClipboard())
+    first = app.router.routes["ollama"][0]
+
+    def drops_mid_answer(content, system_prompt="", stats=None, cancel=None):
+        yield "Half an ans"
+        raise OllamaUnavailable("connection lost")
+
+    monkeypatch.setattr(first.backend, "stream_generate", drops_mid_answer)
+    pieces = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        response, trace = app.complete("fix this sentence", on_chunk=pieces.append)
+    assert response is None
+    assert pieces == ["Half an ans"]
+    assert ollama_server.source.requests == 0  # the fallback model was never asked
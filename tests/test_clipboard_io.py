@@ -0,0 +1,66 @@
+"""ClipboardIO write verification against in-memory clipboards"""
+
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clipboard_io import ClipboardError, ClipboardIO, InMemoryClipboard  # noqa: E402
+
+
+class LaggingClipboard(InMemoryClipboard):
+    """A clipboard whose writes show up `lag` seconds later, like an X11 helper process
+    (lag=None: never)"""
+
+    def __init__(self, lag):
+        super().__init__()
+        self.synchronous_writes = False
+        self.lag = lag
+        self.reads = 0
+        self._pending = None
+
+    def write(self, text):
+        self._pending = (text, time.perf_counter())
+        self.writes += 1
+
+    def read(self):
+        self.reads += 1
+        if self._pending and self.lag is not None and time.perf_counter() - self._pending[1] >= self.lag:
+            self._text = self._pending[0]
+        return self._text
+
+
+def test_read_returns_text_and_seconds():
+    text, seconds = ClipboardIO(InMemoryClipboard("hello")).read()
+    assert text == "hello" and seconds >= 0
+
+
+def test_synchronous_backend_skips_verification():
+    clipboard = LaggingClipboard(lag=None)
+    clipboard.synchronous_writes = True
+    written = ClipboardIO(clipboard).write("answer")
+    assert clipboard.reads == 0
+    assert written.verify_seconds == 0 and written.attempts == 1
+
+
+def test_verification_polls_until_the_write_lands():
+    clipboard = LaggingClipboard(lag=0.03)
+    written = ClipboardIO(clipboard, verify_timeout=0.5, poll_interval=0.005).write("answer")
+    assert clipboard.read() == "answer"
+    assert written.attempts == 1
+    assert 0.02 < written.verify_seconds < 0.5  # returned as soon as it landed, not at the deadline
+    assert clipboard.reads > 1
+
+
+def test_write_that_never_lands_fails_after_max_attempts():
+    clipboard = LaggingClipboard(lag=None)
+    timed = ClipboardIO(clipboard, verify_timeout=0.02, max_attempts=3, retry_delay=0.0)
+    retries = []
+    with pytest.raises(ClipboardError) as info:
+        timed.write("answer", on_retry=lambda attempt, error, delay: retries.append(attempt))
+    assert info.value.attempts == 3
+    assert retries == [1, 2] and clipboard.writes == 3
+
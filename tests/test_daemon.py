@@ -0,0 +1,50 @@
+"""Daemon HTTP handling that is answered before any request reaches the app"""
+
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from daemon import DaemonServer  # noqa: E402
+
+
+def exchange(raw):
+    """Send raw bytes to a DaemonServer without an app; returns the status line and body"""
+    async def run():
+        daemon = DaemonServer(app=None, workers={})
+        server = await asyncio.start_server(daemon.handle, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return response
+
+    head, _, body = asyncio.run(run()).partition(b"\r\n\r\n")
+    return head.split(b"\r\n", 1)[0].decode("latin-1"), body
+
+
+def test_oversized_header_gets_431():
+    status, body = exchange(b"GET /health HTTP/1.1\r\nHost: localhost\r\nX-Big: " + b"a" * 70_000 + b"\r\n\r\n")
+    assert status == "HTTP/1.1 431 Request Header Fields Too Large"
+    assert b"too long" in body
+
+
+def test_oversized_request_line_gets_431():
+    status, _ = exchange(b"GET /" + b"a" * 70_000 + b" HTTP/1.1\r\nHost: localhost\r\n\r\n")
+    assert status == "HTTP/1.1 431 Request Header Fields Too Large"
+
+
+def test_remote_host_is_refused():
+    status, _ = exchange(b"GET /health HTTP/1.1\r\nHost: attacker.example\r\nConnection: close\r\n\r\n")
+    assert status == "HTTP/1.1 403 Forbidden"
+
+
+def test_post_must_be_json():
+    status, _ = exchange(b"POST /cancel HTTP/1.1\r\nHost: localhost\r\nContent-Type: text/plain\r\n"
+                         b"Content-Length: 2\r\nConnection: close\r\n\r\n{}")
+    assert status == "HTTP/1.1 415 Unsupported Media Type"
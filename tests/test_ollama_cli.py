@@ -0,0 +1,55 @@
+"""`ollama run` backend against a fake binary that floods stderr (spinner escapes)"""
+
+import os
+import stat
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ollama_backend import OllamaCLIBackend, OllamaError  # noqa: E402
+
+STDERR_BYTES = 200 * 1024
+
+_SCRIPT = '''#!{python}
+import sys
+sys.stdin.read()
+sys.stderr.write(("\\x1b[?25l\\x1b[1G" + "." * 54) * ({size} // 64))
+sys.stderr.flush()
+print("hello from the model")
+sys.exit(3 if sys.argv[2] == "broken" else 0)
+'''
+
+
+@pytest.fixture
+def noisy_ollama(tmp_path):
+    path = tmp_path / "ollama"
+    path.write_text(_SCRIPT.format(python=sys.executable, size=STDERR_BYTES), encoding="utf-8")
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a shebang script")
+def test_generate_does_not_block_on_stderr(noisy_ollama):
+    backend = OllamaCLIBackend("model", command=noisy_ollama, timeout=8)
+    started = time.perf_counter()
+    assert backend.generate("hi") == "hello from the model"
+    assert time.perf_counter() - started < 5
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a shebang script")
+def test_stream_generate_does_not_block_on_stderr(noisy_ollama):
+    backend = OllamaCLIBackend("model", command=noisy_ollama, timeout=8)
+    assert "".join(backend.stream_generate("hi")).strip() == "hello from the model"
+
+
+@pytest.mark.skipif(os.name == "nt", reason="needs a shebang script")
+def test_failure_reports_the_end_of_stderr(noisy_ollama):
+    backend = OllamaCLIBackend("broken", command=noisy_ollama, timeout=8)
+    with pytest.raises(OllamaError) as info:
+        backend.generate("hi")
+    message = str(info.value)
+    assert message.startswith("exit code 3: ")
+    assert "\x1b" not in message and len(message) < 600
@@ -0,0 +1,69 @@
+"""Ollama HTTP backend against the fake server in benchmarks/fakes.py"""
+
+import os
+import socket
+import sys
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO)
+sys.path.insert(0, os.path.join(REPO, "benchmarks"))
+
+from fakes import FakeOllamaServer, TokenSource  # noqa: E402
+from ollama_backend import OllamaHTTPBackend, OllamaUnavailable  # noqa: E402
+from streaming import StreamStats  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    with FakeOllamaServer(TokenSource(tokens=6)) as server:
+        yield server
+
+
+@pytest.fixture
+def backend(server):
+    backend = OllamaHTTPBackend("fake-model", host=server.url, timeout=5)
+    yield backend
+    backend.close()
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_generate_reuses_one_connection(backend):
+    assert backend.generate("fix this sentence") == "fix this sentence fix this sentence"
+    conn = backend.pool._idle[0]
+    assert backend.generate("and this one") == "and this one and this one"
+    assert backend.pool._idle == [conn] and conn.sock is not None
+
+
+def test_stream_generate_yields_ndjson_pieces(backend):
+    stats = StreamStats()
+    pieces = list(backend.stream_generate("fix this sentence", stats=stats))
+    assert pieces == ["fix", " this", " sentence", " fix", " this", " sentence"]
+    assert stats.output_tokens == 6
+    assert len(backend.pool._idle) == 1  # the stream was read to the end and its connection kept
+
+
+def test_stream_chat_yields_message_content(backend):
+    messages = [{"role": "user", "content": "hello there"}]
+    assert "".join(backend.stream_chat(messages)) == "hello there hello there hello there"
+
+
+def test_abandoned_stream_drops_its_connection(backend):
+    stream = backend.stream_generate("fix this sentence")
+    assert next(stream) == "fix"
+    stream.close()
+    assert backend.pool._idle == []
+    assert backend.generate("still works") == "still works still works still works"
+
+
+def test_unreachable_server_raises_unavailable():
+    backend = OllamaHTTPBackend("fake-model", host=f"http://127.0.0.1:{closed_port()}", timeout=5)
+    with pytest.raises(OllamaUnavailable):
+        backend.generate("hi")
+    assert not backend.is_available()
@@ -0,0 +1,72 @@
+"""
+Helpers for multi-megabyte text - hash, JSON-encode and write a string a
+fixed-size slice at a time, so handling a huge clipboard never holds a second
+full copy of it (an encoded bytes object, a JSON document, a rendered prompt).
+"""
+
+import json
+from json.encoder import encode_basestring
+
+SLICE_CHARS = 64 * 1024
+
+
+def slices(text, size=SLICE_CHARS):
+    """Consecutive pieces of text, each at most size characters"""
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def is_blank(text):
+    """True for empty or whitespace-only text, without the copy text.strip() makes"""
+    return not text or text.isspace()
+
+
+def update_hash(hasher, text, size=SLICE_CHARS):
+    """Feed text's UTF-8 encoding to a hashlib object a slice at a time"""
+    for piece in slices(text, size):
+        hasher.update(piece.encode("utf-8"))
+    return hasher
+
+
+def json_pieces(value, size=SLICE_CHARS):
+    """Yield json.dumps(value, ensure_ascii=False) in pieces; long strings are escaped a slice
+    at a time (JSON escapes single characters, so the slices join into the same output)"""
+    if isinstance(value, str):
+        if len(value) <= size:
+            yield encode_basestring(value)
+            return
+        yield '"'
+        for piece in slices(value, size):
+            yield encode_basestring(piece)[1:-1]
+        yield '"'
+    elif isinstance(value, dict):
+        yield "{"
+        for i, (key, item) in enumerate(value.items()):
+            yield (", " if i else "") + encode_basestring(str(key)) + ": "
+            yield from json_pieces(item, size)
+        yield "}"
+    elif isinstance(value, (list, tuple)):
+        yield "["
+        for i, item in enumerate(value):
+            if i:
+                yield ", "
+            yield from json_pieces(item, size)
+        yield "]"
+    else:
+        yield json.dumps(value)
+
+
+class JSONBody:
+    """A JSON request body that http.client sends piece by piece under a Content-Length.
+
+    Iterating it again re-encodes from the start, so a request can be retried.
+    """
+
+    def __init__(self, payload, size=SLICE_CHARS):
+        self.payload = payload
+        self.size = size
+        self.length = sum(len(piece) for piece in self)
+
+    def __iter__(self):
+        for piece in json_pieces(self.payload, self.size):
+            yield piece.encode("utf-8")
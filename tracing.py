@@ -0,0 +1,212 @@
+"""
+Per-request latency traces - every request records how long each step took
+(hotkey, clipboard read, prompt build, first token, generation, clipboard
+write, verification) and is appended as one JSON line to a rotating log.
+
+Print p50/p95/p99 per backend and model:
+
+    python tracing.py summary [path-to-traces.jsonl]
+"""
+
+import json
+import logging
+import logging.handlers
+import math
+import os
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+
+# Spans in the order they happen during a request
+SPANS = (
+    "hotkey", "clipboard_read", "prompt_build", "first_token",
+    "generation", "clipboard_write", "verify",
+)
+
+
+class RequestTrace:
+    """Timings and metadata for one request"""
+
+    def __init__(self, backend, model, trigger="hotkey"):
+        self.id = uuid.uuid4().hex[:12]
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.backend = backend
+        self.model = model
+        self.trigger = trigger
+        self.spans = {}
+        self.input_chars = 0
+        self.output_chars = 0
+        self.cache = "off"
+        self.status = "ok"
+        self.error = None
+        self.extra = {}
+        self.total_seconds = None
+
+    @contextmanager
+    def span(self, name):
+        began = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, time.perf_counter() - began)
+
+    def add_span(self, name, seconds):
+        if seconds is not None:
+            self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+    def add_stream_stats(self, stats):
+        """Split model time into connect/first-token and generation"""
+        self.add_span("first_token", stats.time_to_first_token)
+        self.add_span("generation", stats.generation_seconds)
+        if stats.prompt_eval_seconds is not None:
+            self.extra["prompt_eval_ms"] = round(stats.prompt_eval_seconds * 1000, 2)
+        if stats.prompt_tokens is not None:
+            self.extra["prompt_tokens"] = stats.prompt_tokens
+        if stats.cached_tokens:
+            self.extra["cached_tokens"] = stats.cached_tokens
+        if stats.output_tokens is not None:
+            self.extra["output_tokens"] = stats.output_tokens
+
+    def finish(self, status=None, error=None):
+        if status:
+            self.status = status
+        if error is not None:
+            self.error = str(error)[:200]
+        self.total_seconds = time.perf_counter() - self.started
+
+    def to_dict(self):
+        data = {
+            "id": self.id,
+            "ts": round(self.timestamp, 3),
+            "backend": self.backend,
+            "model": self.model,
+            "trigger": self.trigger,
+            "status": self.status,
+            "cache": self.cache,
+            "input_chars": self.input_chars,
+            "output_chars": self.output_chars,
+            "total_ms": round((self.total_seconds or 0) * 1000, 2),
+            "spans_ms": {name: round(seconds * 1000, 2) for name, seconds in self.spans.items()},
+        }
+        if self.error:
+            data["error"] = self.error
+        data.update(self.extra)
+        return data
+
+
+class TraceWriter:
+    """Appends traces as JSON lines to a size-rotated file"""
+
+    def __init__(self, path, max_bytes=5 * 1024 * 1024, backups=3):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._handler = logging.handlers.RotatingFileHandler(
+            path, maxBytes=max_bytes, backupCount=backups, encoding="utf-8", delay=True
+        )
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._logger = logging.getLogger(f"clipboard_ai.traces.{id(self)}")
+        self._logger.propagate = False
+        self._logger.setLevel(logging.INFO)
+        self._logger.addHandler(self._handler)
+
+    def write(self, trace):
+        self._logger.info(json.dumps(trace.to_dict(), ensure_ascii=False))
+
+    def close(self):
+        self._logger.removeHandler(self._handler)
+        self._handler.close()
+
+
+def read_traces(path):
+    """Yield trace dicts from path and its rotated backups (oldest first)"""
+    files = []
+    n = 1
+    while os.path.exists(f"{path}.{n}"):
+        files.append(f"{path}.{n}")
+        n += 1
+    files.reverse()
+    if os.path.exists(path):
+        files.append(path)
+    for name in files:
+        with open(name, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(traces):
+    """Group traces by (backend, model) and compute p50/p95/p99 for total and each span"""
+    groups = {}
+    for trace in traces:
+        key = (trace.get("backend", "?"), trace.get("model", "?"))
+        group = groups.setdefault(key, {"count": 0, "errors": 0, "cache_hits": 0, "similar_hits": 0,
+                                        "series": {}})
+        group["count"] += 1
+        if trace.get("status") != "ok":
+            group["errors"] += 1
+        if trace.get("cache") == "hit":
+            group["cache_hits"] += 1
+        elif trace.get("cache") == "similar":
+            group["similar_hits"] += 1
+        if trace.get("status") == "ok":
+            group["series"].setdefault("total", []).append(trace.get("total_ms", 0))
+            for name, ms in (trace.get("spans_ms") or {}).items():
+                group["series"].setdefault(name, []).append(ms)
+            # Prompt evaluation of follow-ups (turn 2+) apart, to show what prefix reuse saves
+            if trace.get("prompt_eval_ms") is not None:
+                name = "followup_eval" if trace.get("turn", 1) > 1 else "prompt_eval"
+                group["series"].setdefault(name, []).append(trace["prompt_eval_ms"])
+    return groups
+
+
+def format_summary(groups):
+    order = ("total",) + SPANS
+    lines = []
+    for (backend, model), group in sorted(groups.items()):
+        lines.append(f"{backend} / {model}: {group['count']} requests, "
+                     f"{group['errors']} failed/cancelled, {group['cache_hits']} cache hits"
+                     + (f", {group['similar_hits']} near-duplicate hits" if group.get("similar_hits") else ""))
+        lines.append(f"  {'span':<16}{'n':>6}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+        names = [n for n in order if n in group["series"]]
+        names += sorted(n for n in group["series"] if n not in order)
+        for name in names:
+            values = group["series"][name]
+            lines.append(f"  {name:<16}{len(values):>6}{percentile(values, 50):>11.1f}"
+                         f"{percentile(values, 95):>11.1f}{percentile(values, 99):>11.1f}")
+        lines.append("")
+    return "\n".join(lines) if lines else "No traces recorded yet."
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] != "summary":
+        print("Usage: python tracing.py summary [path-to-traces.jsonl]")
+        return 2
+    if len(argv) > 1:
+        path = argv[1]
+    else:
+        try:
+            from config import TRACE_PATH as path
+        except ImportError:
+            path = os.path.join(".cache", "traces.jsonl")
+    print(f"Traces: {path}\n")
+    print(format_summary(summarize(read_traces(path))))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
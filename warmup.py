@@ -0,0 +1,139 @@
+"""
+Model warm-up - loads the Ollama model in the background at startup and
+keeps it resident with cheap periodic pings, so the first hotkey press is
+as fast as the tenth.
+
+Run directly to warm the configured model once (replaces warmup.bat):
+
+    python warmup.py
+"""
+
+import threading
+import time
+
+from ollama_backend import OllamaError
+
+
+class ModelWarmer:
+    """Background thread that loads the model once, then pings it to keep it loaded"""
+
+    def __init__(self, backend, ping_interval=240, verbose=False):
+        self.backend = backend
+        self.ping_interval = ping_interval
+        self.verbose = verbose
+        self.ready = threading.Event()
+        self.load_seconds = None      # wall time of the initial warm-up
+        self.server_load_seconds = None  # time Ollama itself reported for loading the model
+        self.error = None
+        self.pings = 0
+        self.ping_seconds = []
+        self.first_token_seconds = []
+        self.last_activity = 0.0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="model-warmer", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def touch(self):
+        """Note that a real request just used the model (no ping needed for a while)"""
+        self.last_activity = time.monotonic()
+
+    def record_request(self, stats):
+        """Remember steady-state time-to-first-token to compare against the cold load"""
+        self.touch()
+        if stats.time_to_first_token is not None:
+            with self._lock:
+                self.first_token_seconds.append(stats.time_to_first_token)
+                del self.first_token_seconds[:-50]
+
+    def warm(self):
+        """Load the model now; returns the wall time it took"""
+        start = time.perf_counter()
+        self.server_load_seconds = self.backend.load_model()
+        self.load_seconds = time.perf_counter() - start
+        self.touch()
+        return self.load_seconds
+
+    def _run(self):
+        try:
+            self.warm()
+            if self.verbose:
+                print(f"🔥 Model warm: {self.describe()}")
+        except OllamaError as e:
+            self.error = e
+            if self.verbose:
+                print(f"⚠️  Model warm-up failed: {e}")
+        finally:
+            self.ready.set()
+
+        if not self.ping_interval:
+            return
+        while not self._stop.wait(self.ping_interval / 4):
+            if time.monotonic() - self.last_activity < self.ping_interval:
+                continue
+            start = time.perf_counter()
+            try:
+                self.backend.load_model()
+            except OllamaError as e:
+                self.error = e
+                self.touch()  # back off a full interval before trying again
+                continue
+            with self._lock:
+                self.pings += 1
+                self.ping_seconds.append(time.perf_counter() - start)
+                del self.ping_seconds[:-50]
+            self.error = None
+            self.touch()
+
+    def describe(self):
+        if self.error is not None and self.load_seconds is None:
+            return f"not loaded ({self.error})"
+        if self.load_seconds is None:
+            return "loading..."
+        parts = [f"warm-up {self.load_seconds:.2f}s"]
+        if self.server_load_seconds:
+            parts.append(f"model load {self.server_load_seconds:.2f}s")
+        with self._lock:
+            if self.first_token_seconds:
+                avg = sum(self.first_token_seconds) / len(self.first_token_seconds)
+                parts.append(f"steady first token {avg:.2f}s avg over {len(self.first_token_seconds)}")
+            if self.ping_seconds:
+                parts.append(f"{self.pings} keep-alive pings, last {self.ping_seconds[-1]:.2f}s")
+        return ", ".join(parts)
+
+
+def main():
+    try:
+        from config import MODEL, TIMEOUT, OLLAMA_BACKEND, OLLAMA_HOST, OLLAMA_KEEP_ALIVE
+    except ImportError:
+        MODEL, TIMEOUT = "llama3.2", 120
+        OLLAMA_BACKEND, OLLAMA_HOST, OLLAMA_KEEP_ALIVE = "http", "http://localhost:11434", "30m"
+    from ollama_backend import create_ollama_backend
+
+    backend = create_ollama_backend(OLLAMA_BACKEND, MODEL, host=OLLAMA_HOST,
+                                    keep_alive=OLLAMA_KEEP_ALIVE, timeout=TIMEOUT)
+    print(f"Loading {MODEL} via {backend.describe()}...")
+    print("Please wait, this might take 10-30 seconds...")
+    warmer = ModelWarmer(backend, ping_interval=0)
+    try:
+        warmer.warm()
+    except OllamaError as e:
+        print(f"Warning: Ollama might not be ready ({e})")
+        print("Please make sure:")
+        print("  1. Ollama is installed")
+        print(f"  2. Model is pulled: ollama pull {MODEL}")
+        print("  3. Ollama service is running")
+        return 1
+    print(f"Ollama is ready! Model loaded into memory ({warmer.describe()})")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())